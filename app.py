@@ -1,36 +1,75 @@
 import os
 from dotenv import load_dotenv
 from flask import Flask, render_template
+from jinja2 import FileSystemBytecodeCache
 from flask_login import LoginManager
 from config import DevConfig, ProdConfig
 from models.models import db, User
+from assets import init_assets
+from commands import register_commands
+from services.passwords import init_passwords
+from services.hash_policy import init_hash_policy
+from services.metrics import init_metrics
+from services.fx import init_fx
+from services.columnar import init_columnar
+import services.reports  # noqa: F401 - bumps User.data_version on record writes
+import services.rollups  # noqa: F401 - keeps MonthlyRollup in step with Record writes
+import services.anomalies  # noqa: F401 - flags unusual expenses on write
 
 # load .env early
 load_dotenv()
 
-def create_app():
+def create_app(config=None):
     app = Flask(__name__)
 
     # configuration (APP_ENV = production / development)
     app_env = os.environ.get("APP_ENV", "development").lower()
     app.config.from_object(ProdConfig if app_env == "production" else DevConfig)
+    # explicit overrides (benchmarks, tests)
+    if config:
+        app.config.update(config)
 
     # DB init
     db.init_app(app)
 
+    # Jinja bytecode cache: workers load compiled templates instead of re-parsing
+    cache_dir = app.config.get("JINJA_BYTECODE_CACHE_DIR")
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        app.jinja_env.bytecode_cache = FileSystemBytecodeCache(cache_dir)
+
     # Blueprints
     from routes.api import api_bp
     from routes.auth import auth_bp
     from routes.home import home_bp
     from routes.records import records_bp
     from routes.categories import categories_bp
-    
+    from routes.health import health_bp
+    from routes.recurring import recurring_bp
+    from routes.budgets import budgets_bp
 
     app.register_blueprint(api_bp)
     app.register_blueprint(auth_bp)
     app.register_blueprint(home_bp)
     app.register_blueprint(records_bp)
     app.register_blueprint(categories_bp)
+    app.register_blueprint(health_bp)
+    app.register_blueprint(recurring_bp)
+    app.register_blueprint(budgets_bp)
+
+    # fingerprinted static assets + response compression
+    init_assets(app)
+
+    # per-endpoint timings/query counts, /metrics (registered after assets, so it runs before compression)
+    init_metrics(app)
+
+    # password KDF pool + login throttling + hash cost policy
+    init_passwords(app)
+    init_hash_policy(app)
+
+    # (currency, date) FX rate cache, per-user record columns
+    init_fx(app)
+    init_columnar(app)
 
     # Login manager
     login_manager = LoginManager()
@@ -50,9 +89,46 @@ def create_app():
     def server_error(e):
         return render_template("errors/500.html"), 500
 
+    # warm-up state, read by /readyz
+    app.extensions["warmup"] = {"templates": 0, "engine": False, "pid": None}
+
+    # flask CLI commands (commands.py)
+    register_commands(app)
+
     return app
 
 
+def precompile_templates(app):
+    """Compile every template once, so forked workers inherit them warm."""
+    env = app.jinja_env
+    names = [n for n in env.list_templates() if n.endswith(".html")]
+    for name in names:
+        env.get_template(name)
+    app.extensions["warmup"]["templates"] = len(names)
+    return len(names)
+
+
+def warm_engine(app):
+    """Re-open the DB pool in the current process (call after fork)."""
+    with app.app_context():
+        engine = db.engine
+        # connections inherited from the parent must not be reused by the child
+        engine.dispose(close=False)
+
+        size = getattr(engine.pool, "size", lambda: 1)()
+        conns = []
+        try:
+            for _ in range(max(1, size)):
+                conn = engine.connect()
+                conn.exec_driver_sql("SELECT 1")
+                conns.append(conn)
+        finally:
+            for conn in conns:
+                conn.close()  # back to the pool, still open
+
+    app.extensions["warmup"].update(engine=True, pid=os.getpid())
+
+
 if __name__ == "__main__":
     app = create_app()
     with app.app_context():
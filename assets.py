@@ -0,0 +1,135 @@
+"""Static asset pipeline + on-the-fly response compression.
+
+Build step (Docker image / `flask build-assets`):
+    static/css/*.css, static/js/*.js  ->  static/dist/<dir>/<name>.<hash>.<ext>
+    (+ .gz and .br siblings) and static/dist/manifest.json
+
+Templates use `asset_url("css/style.css")`, which resolves to the fingerprinted
+file when the manifest exists and to plain /static/... otherwise (dev).
+"""
+import gzip
+import hashlib
+import io
+import json
+import os
+
+from flask import current_app, request, url_for
+
+try:  # optional: brotli is preferred by browsers, gzip is always available
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+ASSET_DIRS = ("css", "js")
+DIST_DIR = "dist"
+MANIFEST = "manifest.json"
+
+# responses compressed on the fly (static files are pre-compressed instead)
+COMPRESSIBLE = {"text/html", "application/json", "text/csv", "text/plain"}
+
+# ---------- build ----------
+
+def _fingerprint(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()[:12]
+
+def build_assets(static_dir: str) -> dict:
+    """Fingerprint + pre-compress every css/js file; return the manifest."""
+    dist = os.path.join(static_dir, DIST_DIR)
+    manifest = {}
+
+    for sub in ASSET_DIRS:
+        src_dir = os.path.join(static_dir, sub)
+        if not os.path.isdir(src_dir):
+            continue
+        os.makedirs(os.path.join(dist, sub), exist_ok=True)
+
+        for name in sorted(os.listdir(src_dir)):
+            src = os.path.join(src_dir, name)
+            if not os.path.isfile(src):
+                continue
+            with open(src, "rb") as f:
+                data = f.read()
+
+            stem, ext = os.path.splitext(name)
+            hashed = f"{sub}/{stem}.{_fingerprint(data)}{ext}"
+            out = os.path.join(dist, hashed)
+
+            with open(out, "wb") as f:
+                f.write(data)
+            with open(out + ".gz", "wb") as f:
+                f.write(gzip.compress(data, compresslevel=9, mtime=0))
+            if brotli is not None:
+                with open(out + ".br", "wb") as f:
+                    f.write(brotli.compress(data, quality=11))
+
+            manifest[f"{sub}/{name}"] = hashed
+
+    with open(os.path.join(dist, MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+def load_manifest(static_dir: str) -> dict:
+    path = os.path.join(static_dir, DIST_DIR, MANIFEST)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+# ---------- runtime ----------
+
+def asset_url(filename: str) -> str:
+    hashed = current_app.extensions["assets"].get(filename)
+    if hashed:
+        return url_for("assets.serve", filename=hashed)
+    return url_for("static", filename=filename)
+
+def accepted_encoding(available=("br", "gzip")):
+    """Best content-coding the client accepts, out of `available`."""
+    accept = request.accept_encodings
+    for enc in available:
+        if enc == "br" and brotli is None:
+            continue
+        if accept[enc]:
+            return enc
+    return None
+
+def compress_response(response):
+    """after_request hook: compress dynamic HTML/JSON/CSV above a threshold."""
+    if (response.status_code != 200
+            or response.mimetype not in COMPRESSIBLE
+            or "Content-Encoding" in response.headers
+            or response.is_streamed and not response.direct_passthrough):
+        return response
+
+    response.vary.add("Accept-Encoding")
+    enc = accepted_encoding()
+    if enc is None:
+        return response
+
+    # send_file() responses (CSV export) are passthrough; buffer them here
+    response.direct_passthrough = False
+    data = response.get_data()
+    if len(data) < current_app.config["COMPRESS_MIN_SIZE"]:
+        return response
+
+    if enc == "br":
+        body = brotli.compress(data, quality=current_app.config["COMPRESS_BROTLI_QUALITY"])
+    else:
+        buf = io.BytesIO()
+        with gzip.GzipFile(fileobj=buf, mode="wb", compresslevel=current_app.config["COMPRESS_GZIP_LEVEL"]) as gz:
+            gz.write(data)
+        body = buf.getvalue()
+
+    response.set_data(body)
+    response.headers["Content-Encoding"] = enc
+    response.headers.pop("Content-MD5", None)
+    return response
+
+def init_assets(app):
+    from routes.assets import assets_bp
+
+    app.extensions["assets"] = load_manifest(app.static_folder)
+    app.jinja_env.globals["asset_url"] = asset_url
+    app.register_blueprint(assets_bp)
+    app.after_request(compress_response)
@@ -0,0 +1,98 @@
+"""Vectorized column aggregation vs the old multi-pass dashboard/CLI code.
+
+    python -m benchmarks.aggregation [--rows 200000] [--repeat 5]
+
+* multi_pass   - the previous home.index logic: separate loops for totals,
+                 pies and monthly bars over record objects
+* columns      - services.aggregation.aggregate_columns over encoded NumPy
+                 columns (what pet.py's column cache feeds it)
+"""
+import argparse
+import json
+import random
+import time
+from collections import defaultdict
+from types import SimpleNamespace
+
+import numpy as np
+
+from services.aggregation import aggregate_columns
+
+
+def make_rows(n, seed=42):
+    rnd = random.Random(seed)
+    cats = [f"Category {i}" for i in range(40)]
+    return [(f"{rnd.randint(2015, 2025)}-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}",
+             "income" if rnd.random() < 0.25 else "expense",
+             rnd.choice(cats), round(rnd.uniform(1, 500), 2))
+            for _ in range(n)]
+
+
+def multi_pass(records):
+    income = sum(r.amount for r in records if r.type == "income")
+    expense = sum(r.amount for r in records if r.type == "expense")
+    exp_by_cat, inc_by_cat = defaultdict(float), defaultdict(float)
+    for r in records:
+        if r.type == "expense":
+            exp_by_cat[r.category] += r.amount
+        elif r.type == "income":
+            inc_by_cat[r.category] += r.amount
+    monthly_income, monthly_expense = defaultdict(float), defaultdict(float)
+    for r in records:
+        ym = r.date[:7]
+        if r.type == "income":
+            monthly_income[ym] += r.amount
+        else:
+            monthly_expense[ym] += r.amount
+    return income, expense, exp_by_cat, inc_by_cat, monthly_income, monthly_expense
+
+
+def encode(rows):
+    months = sorted({d[:7] for d, *_ in rows})
+    cats = sorted({c for _, _, c, _ in rows})
+    m_idx = {m: i for i, m in enumerate(months)}
+    c_idx = {c: i for i, c in enumerate(cats)}
+    return (np.array([m_idx[d[:7]] for d, *_ in rows]), months,
+            np.array([0 if t == "income" else 1 for _, t, _, _ in rows], dtype=np.uint8),
+            np.array([c_idx[c] for _, _, c, _ in rows]), cats,
+            np.array([round(a * 100) for *_, a in rows], dtype=np.int64))
+
+
+def _best(fn, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return round(best * 1000, 2)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rows", type=int, default=200_000)
+    ap.add_argument("--repeat", type=int, default=5)
+    args = ap.parse_args(argv)
+
+    rows = make_rows(args.rows)
+    objects = [SimpleNamespace(date=d, type=t, category=c, amount=a) for d, t, c, a in rows]
+    m_codes, m_labels, t_codes, c_codes, c_labels, cents = encode(rows)
+
+    # same answer from both paths
+    old = multi_pass(objects)
+    col = aggregate_columns(m_codes, m_labels, t_codes, c_codes, c_labels, cents)
+    assert abs(old[0] * 100 - col["income"]) < 1
+    assert dict(old[4]).keys() == col["by_month"]["income"].keys()
+
+    result = {
+        "rows": args.rows,
+        "multi_pass_ms": _best(lambda: multi_pass(objects), args.repeat),
+        "columns_ms": _best(lambda: aggregate_columns(m_codes, m_labels, t_codes, c_codes, c_labels, cents),
+                            args.repeat),
+    }
+    result["speedup_columns"] = round(result["multi_pass_ms"] / result["columns_ms"], 2)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""Unusual-expense detection: per-insert check and the nightly batch.
+
+    python -m benchmarks.anomalies [--users 10] [--records 100000] [--rounds 50]
+
+Seeds `--users` users with `--records` records each, then times:
+
+* scan: `flask anomalies scan` over the whole table (one query, NumPy)
+* check_ms: the on-write check of one new expense against CategoryStat
+  (services/anomalies.check), median of `--rounds` inserts
+* naive_ms: the same question answered by aggregating the category's
+  records per insert (COUNT / AVG / SUM of squares), for comparison
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from sqlalchemy import func, insert
+
+from benchmarks.datagen import bench_app
+from models.models import db, Record
+from services import anomalies, record_events
+
+
+def _median_ms(samples):
+    return round(statistics.median(samples) * 1000, 3)
+
+
+def run(users=10, records=100_000, rounds=50):
+    app, ids, db_path = bench_app(users=users, records=records, categories=12)
+    user_id = next(iter(ids.values()))
+    try:
+        with app.app_context():
+            conn = db.session.connection()
+            t0 = time.perf_counter()
+            result = anomalies.scan(conn, None)
+            scan_s = time.perf_counter() - t0
+            db.session.commit()
+
+            category = db.session.query(Record.category).filter_by(user_id=user_id, type="expense").first()[0]
+            check, naive = [], []
+            for i in range(rounds):
+                conn = db.session.connection()
+                row = {"date": "2030-01-01", "type": "expense", "category": category, "amount": 40.0 + i,
+                       "user_id": user_id}
+                rid = conn.execute(insert(Record).returning(Record.id), [row]).scalar()
+                change = record_events.Change(1, user_id, row["date"], "expense", category, row["amount"], id=rid)
+                t0 = time.perf_counter()
+                anomalies.check(conn, [change])
+                check.append(time.perf_counter() - t0)
+
+                t0 = time.perf_counter()
+                conn.execute(
+                    db.select(func.count(Record.id), func.avg(Record.amount), func.sum(Record.amount * Record.amount))
+                    .where(Record.user_id == user_id, Record.category == category, Record.type == "expense")
+                ).one()
+                naive.append(time.perf_counter() - t0)
+                db.session.commit()
+    finally:
+        os.unlink(db_path)
+    return {
+        "params": {"users": users, "records_per_user": records, "rounds": rounds},
+        "scan": dict(result, seconds=round(scan_s, 2), rows_per_s=round(result["records"] / scan_s)),
+        "check_ms": _median_ms(check),
+        "naive_ms": _median_ms(naive),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=10)
+    ap.add_argument("--records", type=int, default=100_000)
+    ap.add_argument("--rounds", type=int, default=50)
+    args = ap.parse_args(argv)
+
+    result = run(args.users, args.records, args.rounds)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,177 @@
+"""Seeded synthetic data: N users x M records x K categories.
+
+    python -m benchmarks.datagen --records 5000 --categories 12 --csv out.csv
+    python -m benchmarks.datagen --users 20 --records 10000 --db /tmp/bench.db
+
+The same seed always gives the same data. Per user:
+
+* a monthly salary (income, day 1-3, ~normal around the user's pay) and rent
+* the other records are expenses spread over the period, weekends ~1.5x busier,
+  categories picked by a Zipf-like popularity, amounts log-normal around a
+  per-category typical price
+"""
+import argparse
+import csv
+import math
+import os
+import random
+import sys
+import tempfile
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+
+from app import create_app
+from models.models import db, User, Record, Category
+from services import record_events
+from services.importer import fingerprint_rows
+
+END = date(2025, 12, 31)  # fixed, so results don't drift with the calendar
+
+CATEGORY_POOL = [
+    ("Food", 18), ("Groceries", 45), ("Transport", 8), ("Fun", 30), ("Coffee", 4),
+    ("Utilities", 70), ("Health", 35), ("Clothes", 60), ("Gifts", 40), ("Books", 20),
+    ("Travel", 250), ("Electronics", 180), ("Kids", 25), ("Pets", 30), ("Insurance", 90),
+    ("Taxi", 12), ("Sports", 35), ("Education", 120), ("Home", 55), ("Beauty", 28),
+]
+
+BENCH_CONFIG = {
+    "JINJA_BYTECODE_CACHE_DIR": "",
+    "PASSWORD_POOL_WORKERS": 0,
+    "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",  # logins are not what we measure
+    "LOGIN_RATE_BURST": 1_000_000,
+    "METRICS_ENABLED": False,
+}
+PASSWORD = "bench-pass"
+
+
+def user_records(rnd, n, categories, months=24, end=END):
+    """[(date, type, category, amount, description), ...] for one user, sorted by date."""
+    start = end - timedelta(days=months * 30)
+    days = (end - start).days + 1
+    pay = round(rnd.gauss(2500, 600), 2)
+    rent = round(rnd.uniform(400, 1200), 2)
+
+    rows = []
+    month_starts = []
+    d = date(start.year, start.month, 1)
+    while d <= end:
+        month_starts.append(d)
+        d = date(d.year + d.month // 12, d.month % 12 + 1, 1)
+    for m in month_starts:
+        if len(rows) + 2 > max(2, n // 5):  # fixed rows never crowd out the rest
+            break
+        rows.append(((m + timedelta(days=rnd.randint(0, 2))).isoformat(), "income", "Salary",
+                     max(100.0, round(rnd.gauss(pay, pay * 0.05), 2)), "salary"))
+        rows.append(((m + timedelta(days=rnd.randint(0, 4))).isoformat(), "expense", "Rent", rent, "rent"))
+
+    weights = [1 / (rank + 1) for rank in range(len(categories))]
+    day_weights = [1.5 if (start + timedelta(days=i)).weekday() >= 5 else 1.0 for i in range(days)]
+    cum = []
+    acc = 0.0
+    for w in day_weights:
+        acc += w
+        cum.append(acc)
+    while len(rows) < n:
+        i = min(days - 1, _bisect(cum, rnd.random() * acc))
+        name, typical = rnd.choices(categories, weights)[0]
+        amount = round(math.exp(rnd.gauss(math.log(typical), 0.6)), 2)
+        rows.append(((start + timedelta(days=i)).isoformat(), "expense", name, max(0.5, amount),
+                     f"{name.lower()} #{rnd.randint(1, 999)}"))
+    rows.sort(key=lambda r: r[0])
+    return rows
+
+
+def _bisect(cum, x):
+    lo, hi = 0, len(cum)
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if cum[mid] < x:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+def generate(users=1, records=1000, categories=10, months=24, seed=1):
+    """{username: rows} - deterministic for a given seed."""
+    rnd = random.Random(seed)
+    out = {}
+    for u in range(users):
+        cats = rnd.sample(CATEGORY_POOL, min(categories, len(CATEGORY_POOL)))
+        out[f"user{u}"] = user_records(rnd, records, cats, months)
+    return out
+
+
+def seed_database(app, data):
+    """Insert generate() output; returns {username: user_id}."""
+    ids = {}
+    with app.app_context():
+        db.create_all()
+        pwhash = None
+        for name, rows in data.items():
+            user = User(username=name)
+            if pwhash is None:
+                user.set_password(PASSWORD)
+                pwhash = user.password
+            user.password = pwhash
+            db.session.add(user)
+            db.session.flush()
+            ids[name] = user.id
+            db.session.add_all(Category(name=c, user_id=user.id) for c in sorted({r[2] for r in rows}))
+            fingerprinted = fingerprint_rows(user.id, rows)
+            db.session.execute(insert(Record), [
+                {"date": d, "type": t, "category": c, "amount": a, "description": desc,
+                 "user_id": user.id, "fingerprint": fp}
+                for d, t, c, a, desc, fp in fingerprinted
+            ])
+            record_events.rows_inserted(db.session, user.id, fingerprinted)
+        db.session.commit()
+    return ids
+
+
+def bench_app(users=1, records=1000, categories=10, months=24, seed=1, db_path=None):
+    """App on a fresh SQLite file seeded with generate(); returns (app, ids, db_path)."""
+    if db_path is None:
+        fd, db_path = tempfile.mkstemp(prefix="bench-", suffix=".db")
+        os.close(fd)
+        os.unlink(db_path)
+    app = create_app(dict(BENCH_CONFIG, SQLALCHEMY_DATABASE_URI="sqlite:///" + db_path))
+    ids = seed_database(app, generate(users, records, categories, months, seed))
+    return app, ids, db_path
+
+
+def write_csv(rows, out):
+    w = csv.writer(out, lineterminator="\n")
+    w.writerow(["date", "type", "category", "amount", "description"])
+    w.writerows(rows)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=1)
+    ap.add_argument("--records", type=int, default=1000, help="per user")
+    ap.add_argument("--categories", type=int, default=10, help="per user")
+    ap.add_argument("--months", type=int, default=24)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--csv", help="write the first user's rows as a ledger CSV ('-' = stdout)")
+    ap.add_argument("--db", help="create and seed this SQLite file")
+    args = ap.parse_args(argv)
+
+    data = generate(args.users, args.records, args.categories, args.months, args.seed)
+    if args.csv:
+        rows = next(iter(data.values()))
+        if args.csv == "-":
+            write_csv(rows, sys.stdout)
+        else:
+            with open(args.csv, "w", newline="", encoding="utf-8") as f:
+                write_csv(rows, f)
+    if args.db:
+        app = create_app(dict(BENCH_CONFIG, SQLALCHEMY_DATABASE_URI="sqlite:///" + os.path.abspath(args.db)))
+        ids = seed_database(app, data)
+        print(f"Seeded {len(ids)} users x {args.records} records into {args.db} (password: {PASSWORD})",
+              file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""CSV vs Parquet bulk export/import.
+
+    python -m benchmarks.formats [--records 1000000] [--batch-size 65536]
+
+Seeds one user with `--records` records, then times, for both formats, the
+export path (query -> file bytes, as the /records/export/* routes do) and
+the import parse path (file bytes -> validated rows ready for
+importer.bulk_insert, as the /records/import/* routes do). The INSERT itself
+is the same for both formats and is left out. Prints rows/s and file sizes.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import time
+
+from benchmarks.datagen import bench_app
+from models.models import Record
+from services import fx, importer, parquet
+
+
+def _timed(fn):
+    t0 = time.perf_counter()
+    out = fn()
+    return out, time.perf_counter() - t0
+
+
+def _export_csv(query):
+    # mirrors routes/records.py export_csv
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator="\n")
+    writer.writerow(["date", "type", "category", "amount", "description", "currency"])
+    for r in query.all():
+        writer.writerow([r.date, r.type, r.category, f"{r.amount:.2f}", r.description or "", fx.code(r.currency)])
+    return out.getvalue().encode("utf-8-sig")
+
+
+def _parse_csv(raw):
+    # mirrors routes/records.py import_csv
+    reader = importer.decode_csv(raw)
+    rows, errors = [], []
+    for i, raw_row in enumerate(reader, start=2):
+        try:
+            rows.append(importer.parse_row(raw_row, fx.base_currency()))
+        except Exception:
+            errors.append(i)
+    return rows, errors
+
+
+def run(records=1_000_000, batch_size=parquet.BATCH_SIZE):
+    if not parquet.available():
+        raise SystemExit("pyarrow is not installed")
+    app, ids, db_path = bench_app(users=1, records=records, categories=20)
+    user_id = next(iter(ids.values()))
+    try:
+        with app.app_context():
+            query = Record.query.filter_by(user_id=user_id).order_by(Record.date.asc(), Record.id.asc())
+            csv_raw, csv_export = _timed(lambda: _export_csv(query))
+            (pq_buf, n), pq_export = _timed(lambda: parquet.write_records(query, batch_size=batch_size))
+            pq_raw = pq_buf.getvalue()
+
+            (csv_rows, _), csv_parse = _timed(lambda: _parse_csv(csv_raw))
+            (pq_rows, _), pq_parse = _timed(lambda: parquet.read_rows(pq_raw, fx.base_currency()))
+            assert len(csv_rows) == len(pq_rows) == n
+    finally:
+        os.unlink(db_path)
+
+    def side(raw, export, parse):
+        return {"bytes": len(raw), "export_s": round(export, 2), "export_rows_per_s": round(n / export),
+                "parse_s": round(parse, 2), "parse_rows_per_s": round(n / parse)}
+
+    csv_side, pq_side = side(csv_raw, csv_export, csv_parse), side(pq_raw, pq_export, pq_parse)
+    return {
+        "params": {"records": n, "batch_size": batch_size},
+        "csv": csv_side,
+        "parquet": pq_side,
+        "speedup": {"export": round(csv_export / pq_export, 1), "parse": round(csv_parse / pq_parse, 1),
+                    "size": round(len(csv_raw) / len(pq_raw), 1)},
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--records", type=int, default=1_000_000)
+    ap.add_argument("--batch-size", type=int, default=parquet.BATCH_SIZE)
+    args = ap.parse_args(argv)
+
+    result = run(args.records, args.batch_size)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""In-process concurrent load driver.
+
+    python -m benchmarks.load [--users 20] [--records 2000] [--clients 8] [--seconds 10]
+
+Seeds a SQLite file (benchmarks.datagen), logs in one Flask test client per
+simulated user and lets `--clients` threads replay a weighted mix of the
+app's read and write requests for `--seconds`. Everything runs in this
+process through WSGI - no sockets, no server, works offline. Reports
+p50/p95/p99 latency per request kind and overall, plus throughput.
+"""
+import argparse
+import json
+import os
+import random
+import threading
+import time
+from collections import defaultdict
+
+from benchmarks.datagen import bench_app, PASSWORD
+
+# (name, weight, method, url template, form data)
+MIX = [
+    ("dashboard_month", 30, "GET", "/?scope=month&date=2025-{month:02d}-15", None),
+    ("dashboard_year", 10, "GET", "/?scope=year&date=2025-06-15", None),
+    ("chart_data", 30, "GET", "/chart-data?scope=month&date=2025-{month:02d}-15", None),
+    ("records_page", 25, "GET", "/records/?page={page}&per=20", None),
+    ("records_search", 10, "GET", "/records/?q=%23{n}&per=20", None),
+    ("api_records", 10, "GET", "/api/records?page={page}&per=50", None),
+    ("add_record", 10, "POST", "/records/add",
+     {"type": "expense", "category": "Food", "amount": "{amount}", "date": "2025-{month:02d}-10"}),
+    ("export_csv", 5, "GET", "/records/export/csv", None),
+]
+
+
+def percentile(sorted_samples, p):
+    if not sorted_samples:
+        return None
+    k = (len(sorted_samples) - 1) * p / 100
+    lo = int(k)
+    hi = min(lo + 1, len(sorted_samples) - 1)
+    return sorted_samples[lo] + (sorted_samples[hi] - sorted_samples[lo]) * (k - lo)
+
+
+def summarize(samples, seconds):
+    s = sorted(samples)
+    ms = lambda v: round(v * 1000, 2) if v is not None else None
+    return {
+        "requests": len(s),
+        "rps": round(len(s) / seconds, 1),
+        "p50_ms": ms(percentile(s, 50)),
+        "p95_ms": ms(percentile(s, 95)),
+        "p99_ms": ms(percentile(s, 99)),
+        "max_ms": ms(s[-1] if s else None),
+    }
+
+
+def _client(app, username):
+    c = app.test_client()
+    c.post("/auth/login", data={"username": username, "password": PASSWORD})
+    token = c.post("/api/login", json={"username": username, "password": PASSWORD}).get_json()["token"]
+    return c, {"Authorization": f"Bearer {token}"}
+
+
+def run(users=20, records=2000, clients=8, seconds=10.0, seed=1):
+    app, ids, db_path = bench_app(users=users, records=records, categories=10, seed=seed)
+    try:
+        sessions = [_client(app, name) for name in ids]
+        names, weights = zip(*[(m[0], m[1]) for m in MIX])
+        by_name = {m[0]: m for m in MIX}
+        pages = max(1, records // 20)
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        lock = threading.Lock()
+        stop_at = time.perf_counter() + seconds
+
+        def worker(i):
+            rnd = random.Random(seed * 1000 + i)
+            local, local_err = defaultdict(list), defaultdict(int)
+            while time.perf_counter() < stop_at:
+                client, headers = sessions[rnd.randrange(len(sessions))]
+                name = rnd.choices(names, weights)[0]
+                _, _, method, url, form = by_name[name]
+                fill = {"month": rnd.randint(1, 12), "page": rnd.randint(1, pages // 2 or 1),
+                        "n": rnd.randint(1, 999), "amount": f"{rnd.uniform(1, 80):.2f}"}
+                kwargs = {"headers": headers} if url.startswith("/api") else {}
+                if form:
+                    kwargs["data"] = {k: v.format(**fill) for k, v in form.items()}
+                t0 = time.perf_counter()
+                resp = client.open(url.format(**fill), method=method, **kwargs)
+                resp.get_data()
+                took = time.perf_counter() - t0
+                if resp.status_code >= 400:
+                    local_err[name] += 1
+                else:
+                    local[name].append(took)
+            with lock:
+                for k, v in local.items():
+                    latencies[k].extend(v)
+                for k, v in local_err.items():
+                    errors[k] += v
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - started
+    finally:
+        os.unlink(db_path)
+
+    return {
+        "params": {"users": users, "records": records, "clients": clients, "seconds": seconds, "seed": seed},
+        "overall": summarize([x for v in latencies.values() for x in v], elapsed),
+        "requests": {name: summarize(latencies[name], elapsed) for name in names},
+        "errors": dict(errors),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=20)
+    ap.add_argument("--records", type=int, default=2000, help="records per user")
+    ap.add_argument("--clients", type=int, default=8, help="concurrent client threads")
+    ap.add_argument("--seconds", type=float, default=10.0)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args(argv)
+
+    result = run(args.users, args.records, args.clients, args.seconds, args.seed)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Dashboard latency during a login storm.
+
+Starts the app on a threaded server in a child process (temporary SQLite DB),
+then measures `GET /` latency alone and while N clients hammer
+`POST /api/login`.
+Run it with the KDF pool on (default) and off (--inline, the old behaviour):
+
+    python -m benchmarks.login_storm [--storm 16] [--seconds 5] [--inline]
+"""
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import statistics
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from http.cookiejar import CookieJar
+
+from werkzeug.serving import make_server
+
+from app import create_app
+from models.models import db, User, Record
+
+
+def _pct(samples, p):
+    if not samples:
+        return None
+    s = sorted(samples)
+    return round(s[min(len(s) - 1, int(len(s) * p / 100))] * 1000, 2)
+
+
+def _seed(app, n_records=500):
+    with app.app_context():
+        db.create_all()
+        u = User(username="reader")
+        u.set_password("reader-pass")
+        db.session.add(u)
+        db.session.flush()
+        db.session.add_all(Record(date=f"2025-{(i % 12) + 1:02d}-{(i % 28) + 1:02d}",
+                                  type="expense" if i % 3 else "income",
+                                  category=f"Cat{i % 8}", amount=10 + i % 90,
+                                  description="", user_id=u.id)
+                           for i in range(n_records))
+        # storm accounts share one real hash, so every login runs the full KDF
+        storm = User(username="storm0")
+        storm.set_password("storm-pass")
+        db.session.add(storm)
+        db.session.add_all(User(username=f"storm{i}", password=storm.password) for i in range(1, 16))
+        db.session.commit()
+
+
+def _client(cookies=None):
+    # stdlib only: the benchmark needs nothing beyond requirements.txt
+    return urllib.request.build_opener(urllib.request.HTTPCookieProcessor(CookieJar() if cookies is None else cookies))
+
+
+def _send(client, url, form=None, json_body=None):
+    """Status code of one request; 4xx/5xx are answers here, not errors."""
+    data, headers = None, {}
+    if form is not None:
+        data = urllib.parse.urlencode(form).encode()
+    elif json_body is not None:
+        data, headers = json.dumps(json_body).encode(), {"Content-Type": "application/json"}
+    try:
+        with client.open(urllib.request.Request(url, data=data, headers=headers)) as r:
+            r.read()
+            return r.status
+    except urllib.error.HTTPError as e:
+        e.read()
+        return e.code
+
+
+def _serve(overrides, port_q):
+    logging.getLogger("werkzeug").setLevel(logging.ERROR)
+    app = create_app(overrides)
+    _seed(app)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    port_q.put(server.server_port)
+    server.serve_forever()
+
+
+def _dashboard_probe(base, cookies, stop, out):
+    s = _client(cookies)
+    while not stop.is_set():
+        t0 = time.perf_counter()
+        _send(s, f"{base}/")
+        out.append(time.perf_counter() - t0)
+        time.sleep(0.01)
+
+
+def _storm(base, idx, stop, codes):
+    s = _client()
+    while not stop.is_set():
+        status = _send(s, f"{base}/api/login", json_body={"username": f"storm{idx % 16}", "password": "storm-pass"})
+        codes[status] = codes.get(status, 0) + 1
+        if status in (429, 503):
+            time.sleep(0.05)  # impatient client: retries almost immediately
+
+
+def _phase(base, cookies, seconds, storm_clients):
+    stop = threading.Event()
+    lat, codes = [], {}
+    threads = [threading.Thread(target=_dashboard_probe, args=(base, cookies, stop, lat))]
+    threads += [threading.Thread(target=_storm, args=(base, i, stop, codes)) for i in range(storm_clients)]
+    for t in threads:
+        t.start()
+    time.sleep(seconds)
+    stop.set()
+    for t in threads:
+        t.join()
+    return {"requests": len(lat), "p50_ms": _pct(lat, 50), "p99_ms": _pct(lat, 99),
+            "mean_ms": round(statistics.mean(lat) * 1000, 2) if lat else None,
+            "login_status_counts": codes}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--storm", type=int, default=16, help="concurrent login clients")
+    ap.add_argument("--seconds", type=float, default=5)
+    ap.add_argument("--inline", action="store_true", help="hash on the request thread (no pool, no limits)")
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        overrides = {
+            "SQLALCHEMY_DATABASE_URI": "sqlite:///" + os.path.join(tmp, "bench.db"),
+            "JINJA_BYTECODE_CACHE_DIR": "",
+        }
+        if args.inline:
+            overrides.update(PASSWORD_POOL_WORKERS=0, PASSWORD_QUEUE_DEPTH=10_000,
+                             LOGIN_RATE_PER_MINUTE=1e9, LOGIN_RATE_BURST=10**9)
+        port_q = multiprocessing.Queue()
+        proc = multiprocessing.Process(target=_serve, args=(overrides, port_q))
+        proc.start()
+        try:
+            base = f"http://127.0.0.1:{port_q.get(timeout=120)}"
+            cookies = CookieJar()
+            _send(_client(cookies), f"{base}/auth/login", form={"username": "reader", "password": "reader-pass"})
+            result = {
+                "mode": "inline" if args.inline else "pool",
+                "idle": _phase(base, cookies, args.seconds, 0),
+                "storm": _phase(base, cookies, args.seconds, args.storm),
+            }
+        finally:
+            proc.terminate()
+            proc.join()
+
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Microbenchmarks for the hot paths, on a seeded SQLite file (benchmarks.datagen).
+
+    python -m benchmarks.micro [--records 20000] [--rounds 20] [--only export]
+
+Each benchmark is warmed up once, then timed `--rounds` times; the stats
+(min/median/mean/stddev/max in ms, ops/s) follow pytest-benchmark's columns.
+Request-level benchmarks go through the Flask test client, so routing,
+templates and compression are included - no network.
+"""
+import argparse
+import io
+import json
+import os
+import statistics
+import time
+from datetime import date
+
+from benchmarks.datagen import bench_app, generate, write_csv, PASSWORD
+from models.models import db
+from routes.home import filtered_query
+from services import dashboard
+
+
+def stats(samples):
+    ms = [s * 1000 for s in samples]
+    return {
+        "rounds": len(ms),
+        "min_ms": round(min(ms), 3),
+        "median_ms": round(statistics.median(ms), 3),
+        "mean_ms": round(statistics.fmean(ms), 3),
+        "stddev_ms": round(statistics.stdev(ms), 3) if len(ms) > 1 else 0.0,
+        "max_ms": round(max(ms), 3),
+        "ops": round(1000 / statistics.fmean(ms), 2) if sum(ms) else None,
+    }
+
+
+def bench(fn, rounds, setup=None, warmup=1):
+    """Time fn() `rounds` times; setup() (untimed) runs before each call and its result is passed in."""
+    samples = []
+    for i in range(warmup + rounds):
+        arg = setup() if setup else None
+        t0 = time.perf_counter()
+        fn(arg) if setup else fn()
+        took = time.perf_counter() - t0
+        if i >= warmup:
+            samples.append(took)
+    return stats(samples)
+
+
+def login(app, username="user0"):
+    client = app.test_client()
+    r = client.post("/auth/login", data={"username": username, "password": PASSWORD})
+    assert r.status_code == 302, "benchmark login failed"
+    return client
+
+
+def _get(client, url):
+    def run():
+        r = client.get(url)
+        assert r.status_code == 200, (url, r.status_code)
+        r.get_data()
+    return run
+
+
+def benchmarks(app, ids, records, seed):
+    """name -> (callable, setup or None)"""
+    client = login(app)
+    uid = ids["user0"]
+    pages = max(1, records // 20)
+    base = date(2025, 6, 15)
+
+    def query(scope):
+        def run():
+            with app.app_context():
+                filtered_query(uid, scope, base).all()
+                db.session.remove()
+        return run
+
+    def summary_year():
+        with app.app_context():
+            dashboard.summary(uid, date(base.year, 1, 1), date(base.year, 12, 31), "month")
+            db.session.remove()
+
+    # a different ledger for every import round, generated outside the timing
+    import_round = iter(range(10_000))
+
+    def import_setup():
+        rows = generate(1, max(100, records // 10), 10, seed=seed + 1000 + next(import_round))["user0"]
+        buf = io.StringIO()
+        write_csv(rows, buf)
+        return buf.getvalue().encode("utf-8")
+
+    def import_csv(raw):
+        r = client.post("/records/import/csv", data={"file": (io.BytesIO(raw), "bench.csv"),
+                                                     "create_missing_categories": "on"})
+        assert r.status_code == 302
+
+    return {
+        "filtered_query_month": (query("month"), None),
+        "filtered_query_year": (query("year"), None),
+        "summary_year": (summary_year, None),
+        "index_month": (_get(client, "/?scope=month&date=2025-06-15"), None),
+        "index_year": (_get(client, "/?scope=year&date=2025-06-15"), None),
+        "chart_data_year": (_get(client, "/chart-data?scope=year&date=2025-06-15"), None),
+        "chart_data_range": (_get(client, "/chart-data?from=2024-01-10&to=2025-11-20&bucket=week"), None),
+        "list_records_first_page": (_get(client, "/records/?page=1&per=20"), None),
+        "list_records_last_page": (_get(client, f"/records/?page={pages}&per=20"), None),
+        "list_records_filtered": (_get(client, "/records/?entry_type=expense&q=%23&per=50"), None),
+        "export_csv": (_get(client, "/records/export/csv"), None),
+        "export_pdf": (_get(client, "/records/export/pdf"), None),
+        "import_csv": (import_csv, import_setup),
+    }
+
+
+def run(records=20000, categories=12, rounds=20, seed=1, only=None):
+    app, ids, db_path = bench_app(users=2, records=records, categories=categories, seed=seed)
+    results = {}
+    try:
+        for name, (fn, setup) in benchmarks(app, ids, records, seed).items():
+            if only and not any(o in name for o in only):
+                continue
+            # PDF rendering of the whole ledger is slow; fewer rounds keep the suite short
+            n = max(3, rounds // 5) if name == "export_pdf" else rounds
+            results[name] = bench(fn, n, setup)
+    finally:
+        os.unlink(db_path)
+    return {"params": {"records": records, "categories": categories, "rounds": rounds, "seed": seed},
+            "benchmarks": results}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--records", type=int, default=20000, help="records per user")
+    ap.add_argument("--categories", type=int, default=12)
+    ap.add_argument("--rounds", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--only", action="append", help="run benchmarks whose name contains this (repeatable)")
+    args = ap.parse_args(argv)
+
+    result = run(args.records, args.categories, args.rounds, args.seed, args.only)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
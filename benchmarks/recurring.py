@@ -0,0 +1,68 @@
+"""Recurring-rule materialization throughput.
+
+    python -m benchmarks.recurring [--users 100] [--rules 100] [--days 100] [--batch-size 5000]
+
+Seeds `--users` users with `--rules` daily rules each (users x rules x days
+occurrences; the defaults give one million), then times one
+services.recurring.materialize() run and a second, idempotent run that
+must insert nothing.
+"""
+import argparse
+import json
+import os
+import time
+from datetime import date, timedelta
+
+from sqlalchemy import insert
+
+from benchmarks.datagen import bench_app
+from models.models import db, RecurringRule
+from services import recurring
+
+
+def run(users=100, rules=100, days=100, batch_size=5000):
+    app, ids, db_path = bench_app(users=users, records=0, categories=1)
+    start = date(2025, 1, 1)
+    until = start + timedelta(days=days - 1)
+    try:
+        with app.app_context():
+            db.session.execute(insert(RecurringRule), [
+                {"user_id": uid, "type": "expense", "category": f"Sub{i}", "amount": 1.0 + i % 50,
+                 "description": f"subscription {i}", "frequency": "daily", "interval": 1,
+                 "start_date": start.isoformat(), "next_date": start.isoformat()}
+                for uid in ids.values() for i in range(rules)
+            ])
+            db.session.commit()
+
+            t0 = time.perf_counter()
+            first = recurring.materialize(until, batch_size=batch_size)
+            took = time.perf_counter() - t0
+
+            t0 = time.perf_counter()
+            second = recurring.materialize(until, batch_size=batch_size)
+            rerun = time.perf_counter() - t0
+    finally:
+        os.unlink(db_path)
+
+    return {
+        "params": {"users": users, "rules": rules, "days": days, "batch_size": batch_size},
+        "first_run": dict(first, seconds=round(took, 2), rows_per_s=round(first["inserted"] / took)),
+        "second_run": dict(second, seconds=round(rerun, 3)),
+    }
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--users", type=int, default=100)
+    ap.add_argument("--rules", type=int, default=100, help="daily rules per user")
+    ap.add_argument("--days", type=int, default=100)
+    ap.add_argument("--batch-size", type=int, default=5000)
+    args = ap.parse_args(argv)
+
+    result = run(args.users, args.rules, args.days, args.batch_size)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
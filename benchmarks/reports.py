@@ -0,0 +1,96 @@
+"""/api/reports and dashboard timings: ORM loop / SQL vs the cached record columns.
+
+    python -m benchmarks.reports [--records 200000] [--rounds 20]
+
+Seeds one user with `--records` records, then times:
+
+* orm_pivot: the category x month pivot the way a view would build it by
+  hand (load Record objects, sum in a dict)
+* cold_load: the one query that fills the user's columns (services/columnar.py)
+* each report on the frame built from the cached columns, and the dashboard
+  summary (categories + weekly series over a year) from SQL vs from the
+  columns (median of `--rounds` runs)
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+from collections import defaultdict
+from datetime import date
+
+from benchmarks.datagen import bench_app
+from models.models import db, Record, User
+from services import columnar, dashboard, reports
+
+
+def _median_ms(fn, rounds):
+    samples = []
+    for _ in range(rounds):
+        t0 = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - t0) * 1000)
+    return round(statistics.median(samples), 2)
+
+
+def _orm_pivot(user_id):
+    out = defaultdict(float)
+    for r in Record.query.filter_by(user_id=user_id, type="expense"):
+        out[(r.category, r.date[:7])] += r.amount
+    return out
+
+
+def run(records=200_000, rounds=20):
+    app, ids, db_path = bench_app(users=1, records=records, categories=20)
+    user_id = next(iter(ids.values()))
+    try:
+        with app.app_context():
+            user = db.session.get(User, user_id)
+            t0 = time.perf_counter()
+            _orm_pivot(user_id)
+            orm_ms = (time.perf_counter() - t0) * 1000
+            db.session.expunge_all()
+
+            t0 = time.perf_counter()
+            cols = columnar.columns(db.session, user)
+            cold_ms = (time.perf_counter() - t0) * 1000
+            df = reports.frame(db.session, user)
+            expense = reports.select_rows(df, "expense")
+            year = (date(2024, 1, 1), date(2024, 12, 31))
+
+            result = {
+                "params": {"records": len(df), "rounds": rounds},
+                "orm_pivot_ms": round(orm_ms, 1),
+                "cold_load_ms": round(cold_ms, 1),
+                "columns_mb": round(cols.nbytes / 2**20, 1),
+                "warm_ms": {
+                    "pivot": _median_ms(lambda: reports.category_pivot(
+                        reports.select_rows(reports.frame(db.session, user), "expense")), rounds),
+                    "rolling": _median_ms(lambda: reports.rolling_average(expense, 30), rounds),
+                    "merchants": _median_ms(lambda: reports.top_merchants(expense, 10), rounds),
+                    "weekdays": _median_ms(lambda: reports.weekday_heatmap(expense), rounds),
+                },
+                "dashboard_ms": {
+                    "sql": _median_ms(lambda: dashboard.summary(user_id, *year, "week"), rounds),
+                    "columns": _median_ms(lambda: dashboard.summary(
+                        user_id, *year, "week", cols=columnar.columns(db.session, user)), rounds),
+                },
+            }
+    finally:
+        os.unlink(db_path)
+    return result
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--records", type=int, default=200_000)
+    ap.add_argument("--rounds", type=int, default=20)
+    args = ap.parse_args(argv)
+
+    result = run(args.records, args.rounds)
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
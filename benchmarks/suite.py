@@ -0,0 +1,100 @@
+"""Run the benchmark suite and write one JSON file per run; compare two runs.
+
+    python -m benchmarks.suite [--scale small|medium|large] [--out results.json]
+    python -m benchmarks.suite --compare before.json after.json
+
+A result file holds the git commit, interpreter and parameters next to the
+numbers (benchmarks.micro + benchmarks.load), so two runs on the same
+machine can be diffed between commits. --compare prints the change of every
+median/percentile, negative = faster.
+"""
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+
+from benchmarks import load, micro
+
+SCALES = {
+    "small": {"micro": {"records": 2000, "rounds": 5}, "load": {"users": 5, "records": 500, "clients": 4, "seconds": 3}},
+    "medium": {"micro": {"records": 20000, "rounds": 20}, "load": {"users": 20, "records": 2000, "clients": 8, "seconds": 10}},
+    "large": {"micro": {"records": 100000, "rounds": 20}, "load": {"users": 100, "records": 5000, "clients": 16, "seconds": 30}},
+}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(scale="medium", seed=1):
+    cfg = SCALES[scale]
+    return {
+        "meta": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "scale": scale,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "micro": micro.run(seed=seed, **cfg["micro"]),
+        "load": load.run(seed=seed, **cfg["load"]),
+    }
+
+
+def _metrics(result):
+    """Flatten a result file into {"micro.index_year.median_ms": v, ...}."""
+    out = {}
+    for name, s in result["micro"]["benchmarks"].items():
+        out[f"micro.{name}.median_ms"] = s["median_ms"]
+    for key in ("p50_ms", "p95_ms", "p99_ms", "rps"):
+        out[f"load.overall.{key}"] = result["load"]["overall"][key]
+    for name, s in result["load"]["requests"].items():
+        out[f"load.{name}.p95_ms"] = s["p95_ms"]
+    return out
+
+
+def compare(before, after):
+    a, b = _metrics(before), _metrics(after)
+    rows = []
+    for key in sorted(a.keys() | b.keys()):
+        old, new = a.get(key), b.get(key)
+        change = round((new - old) / old * 100, 1) if old and new is not None else None
+        rows.append({"metric": key, "before": old, "after": new, "change_pct": change})
+    return rows
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--scale", choices=SCALES, default="medium")
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--out", help="write the JSON result here (default: stdout)")
+    ap.add_argument("--compare", nargs=2, metavar=("BEFORE", "AFTER"), help="diff two result files")
+    args = ap.parse_args(argv)
+
+    if args.compare:
+        with open(args.compare[0]) as f1, open(args.compare[1]) as f2:
+            rows = compare(json.load(f1), json.load(f2))
+        for r in rows:
+            change = "" if r["change_pct"] is None else f"{r['change_pct']:+.1f}%"
+            print(f"{r['metric']:<45} {r['before']!s:>10} -> {r['after']!s:>10}  {change}")
+        return rows
+
+    result = run(args.scale, args.seed)
+    text = json.dumps(result, indent=2)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"Wrote {args.out}", file=sys.stderr)
+    else:
+        print(text)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""First-render latency of the heaviest templates, with and without the
+Jinja bytecode cache.
+
+Every trial runs in a fresh interpreter, so it measures what a newly started
+worker pays on its first dashboard/records render.
+
+    python -m benchmarks.template_cold_start [--trials 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TEMPLATES = ("base.html", "index.html", "records.html")
+
+# executed in the child interpreter; prints {template: ms}
+_CHILD = r"""
+import json, time
+from flask import render_template
+from app import create_app
+
+app = create_app()
+ctx = {
+    "index.html": dict(income=0, expense=0, balance=0, has_income=False, has_expense=False,
+                       chart_data_url="/chart-data", scope="month", base_date_str="2025-01-01",
+                       bucket="day", buckets=("day", "week", "month", "quarter", "year"),
+                       range_args={"scope": "month", "date": "2025-01-01", "bucket": "day"},
+                       prev_args={"scope": "month", "date": "2024-12-01", "bucket": "day"},
+                       next_args={"scope": "month", "date": "2025-02-01", "bucket": "day"},
+                       from_str="2025-01-01", to_str="2025-01-31", period_title="2025-01"),
+    "records.html": dict(records=[], categories=[], sort="desc", per="20", pagination=None,
+                         p=1, total=0, start=1, end=0, f_category="", f_type="",
+                         f_from="", f_to="", f_q=""),
+    "base.html": {},
+}
+out = {}
+with app.test_request_context("/"):
+    for name in %(templates)r:
+        t0 = time.perf_counter()
+        render_template(name, **ctx[name])
+        out[name] = (time.perf_counter() - t0) * 1000
+print(json.dumps(out))
+"""
+
+
+def _run_child(cache_dir: str) -> dict:
+    env = dict(os.environ, JINJA_BYTECODE_CACHE_DIR=cache_dir)
+    code = _CHILD % {"templates": TEMPLATES}
+    res = subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env,
+                         capture_output=True, text=True, check=True)
+    return json.loads(res.stdout.strip().splitlines()[-1])
+
+
+def _summary(samples):
+    return {name: round(statistics.median(s[name] for s in samples), 3) for name in TEMPLATES}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--trials", type=int, default=10)
+    args = ap.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as cache_dir:
+        _run_child(cache_dir)  # populate the cache (the Docker build step)
+        cold = [_run_child("") for _ in range(args.trials)]
+        warm = [_run_child(cache_dir) for _ in range(args.trials)]
+
+    result = {"trials": args.trials, "no_cache_ms": _summary(cold), "bytecode_cache_ms": _summary(warm)}
+    print(json.dumps(result, indent=2))
+    return result
+
+
+if __name__ == "__main__":
+    main()
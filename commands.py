@@ -0,0 +1,189 @@
+"""Flask CLI commands (`flask <command>`), registered in create_app."""
+import os
+import time
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from assets import build_assets
+from models.models import db, User
+from services import anomalies, balance, fx, hash_policy, importer, record_events, recurring, rollups
+
+
+@click.command("compile-templates")
+def compile_templates_cmd():
+    """Compile all templates (fills the bytecode cache, if enabled)."""
+    from app import precompile_templates
+
+    n = precompile_templates(current_app)
+    cache_dir = current_app.config.get("JINJA_BYTECODE_CACHE_DIR")
+    click.echo(f"Compiled {n} templates into {cache_dir or '(no bytecode cache)'}")
+
+
+@click.command("build-assets")
+def build_assets_cmd():
+    """Fingerprint and pre-compress static/css + static/js into static/dist."""
+    manifest = build_assets(current_app.static_folder)
+    for src, hashed in manifest.items():
+        click.echo(f"{src} -> {hashed}")
+
+
+# ---------- password hash policy ----------
+
+hash_policy_cli = AppGroup("hash-policy", help="Password hash cost policy.")
+
+@hash_policy_cli.command("calibrate")
+@click.option("--target-ms", default=50.0, show_default=True, help="Wanted time for one hash.")
+@click.option("--algorithm", default="pbkdf2:sha256", show_default=True, help="pbkdf2:<hash> or scrypt.")
+@click.option("--dry-run", is_flag=True, help="Only print the result.")
+def calibrate_cmd(target_ms, algorithm, dry_run):
+    """Benchmark this machine and store the matching work factor."""
+    policy = hash_policy.calibrate(target_ms, algorithm)
+    click.echo(f"{policy['method']}  ~{policy['measured_ms']} ms/hash (target {target_ms} ms)")
+    if not dry_run:
+        path = hash_policy.save_policy(current_app, policy)
+        click.echo(f"Saved to {path}")
+
+@hash_policy_cli.command("show")
+def show_cmd():
+    """Print the active policy."""
+    policy = current_app.extensions["hash_policy"]
+    click.echo(f"{policy['method']} (source: {policy['source']}, "
+               f"~{hash_policy.measure_ms(policy['method'])} ms/hash here)")
+
+@hash_policy_cli.command("stats")
+def stats_cmd():
+    """Count stored password hashes per algorithm/cost."""
+    stats = hash_policy.algorithm_counts(h for (h,) in db.session.query(User.password))
+    for method, n in stats["methods"].items():
+        click.echo(f"{n:>8}  {method}")
+    click.echo(f"{stats['stale']:>8}  stale (re-hashed on next login)")
+
+
+# ---------- pet.py ledgers -> web database ----------
+
+ledger_cli = AppGroup("ledger", help="Bulk-load pet.py CSV ledgers.")
+
+@ledger_cli.command("import")
+@click.option("--user", "username", required=True, help="Owner of the imported records.")
+@click.option("--workers", default=os.cpu_count() or 1, show_default=True,
+              help="Parallel parse/fingerprint processes (0 = in this process).")
+@click.option("--batch-size", default=5000, show_default=True, help="Rows per INSERT batch.")
+@click.option("--no-categories", is_flag=True, help="Don't create missing categories.")
+@click.argument("files", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+def ledger_import_cmd(username, workers, batch_size, no_categories, files):
+    """Import FILES for a user; rows already in the database are skipped."""
+    user = User.query.filter_by(username=username).first()
+    if not user:
+        raise click.ClickException(f"No such user: {username}")
+
+    started = time.perf_counter()
+    totals = {"rows": 0, "inserted": 0, "duplicates": 0, "errors": 0}
+
+    def load(parsed):
+        # the database side stays in this process (one writer), files are parsed in the pool
+        t = time.perf_counter()
+        stats = importer.bulk_insert(user.id, parsed["rows"], batch_size, not no_categories)
+        took = time.perf_counter() - t
+        n = len(parsed["rows"])
+        totals["rows"] += n
+        totals["inserted"] += stats["inserted"]
+        totals["duplicates"] += stats["duplicates"]
+        totals["errors"] += len(parsed["errors"])
+        click.echo(f"{parsed['path']}: {stats['inserted']} inserted, {stats['duplicates']} duplicates, "
+                   f"{len(parsed['errors'])} bad rows ({n / took if took else 0:,.0f} rows/s)")
+
+    if workers > 0 and len(files) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(files))) as pool:
+            futures = [pool.submit(importer.parse_ledger_file, path, user.id) for path in files]
+            for fut in as_completed(futures):
+                load(fut.result())
+    else:
+        for path in files:
+            load(importer.parse_ledger_file(path, user.id))
+
+    took = time.perf_counter() - started
+    click.echo(f"Total: {len(files)} files, {totals['rows']} rows, {totals['inserted']} inserted, "
+               f"{totals['duplicates']} duplicates, {totals['errors']} bad rows "
+               f"in {took:.2f}s ({totals['rows'] / took if took else 0:,.0f} rows/s)")
+
+
+# ---------- dashboard rollups ----------
+
+rollups_cli = AppGroup("rollups", help="Monthly dashboard rollups and running-balance checkpoints.")
+
+@rollups_cli.command("rebuild")
+def rollups_rebuild_cmd():
+    """Recompute the monthly rollups and balance checkpoints from the records."""
+    started = time.perf_counter()
+    n = rollups.rebuild_all()
+    checkpoints = balance.rebuild_all(db.session.connection())
+    db.session.commit()
+    click.echo(f"{n} rollup rows, {checkpoints} balance checkpoints in {time.perf_counter() - started:.2f}s")
+
+
+# ---------- unusual expenses ----------
+
+anomalies_cli = AppGroup("anomalies", help="Unusual expenses (far above the category's norm, duplicates).")
+
+@anomalies_cli.command("scan")
+def anomalies_scan_cmd():
+    """Re-check every expense and rebuild the per-category stats; run nightly."""
+    started = time.perf_counter()
+    result = anomalies.scan_all()
+    click.echo(f"{result['records']} expenses: {result['amount']} unusual amounts, {result['duplicate']} duplicates, "
+               f"{result['changed']} flags changed in {time.perf_counter() - started:.2f}s")
+
+
+# ---------- recurring rules ----------
+
+recurring_cli = AppGroup("recurring", help="Recurring rules (rent, salary, subscriptions).")
+
+@recurring_cli.command("run")
+@click.option("--until", "until", default=None, help="Materialize up to this date (YYYY-MM-DD, default today).")
+@click.option("--batch-size", default=None, type=int, help="Rows per INSERT batch (default RECURRING_BATCH_SIZE).")
+def recurring_run_cmd(until, batch_size):
+    """Write every due occurrence of every rule; safe to re-run."""
+    try:
+        until = datetime.strptime(until, "%Y-%m-%d").date() if until else None
+    except ValueError:
+        raise click.BadParameter("expected YYYY-MM-DD", param_hint="--until")
+    started = time.perf_counter()
+    stats = recurring.materialize(until, batch_size=batch_size or current_app.config["RECURRING_BATCH_SIZE"])
+    took = time.perf_counter() - started
+    click.echo(f"{stats['rules']} rules, {stats['inserted']} records inserted, {stats['skipped']} already there "
+               f"in {took:.2f}s ({stats['inserted'] / took if took else 0:,.0f} rows/s)")
+
+
+# ---------- FX rates ----------
+
+fx_cli = AppGroup("fx", help="Exchange rates for records in other currencies.")
+
+@fx_cli.command("import")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+def fx_import_cmd(path):
+    """Load a date,currency,rate CSV (rate = base-currency value of one unit)."""
+    started = time.perf_counter()
+    with open(path, encoding="utf-8-sig") as f:
+        rows, errors = fx.parse_rates(f.read())
+    n = fx.import_rates(rows)
+    # amounts in base currency moved with the rates: every listener re-derives the users who hold
+    # foreign records (rollups, balances, budgets, anomaly stats, data_version) in this transaction
+    users = fx.foreign_users()
+    record_events.publish(db.session.connection(), users=users)
+    db.session.commit()
+    click.echo(f"{n} rates, {len(errors)} bad rows, {len(users)} users re-derived "
+               f"in {time.perf_counter() - started:.2f}s")
+
+def register_commands(app):
+    app.cli.add_command(compile_templates_cmd)
+    app.cli.add_command(build_assets_cmd)
+    app.cli.add_command(hash_policy_cli)
+    app.cli.add_command(ledger_cli)
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(anomalies_cli)
+    app.cli.add_command(recurring_cli)
+    app.cli.add_command(fx_cli)
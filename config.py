@@ -5,12 +5,74 @@ class Config:
     SECRET_KEY = os.environ.get("SECRET_KEY", "devkey")
     SQLALCHEMY_TRACK_MODIFICATIONS = False
 
+    # compiled Jinja bytecode (pre-populated in the Docker image); "" disables it
+    JINJA_BYTECODE_CACHE_DIR = os.environ.get(
+        "JINJA_BYTECODE_CACHE_DIR",
+        os.path.join(BASE_DIR, ".jinja_cache")
+    )
+
+    # on-the-fly compression of HTML/JSON/CSV responses (see assets.py)
+    COMPRESS_MIN_SIZE = int(os.environ.get("COMPRESS_MIN_SIZE", 1024))  # bytes
+    COMPRESS_GZIP_LEVEL = 6
+    COMPRESS_BROTLI_QUALITY = 4
+
+    # password KDF pool (services/passwords.py); 0 workers = hash inline. Per gunicorn worker:
+    # by default the cores shared out over WEB_CONCURRENCY, at least 1 each
+    PASSWORD_POOL_WORKERS = int(os.environ.get("PASSWORD_POOL_WORKERS", max(
+        1, (os.cpu_count() or 1) // int(os.environ.get("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1)))))
+    PASSWORD_QUEUE_DEPTH = int(os.environ.get("PASSWORD_QUEUE_DEPTH", 2))
+    PASSWORD_TIMEOUT = 10.0  # seconds
+
+    # explicit KDF method (e.g. "pbkdf2:sha256:600000"); unset = calibrated policy
+    PASSWORD_HASH_METHOD = os.environ.get("PASSWORD_HASH_METHOD")
+
+    # login token buckets (per username; per IP gets 4x the burst)
+    LOGIN_RATE_PER_MINUTE = float(os.environ.get("LOGIN_RATE_PER_MINUTE", 10))
+    LOGIN_RATE_BURST = int(os.environ.get("LOGIN_RATE_BURST", 5))
+
+    # dashboard charts (/chart-data): pies keep the top N-1 categories + "Other",
+    # the monthly bars are merged down to at most CHART_MAX_POINTS
+    CHART_MAX_SLICES = int(os.environ.get("CHART_MAX_SLICES", 8))
+    CHART_MAX_POINTS = int(os.environ.get("CHART_MAX_POINTS", 60))
+
+    # recurring rules (services/recurring.py): background run every N seconds (0 = off, use the CLI)
+    RECURRING_INTERVAL_SECONDS = float(os.environ.get("RECURRING_INTERVAL_SECONDS", 0))
+    RECURRING_BATCH_SIZE = int(os.environ.get("RECURRING_BATCH_SIZE", 5000))
+    # the worker whose scheduler holds an flock on this file runs it; the others wait their turn
+    RECURRING_LOCK_FILE = os.environ.get("RECURRING_LOCK_FILE", os.path.join(BASE_DIR, "instance", "recurring.lock"))
+
+    # currencies (services/fx.py): records without a currency are in BASE_CURRENCY, which is
+    # also what rollups/balances/budgets are kept in; reports default to REPORTING_CURRENCY
+    BASE_CURRENCY = os.environ.get("BASE_CURRENCY", "BGN").upper()
+    REPORTING_CURRENCY = os.environ.get("REPORTING_CURRENCY", BASE_CURRENCY).upper()
+    FX_CACHE_SIZE = int(os.environ.get("FX_CACHE_SIZE", 4096))  # cached (currency, date) rates
+
+    # unusual expenses (services/anomalies.py): flag amounts over mean + ANOMALY_SIGMA x std of the
+    # category, once it has ANOMALY_MIN_COUNT expenses
+    ANOMALY_SIGMA = float(os.environ.get("ANOMALY_SIGMA", 5))
+    ANOMALY_MIN_COUNT = int(os.environ.get("ANOMALY_MIN_COUNT", 10))
+
+    # per-process columnar copy of hot users' records (services/columnar.py) for the dashboard
+    # and /api/reports, least recently used out past this many bytes (0 = off, always SQL)
+    COLUMN_CACHE_BYTES = int(os.environ.get("COLUMN_CACHE_BYTES", 64 * 2**20))
+
+    # request instrumentation (services/metrics.py): /metrics, Server-Timing header,
+    # sampling profiler for requests slower than PROFILE_SLOW_MS (0 = off)
+    METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") != "0"
+    # who may read /metrics: these client addresses, or anyone sending "Authorization: Bearer <METRICS_TOKEN>"
+    METRICS_ALLOW = [a.strip() for a in os.environ.get("METRICS_ALLOW", "127.0.0.1,::1").split(",") if a.strip()]
+    METRICS_TOKEN = os.environ.get("METRICS_TOKEN", "")
+    SERVER_TIMING = os.environ.get("SERVER_TIMING", "0") == "1"
+    PROFILE_SLOW_MS = float(os.environ.get("PROFILE_SLOW_MS", 0))
+    PROFILE_INTERVAL_MS = float(os.environ.get("PROFILE_INTERVAL_MS", 5))
+    PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(BASE_DIR, "instance", "profiles"))
+
 class DevConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = "sqlite:///" + os.path.join(BASE_DIR, "expense.db")
 
 class ProdConfig(Config):
-     DEBUG = False
+    DEBUG = False
     # Ако имаш DATABASE_URL (Postgres/MySQL/SQLite), ползвай него; иначе падни към локален sqlite
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         "DATABASE_URL",
@@ -0,0 +1,42 @@
+import os
+
+# gunicorn settings; override via env (WEB_CONCURRENCY, GUNICORN_THREADS, PORT)
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get("WEB_CONCURRENCY", (os.cpu_count() or 1) * 2 + 1))
+threads = int(os.environ.get("GUNICORN_THREADS", "4"))
+worker_class = "gthread"
+timeout = 30
+graceful_timeout = 30
+keepalive = 5
+
+# build the app (and compile templates) once in the master, then fork
+preload_app = True
+
+accesslog = "-"
+errorlog = "-"
+
+
+def post_fork(server, worker):
+    # the DB pool must be (re)opened per worker, never shared across fork
+    from wsgi import app
+    from app import warm_engine
+    from services.passwords import warm_pool
+    from services.recurring import start_scheduler
+
+    warm_engine(app)
+    # start this worker's KDF pool before the first login hits it
+    with app.app_context():
+        warm_pool()
+    # RECURRING_INTERVAL_SECONDS > 0: materialize due recurring rules; only the worker holding
+    # RECURRING_LOCK_FILE does, the others take over if it goes away
+    start_scheduler(app)
+    server.log.info("worker %s: engine warmed, %s templates precompiled",
+                    worker.pid, app.extensions["warmup"]["templates"])
+
+
+def worker_exit(server, worker):
+    # let a run in progress finish and free RECURRING_LOCK_FILE for the next worker
+    from wsgi import app
+    from services.recurring import stop_scheduler
+
+    stop_scheduler(app, timeout=graceful_timeout)
@@ -1,7 +1,9 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import UniqueConstraint
+from sqlalchemy import UniqueConstraint, event, inspect, select
 from flask_login import UserMixin
-from werkzeug.security import generate_password_hash, check_password_hash
+from services.passwords import hash_password, verify_password
+from services.hash_policy import current_method, needs_rehash
+from services.fingerprints import fingerprint
 
 db = SQLAlchemy()
 
@@ -9,16 +11,31 @@ class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
     username = db.Column(db.String(50), unique=True, nullable=False)
     password = db.Column(db.String(200), nullable=False)
+    # bumped with every change to the user's records (services/reports.py cache key)
+    data_version = db.Column(db.Integer, nullable=False, default=0, server_default="0")
 
     # cascading deletion of records/categories when deleting a user
     records = db.relationship("Record", backref="user", lazy=True, cascade="all, delete-orphan")
     categories = db.relationship("Category", backref="user", lazy=True, cascade="all, delete-orphan")
+    rollups = db.relationship("MonthlyRollup", lazy=True, cascade="all, delete-orphan")
+    balance_checkpoints = db.relationship("BalanceCheckpoint", lazy=True, cascade="all, delete-orphan")
+    recurring_rules = db.relationship("RecurringRule", lazy=True, cascade="all, delete-orphan")
+    budgets = db.relationship("Budget", lazy=True, cascade="all, delete-orphan")
+    category_stats = db.relationship("CategoryStat", lazy=True, cascade="all, delete-orphan")
 
     def set_password(self, password: str) -> None:
-        self.password = generate_password_hash(password, method="pbkdf2:sha256")
+        # KDF runs in the bounded pool (services/passwords.py); may raise PasswordBusy
+        self.password = hash_password(password, method=current_method())
 
     def check_password(self, candidate: str) -> bool:
-        return check_password_hash(self.password, candidate)
+        return verify_password(self.password, candidate)
+
+    def upgrade_password(self, password: str) -> bool:
+        """After a successful login: re-hash if the stored hash is off-policy."""
+        if not needs_rehash(self.password):
+            return False
+        self.set_password(password)
+        return True
 
 class Record(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -27,8 +44,167 @@ class Record(db.Model):
     category = db.Column(db.String(50), nullable=False)
     amount = db.Column(db.Float, nullable=False)
     description = db.Column(db.Text, default="")
+    currency = db.Column(db.String(3), nullable=True)          # ISO code; NULL = base currency (services/fx.py)
+
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+
+    # content hash for import dedup (services/fingerprints.py), kept current by the hooks below
+    fingerprint = db.Column(db.String(40))
+
+    # set on occurrences materialized from a RecurringRule (services/recurring.py)
+    rule_id = db.Column(db.Integer, nullable=True)
+
+    # 'amount' | 'duplicate' when services/anomalies.py flagged it; NULL = nothing unusual
+    anomaly = db.Column(db.String(10), nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_record_user_fingerprint", "user_id", "fingerprint"),
+        db.Index("ix_record_user_date", "user_id", "date"),
+        # one record per rule and occurrence date; NULLs (ordinary records) don't collide
+        UniqueConstraint("rule_id", "date", name="uq_record_rule_date"),
+    )
+
+    def compute_fingerprint(self, occurrence=0) -> str:
+        return fingerprint(self.user_id, self.date, self.type, self.category, self.amount,
+                           self.description, occurrence)
+
+_FINGERPRINT_FIELDS = ("user_id", "date", "type", "category", "amount", "description")
+
+def _free_fingerprint(connection, target, window=8):
+    """First fingerprint ordinal not taken by another of the user's records.
+
+    A second identical coffee added by hand gets occurrence 1, like it would
+    in an import (importer.fingerprint_rows), so importing an export of both
+    maps them onto the stored rows instead of dropping one as a duplicate.
+    Ordinals handed out earlier in this transaction count as taken (several
+    records of one flush are fingerprinted before any of them is inserted).
+    """
+    txn = connection.get_transaction()
+    claimed = connection.info.get("claimed_fingerprints")
+    if claimed is None or claimed[0] is not txn:
+        claimed = connection.info["claimed_fingerprints"] = (txn, set())
+    start = 0
+    while True:
+        fps = [target.compute_fingerprint(n) for n in range(start, start + window)]
+        query = select(Record.fingerprint).where(Record.user_id == target.user_id, Record.fingerprint.in_(fps))
+        if target.id is not None:
+            query = query.where(Record.id != target.id)
+        taken = set(connection.scalars(query)) | claimed[1]
+        for fp in fps:
+            if fp not in taken:
+                claimed[1].add(fp)
+                return fp
+        start += window
+
+@event.listens_for(Record, "before_insert")
+def _fingerprint_on_insert(mapper, connection, target):
+    # imports set it themselves (ordinals within the file); single adds take the next free one
+    if target.fingerprint is None:
+        target.fingerprint = _free_fingerprint(connection, target)
+
+@event.listens_for(Record, "before_update")
+def _fingerprint_on_update(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[f].history.has_changes() for f in _FINGERPRINT_FIELDS):
+        target.fingerprint = _free_fingerprint(connection, target)
+
+class MonthlyRollup(db.Model):
+    """Per user/month/type/category sums, kept current by services/rollups.py."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    month = db.Column(db.String(7), nullable=False)           # 'YYYY-MM'
+    type = db.Column(db.String(10), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    amount = db.Column(db.Float, nullable=False, default=0)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "month", "type", "category", name="uq_rollup_key"),
+    )
+
+class RecurringRule(db.Model):
+    """Rent, salary, subscriptions: materialized into records by services/recurring.py."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    type = db.Column(db.String(10), nullable=False)           # 'income' | 'expense'
+    category = db.Column(db.String(50), nullable=False)
+    amount = db.Column(db.Float, nullable=False)
+    description = db.Column(db.Text, default="")
+    frequency = db.Column(db.String(10), nullable=False)      # 'daily' | 'weekly' | 'monthly' | 'yearly'
+    interval = db.Column(db.Integer, nullable=False, default=1)
+    start_date = db.Column(db.String(10), nullable=False)     # 'YYYY-MM-DD', also the day-of-month anchor
+    end_date = db.Column(db.String(10), nullable=True)
+    next_date = db.Column(db.String(10), nullable=True)       # next occurrence to materialize; NULL = finished
+
+    __table_args__ = (
+        db.Index("ix_rule_next_date", "next_date"),
+    )
+
+class Budget(db.Model):
+    """Monthly spending limit for one expense category; spend comes from MonthlyRollup."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    limit = db.Column(db.Float, nullable=False)
+
+    alerts = db.relationship("BudgetAlert", lazy=True, cascade="all, delete-orphan")
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "category", name="uq_budget_user_category"),
+    )
+
+class BudgetAlert(db.Model):
+    """Written when a budget's month goes over its limit (services/budgets.py), once per month."""
+    id = db.Column(db.Integer, primary_key=True)
+    budget_id = db.Column(db.Integer, db.ForeignKey("budget.id"), nullable=False)
+    user_id = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.String(7), nullable=False)           # 'YYYY-MM'
+    spent = db.Column(db.Float, nullable=False)
+    limit = db.Column(db.Float, nullable=False)
+    created_at = db.Column(db.String(19), nullable=False)     # 'YYYY-MM-DD HH:MM:SS'
+
+    __table_args__ = (
+        UniqueConstraint("budget_id", "month", name="uq_budget_alert_month"),
+        db.Index("ix_budget_alert_user", "user_id", "month"),
+    )
+
+class CategoryStat(db.Model):
+    """Running count/mean/M2 (Welford) of a user's expense amounts per category, base currency;
+    kept current by services/anomalies.py."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    category = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    mean = db.Column(db.Float, nullable=False, default=0)
+    m2 = db.Column(db.Float, nullable=False, default=0)
+
+    __table_args__ = (
+        UniqueConstraint("user_id", "category", name="uq_category_stat"),
+    )
 
+class BalanceCheckpoint(db.Model):
+    """Running balance after every Nth record in (date, id) order, kept by services/balance.py."""
+    id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"), nullable=False)
+    date = db.Column(db.String(10), nullable=False)           # key of the record it ends at
+    record_id = db.Column(db.Integer, nullable=False)
+    position = db.Column(db.Integer, nullable=False)          # records up to and including it
+    balance = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        db.Index("ix_checkpoint_user_key", "user_id", "date", "record_id"),
+    )
+
+class FxRate(db.Model):
+    """Value of one unit of `currency` in the base currency on `date`, loaded by `flask fx import`."""
+    id = db.Column(db.Integer, primary_key=True)
+    currency = db.Column(db.String(3), nullable=False)
+    date = db.Column(db.String(10), nullable=False)           # 'YYYY-MM-DD'
+    rate = db.Column(db.Float, nullable=False)
+
+    __table_args__ = (
+        UniqueConstraint("currency", "date", name="uq_fx_currency_date"),
+    )
 
 class Category(db.Model):
     id = db.Column(db.Integer, primary_key=True)
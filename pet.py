@@ -1,16 +1,31 @@
+import argparse
 import csv
+import json
 import os
+import sys
 from datetime import datetime
-import matplotlib.pyplot as plt
-from collections import defaultdict
+from decimal import Decimal, InvalidOperation
+from pet_ledger import Ledger
 
 FILE_NAME = "expenses.csv"
+# ledger amounts carry no currency; this is only the label printed next to them
+CURRENCY = os.environ.get("PET_CURRENCY", "BGN")
 
-#Check if file exists, otherwise create it with header
-if not os.path.exists(FILE_NAME):
-	with open(FILE_NAME, "w", newline="", encoding="utf-8") as file:
-		writer = csv.writer(file)
-		writer.writerow(["date", "type", "category", "amount", "description"])
+# opened once per invocation (see open_ledger); index lives in expenses.csv.idx.json (+ .idx.log),
+# the NumPy column cache (PET_COLUMNAR=0 to disable) in expenses.csv.cols.*
+ledger = None
+
+def open_ledger(path=FILE_NAME, columnar=None):
+	global ledger
+	if columnar is None:
+		columnar = os.environ.get("PET_COLUMNAR", "1") != "0"
+	# creates the file (with header) if missing
+	ledger = Ledger(path, columnar=columnar)
+	return ledger
+
+def _aggregates():
+	# vectorized column cache when enabled, otherwise the sidecar index
+	return ledger.columns() or ledger
 
 def add_record():
 	date = datetime.now().strftime("%Y-%m-%d")
@@ -19,75 +34,70 @@ def add_record():
 	amount = float(input("Amount: "))
 	description = input("Description: " ).strip()
 
-	with open(FILE_NAME,"a", newline="", encoding="utf-8") as file:
-		writer = csv.writer(file)
-		writer.writerow([date, entry_type, category, amount, description])
+	ledger.append([[date, entry_type, category, amount, description]])
 
 	print("Record added successfully!")
 
 def view_records():
-	with open(FILE_NAME, "r", encoding="utf-8") as file:
-		reader = csv.reader(file)
-		next(reader) #skip header
-		for row in reader:
-			print(row)
+	for row in ledger.all_rows():
+		print(list(row.values()))
 
 def calculate_balance():
-	balance = 0
-	income = 0
-	expense = 0
-	with open(FILE_NAME, "r", encoding="utf-8") as file:
-		reader = csv.DictReader(file)
-		for row in reader:
-			amount = float(row["amount"])
-			if row["type"] == "income":
-				balance += amount
-				income += amount
-			elif row["type"] == "expense":
-				balance -= amount
-				expense += amount
-	print(f"Current balance: {balance:.2f} BGN")
-	print(f"Total income: {income:.2f} BGN")
-	print(f"Total expense: {expense:.2f} BGN")
-
-def filter_by_category():
-	category = input("Enter category to filter: ").strip().lower()
-	total = 0
-	with open(FILE_NAME, "r", encoding="utf-8") as file:
-		reader = csv.DictReader(file)
+	totals = _aggregates().totals()  # no CSV parsing
+	print(f"Current balance: {totals['balance'] / 100:.2f} {CURRENCY}")
+	print(f"Total income: {totals['income'] / 100:.2f} {CURRENCY}")
+	print(f"Total expense: {totals['expense'] / 100:.2f} {CURRENCY}")
+	return totals
+
+def filter_by_category(category=None, show_rows=True):
+	if category is None:
+		category = input("Enter category to filter: ")
+	category = category.strip().lower()
+	cat = ledger.category(category)
+	if show_rows:
 		print(f"\n == Records in category '{category}' ===")
-		for row in reader:
-			if row["category"].lower() == category:
-				print(row)
-				total += float(row["amount"])
-	print(f"Total for category '{category}': {total:.2f} BGN")
-
-def filter_by_month():
-	year_month = input("Enter month (YYYY-MM): ").strip()
-	total_income = 0
-	total_expense = 0
-	with open(FILE_NAME, "r", encoding="utf-8") as file:
-		reader = csv.DictReader(file)
+		for row in ledger.rows_at(cat["offsets"]):
+			print(row)
+	total = cat["income"] + cat["expense"]
+	print(f"Total for category '{category}': {total / 100:.2f} {CURRENCY}")
+	return cat
+
+def _month(year_month):
+	cols = ledger.columns()
+	month = cols.month(year_month) if cols else None
+	if month is None:  # not a plain YYYY[-MM[-DD]] prefix
+		month = ledger.month(year_month)
+	return month
+
+def filter_by_month(year_month=None, show_rows=True):
+	if year_month is None:
+		year_month = input("Enter month (YYYY-MM): ")
+	year_month = year_month.strip()
+	month = _month(year_month)
+	if show_rows:
 		print(f"\n=== Records for {year_month} ===")
-		for row in reader:
-		 	if row["date"].startswith(year_month):
-		 		print(row)
-		 		amount = float(row["amount"])
-		 		if row["type"] == "income":
-		 			total_income += amount
-		 		elif row["type"] == "expense":
-		 			total_expense += amount
-	print(f"Income for {year_month}: {total_income:.2f} BGN")
-	print(f"Expense for {year_month}: {total_expense:.2f} BGN")
-	print(f"Net: {(total_income - total_expense):.2f} BGN")
-
-def plot_expenses_by_category():
-	categories = defaultdict(float)
-	with open(FILE_NAME, "r", encoding="utf-8") as file:
-		reader = csv.DictReader(file)
-		for row in reader:
-			if row["type"] == "expense":
-				categories[row["category"]] += float(row["amount"])
+		for row in ledger.rows_at(month["offsets"]):
+			print(row)
+	total_income = month["income"] / 100
+	total_expense = month["expense"] / 100
+	print(f"Income for {year_month}: {total_income:.2f} {CURRENCY}")
+	print(f"Expense for {year_month}: {total_expense:.2f} {CURRENCY}")
+	print(f"Net: {(total_income - total_expense):.2f} {CURRENCY}")
+	return month
+
+def _finish_plot(plt, out):
+	# interactive window from the menu, PNG file from the batch CLI
+	if out:
+		plt.savefig(out, dpi=100)
+		plt.close()
+		print(f"Saved {out}")
+	else:
+		plt.show()
+
+def plot_expenses_by_category(out=None):
+	import matplotlib.pyplot as plt
+
+	categories = {name: cents / 100 for name, cents in _aggregates().expenses_by_category().items()}
 
 	if not categories:
 		print("No expenses found!")
@@ -96,32 +106,21 @@ def plot_expenses_by_category():
 	plt.figure(figsize=(6, 6))
 	plt.pie(categories.values(), labels=categories.keys(), autopct="%1.1f%%", startangle=90)
 	plt.title("Expenses by category")
-	plt.show()
+	_finish_plot(plt, out)
 
-def plot_monthly_summary():
-	monthly_income = defaultdict(float)
-	monthly_expense = defaultdict(float)
+def plot_monthly_summary(out=None):
+	import matplotlib.pyplot as plt
 
-	with open(FILE_NAME, "r", encoding="utf-8") as file:
-		reader = csv.DictReader(file)
-		for row in reader:
-			date_obj = datetime.strptime(row["date"], "%Y-%m-%d")
-			year_month = date_obj.strftime("%Y-%m")
+	monthly = _aggregates().monthly()
 
-			amount = float(row["amount"])
-			if row["type"] == "income":
-				monthly_income[year_month] += amount
-			elif row["type"] == "expense":
-				monthly_expense[year_month] += amount
-
-	if not monthly_income and not monthly_expense:
+	if not monthly:
 		print("No data found!")
 		return
 
-	month = sorted(set(list(monthly_income.keys()) + list(monthly_expense.keys())))
+	month = list(monthly.keys())
 
-	income_vals = [monthly_income[m] for m in month]
-	expense_vals = [monthly_expense[m] for m in month]
+	income_vals = [inc / 100 for inc, _ in monthly.values()]
+	expense_vals = [exp / 100 for _, exp in monthly.values()]
 
 	x = range(len(month))
 	plt.figure(figsize=(8, 5))
@@ -130,10 +129,10 @@ def plot_monthly_summary():
 	plt.xticks(x,month, rotation=45)
 	plt.title("Monthly Income vs Expense")
 	plt.xlabel("Month")
-	plt.ylabel("Amount (BGN)")
+	plt.ylabel(f"Amount ({CURRENCY})")
 	plt.legend()
 	plt.tight_layout()
-	plt.show()
+	_finish_plot(plt, out)
 
 def menu():
 	while True:
@@ -169,5 +168,142 @@ def menu():
 		else:
 			print("Invalid selection!")
 
+# ---------- batch / scriptable mode ----------
+
+def _validate(row):
+	"""Normalise one input row (dict with the CSV header keys) or raise ValueError."""
+	date = (row.get("date") or "").strip() or datetime.now().strftime("%Y-%m-%d")
+	datetime.strptime(date, "%Y-%m-%d")
+	entry_type = (row.get("type") or "").strip().lower()
+	if entry_type not in ("income", "expense"):
+		raise ValueError("type must be income or expense")
+	category = (row.get("category") or "").strip() or "Uncategorized"
+	try:
+		amount = Decimal((row.get("amount") or "").strip().replace(",", "."))
+	except InvalidOperation:
+		raise ValueError("amount is not a number")
+	if amount <= 0:
+		raise ValueError("amount must be positive")
+	return [date, entry_type, category, str(amount), (row.get("description") or "").strip()]
+
+def _emit(args, text_fn, payload):
+	# --json: one JSON object per query (for pipelines); otherwise the usual text
+	if args.json:
+		print(json.dumps(payload))
+	else:
+		text_fn()
+
+def _cents(v):
+	return round(v / 100, 2)
+
+def cmd_add(args):
+	row = _validate({"date": args.date, "type": args.type, "category": args.category,
+					 "amount": args.amount, "description": args.description})
+	ledger.append([row])
+	_emit(args, lambda: print("Record added successfully!"), {"added": 1})
+
+def cmd_import(args):
+	# many records in one append: stdin (default) or files, CSV with the ledger header
+	rows, errors = [], []
+	for path in args.files or ["-"]:
+		file = sys.stdin if path == "-" else open(path, newline="", encoding="utf-8-sig")
+		try:
+			reader = csv.DictReader(file)
+			reader.fieldnames = [(f or "").strip().lower() for f in reader.fieldnames or []]
+			for i, raw in enumerate(reader, start=2):
+				try:
+					rows.append(_validate(raw))
+				except ValueError as e:
+					errors.append(f"{path}:{i}: {e}")
+		finally:
+			if file is not sys.stdin:
+				file.close()
+
+	added = ledger.append(rows)
+	for err in errors:
+		print(f"skipped {err}", file=sys.stderr)
+	_emit(args, lambda: print(f"Imported {added} records, skipped {len(errors)}."),
+		  {"added": added, "skipped": len(errors)})
+	return 1 if errors and args.strict else 0
+
+def cmd_balance(args):
+	totals = _aggregates().totals()
+	_emit(args, calculate_balance, {k: _cents(v) for k, v in totals.items()})
+
+def cmd_month(args):
+	for ym in args.months:
+		month = _month(ym)
+		_emit(args, lambda: filter_by_month(ym, show_rows=args.rows),
+			  {"month": ym, "income": _cents(month["income"]), "expense": _cents(month["expense"]),
+			   "net": _cents(month["income"] - month["expense"]), "records": len(month["offsets"])})
+
+def cmd_category(args):
+	for name in args.names:
+		cat = ledger.category(name.strip().lower())
+		_emit(args, lambda: filter_by_category(name, show_rows=args.rows),
+			  {"category": name, "income": _cents(cat["income"]), "expense": _cents(cat["expense"]),
+			   "records": len(cat["offsets"])})
+
+def cmd_plot(args):
+	if args.kind in ("category", "all"):
+		plot_expenses_by_category(out=os.path.join(args.out_dir, "expenses_by_category.png"))
+	if args.kind in ("monthly", "all"):
+		plot_monthly_summary(out=os.path.join(args.out_dir, "monthly_summary.png"))
+
+def build_parser():
+	p = argparse.ArgumentParser(prog="pet.py", description="Personal Expense Tracker. Without a command: interactive menu.")
+	p.add_argument("--file", default=FILE_NAME, help="ledger CSV (default: %(default)s)")
+	p.add_argument("--no-columnar", action="store_true", help="don't use the NumPy column cache")
+	p.add_argument("--json", action="store_true", help="machine-readable output")
+	sub = p.add_subparsers(dest="command")
+
+	a = sub.add_parser("add", help="add one record")
+	a.add_argument("type", choices=["income", "expense"])
+	a.add_argument("category")
+	a.add_argument("amount")
+	a.add_argument("description", nargs="?", default="")
+	a.add_argument("--date", help="YYYY-MM-DD (default: today)")
+	a.set_defaults(func=cmd_add)
+
+	i = sub.add_parser("import", help="append many records (CSV: date,type,category,amount,description)")
+	i.add_argument("files", nargs="*", help="CSV files; '-' or nothing = stdin")
+	i.add_argument("--strict", action="store_true", help="exit 1 if any row was skipped")
+	i.set_defaults(func=cmd_import)
+
+	b = sub.add_parser("balance", help="total income/expense/balance")
+	b.set_defaults(func=cmd_balance)
+
+	m = sub.add_parser("month", help="totals for one or more months (YYYY-MM, YYYY, YYYY-MM-DD)")
+	m.add_argument("months", nargs="+")
+	m.add_argument("--rows", action="store_true", help="also print the records")
+	m.set_defaults(func=cmd_month)
+
+	c = sub.add_parser("category", help="totals for one or more categories")
+	c.add_argument("names", nargs="+")
+	c.add_argument("--rows", action="store_true", help="also print the records")
+	c.set_defaults(func=cmd_category)
+
+	pl = sub.add_parser("plot", help="write charts as PNG files")
+	pl.add_argument("kind", choices=["category", "monthly", "all"], nargs="?", default="all")
+	pl.add_argument("--out-dir", default=".", help="directory for the PNG files")
+	pl.set_defaults(func=cmd_plot)
+	return p
+
+def main(argv=None):
+	args = build_parser().parse_args(argv)
+	open_ledger(args.file, columnar=False if args.no_columnar else None)
+
+	if not args.command:
+		menu()
+		return 0
+
+	import matplotlib
+	matplotlib.use("Agg")  # batch mode: never open a window
+	try:
+		return args.func(args) or 0
+	except ValueError as e:
+		print(f"error: {e}", file=sys.stderr)
+		return 2
+
 if __name__ == "__main__":
-	menu()
\ No newline at end of file
+	sys.exit(main())
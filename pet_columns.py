@@ -0,0 +1,186 @@
+"""Columnar binary cache of the pet.py ledger (optional, NumPy).
+
+expenses.csv.cols.npy is a structured array, one element per row:
+
+  day     int32   days since 1970-01-01
+  cents   int64   amount in cents
+  type    uint8   0 = income, 1 = expense, 255 = other
+  cat     uint16  index into the category dictionary
+  offset  int64   byte offset of the row in the CSV (to print it)
+
+expenses.csv.cols.json holds the category dictionary and the CSV size/mtime
+it was built from. Categories are matched case-insensitively, like the
+index in pet_ledger.py; the first spelling seen is the label. The array is
+opened memory-mapped, so reductions run straight over the page cache; any
+size/mtime mismatch means a rebuild. Appends write only the new rows and
+the .npy header's row count, not the whole file.
+"""
+import io
+import json
+import os
+from datetime import date
+
+import numpy as np
+
+from pet_ledger import to_cents
+from services.aggregation import aggregate_columns
+
+DTYPE = np.dtype([("day", "<i4"), ("cents", "<i8"), ("type", "u1"), ("cat", "<u2"), ("offset", "<i8")])
+TYPE_CODES = {"income": 0, "expense": 1}
+OTHER_TYPE = 255
+COLUMNS_VERSION = 2  # 2: case-insensitive categories
+EPOCH = date(1970, 1, 1).toordinal()
+
+
+def day_number(iso: str) -> int:
+	return date.fromisoformat(iso).toordinal() - EPOCH
+
+
+def _prefix_range(prefix: str):
+	"""[start, end) day numbers for 'YYYY', 'YYYY-MM' or 'YYYY-MM-DD'; None otherwise."""
+	try:
+		if len(prefix) == 4:
+			y = int(prefix)
+			return day_number(f"{y:04d}-01-01"), day_number(f"{y + 1:04d}-01-01")
+		if len(prefix) == 7:
+			y, m = int(prefix[:4]), int(prefix[5:7])
+			ny, nm = (y + 1, 1) if m == 12 else (y, m + 1)
+			return day_number(f"{y:04d}-{m:02d}-01"), day_number(f"{ny:04d}-{nm:02d}-01")
+		if len(prefix) == 10:
+			d = day_number(prefix)
+			return d, d + 1
+	except ValueError:
+		pass
+	return None
+
+
+class ColumnStore:
+	def __init__(self, csv_path: str):
+		self.npy_path = csv_path + ".cols.npy"
+		self.meta_path = csv_path + ".cols.json"
+		self.data = np.empty(0, dtype=DTYPE)
+		self.categories = []
+		self.stamp = None
+		self._agg = None
+
+	# ---------- lifecycle ----------
+
+	def load(self, stamp: dict) -> bool:
+		"""Map the cache if it matches `stamp` (CSV size/mtime)."""
+		if self.stamp == stamp:
+			return True
+		try:
+			with open(self.meta_path, encoding="utf-8") as f:
+				meta = json.load(f)
+			if meta.get("version") != COLUMNS_VERSION or meta.get("stamp") != stamp:
+				return False
+			self.data = np.load(self.npy_path, mmap_mode="r") if meta["rows"] else np.empty(0, dtype=DTYPE)
+			self.categories = meta["categories"]
+			self.stamp = stamp
+			self._agg = None
+			return True
+		except (OSError, ValueError, KeyError):
+			return False
+
+	def _encode(self, scanned):
+		codes = {name.lower(): i for i, name in enumerate(self.categories)}
+		out = []
+		for offset, row in scanned:
+			try:
+				day = day_number(row["date"])
+				cents = to_cents(row["amount"])
+			except (KeyError, ValueError, ArithmeticError):
+				continue  # malformed rows are skipped, like in the index
+			cat = row.get("category", "")
+			if cat.lower() not in codes:
+				codes[cat.lower()] = len(self.categories)
+				self.categories.append(cat)
+			out.append((day, cents, TYPE_CODES.get(row.get("type"), OTHER_TYPE), codes[cat.lower()], offset))
+		return np.array(out, dtype=DTYPE)
+
+	def _save(self, data, stamp):
+		self.data = np.empty(0, dtype=DTYPE)  # drop the old mapping before replacing the file
+		tmp = self.npy_path + ".tmp.npy"
+		np.save(tmp, data)
+		os.replace(tmp, self.npy_path)
+		self._commit(len(data), stamp)
+
+	def _commit(self, rows, stamp):
+		# the stamp goes last: a crash before this line leaves a mismatch, i.e. a rebuild
+		with open(self.meta_path, "w", encoding="utf-8") as f:
+			json.dump({"version": COLUMNS_VERSION, "stamp": stamp, "rows": int(rows), "categories": self.categories}, f)
+		self.stamp = None
+		self.load(stamp)
+
+	def build(self, scanned, stamp: dict):
+		self.categories = []
+		self._save(self._encode(scanned), stamp)
+
+	def extend(self, scanned, stamp: dict):
+		"""Add freshly appended rows without re-reading the CSV: the rows go to the end
+		of the .npy file and only its header (the row count) is rewritten."""
+		new = self._encode(scanned)
+		rows = len(self.data) + len(new)
+		if not len(self.data):
+			self._save(new, stamp)
+			return
+		self.data = np.empty(0, dtype=DTYPE)  # drop the mapping before writing to the file
+		header = io.BytesIO()
+		np.lib.format.write_array_header_1_0(header, {"descr": np.lib.format.dtype_to_descr(DTYPE),
+													 "fortran_order": False, "shape": (rows,)})
+		with open(self.npy_path, "r+b") as f:
+			# NumPy pads the header so the row count can grow in place; otherwise write the file anew
+			in_place = np.lib.format.read_magic(f) == (1, 0)
+			if in_place:
+				np.lib.format.read_array_header_1_0(f)
+				in_place = f.tell() == len(header.getvalue())
+			if in_place:
+				f.seek(0, os.SEEK_END)
+				f.write(new.tobytes())
+				f.seek(0)
+				f.write(header.getvalue())
+		if in_place:
+			self._commit(rows, stamp)
+		else:
+			self._save(np.concatenate([np.load(self.npy_path), new]), stamp)
+
+	# ---------- vectorized queries (all amounts in cents) ----------
+
+	def _sums(self, mask):
+		d = self.data[mask]
+		income = int(d["cents"][d["type"] == 0].sum())
+		expense = int(d["cents"][d["type"] == 1].sum())
+		return income, expense
+
+	def aggregates(self) -> dict:
+		"""Totals, per-category and per-month sums in one vectorized pass (cached)."""
+		if self._agg is None:
+			months = self.data["day"].astype("datetime64[D]").astype("datetime64[M]")
+			labels, codes = np.unique(months, return_inverse=True)
+			self._agg = aggregate_columns(codes, [str(m) for m in labels], self.data["type"],
+										  self.data["cat"], self.categories, self.data["cents"])
+		return self._agg
+
+	def totals(self) -> dict:
+		agg = self.aggregates()
+		return {"income": agg["income"], "expense": agg["expense"], "balance": agg["balance"]}
+
+	def month(self, prefix: str):
+		"""Like Ledger.month(); None if `prefix` isn't a plain date prefix."""
+		rng = _prefix_range(prefix)
+		if rng is None:
+			return None
+		days = self.data["day"]
+		mask = (days >= rng[0]) & (days < rng[1])
+		income, expense = self._sums(mask)
+		offsets = np.sort(self.data["offset"][mask])
+		return {"income": income, "expense": expense, "offsets": offsets.tolist()}
+
+	def expenses_by_category(self) -> dict:
+		return {k: v for k, v in self.aggregates()["by_category"]["expense"].items() if v}
+
+	def monthly(self) -> dict:
+		"""{"YYYY-MM": (income_cents, expense_cents)}, sorted."""
+		agg = self.aggregates()
+		inc, exp = agg["by_month"]["income"], agg["by_month"]["expense"]
+		return {m: (inc.get(m, 0), exp.get(m, 0)) for m in agg["months"]}
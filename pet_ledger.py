@@ -0,0 +1,267 @@
+"""Append-only CSV ledger with a sidecar index, used by pet.py.
+
+expenses.csv stays the source of truth (same header as always). Next to it,
+expenses.csv.idx.json keeps:
+
+  - byte offsets of every row, grouped per month and per category
+  - running totals (in cents) per month, per category and overall
+
+append() updates the index in memory and writes only the new rows, as one
+JSON line, to the journal expenses.csv.idx.log; opening the ledger loads
+the snapshot and replays the journal. The snapshot is rewritten (and the
+journal emptied) once the journal holds more rows than the snapshot and at
+least JOURNAL_MIN, so an append costs O(its rows) amortized, not O(ledger).
+Balance / month / category queries never re-parse the whole CSV. If the CSV
+is edited outside pet.py (size or mtime no longer match the index and
+journal) or either file is damaged, the index is rebuilt on open.
+
+With columnar=True the ledger also maintains the NumPy column cache from
+pet_columns.py, which answers the aggregate queries with vectorized
+reductions.
+"""
+import csv
+import io
+import json
+import os
+from decimal import Decimal
+
+HEADER = ["date", "type", "category", "amount", "description"]
+INDEX_VERSION = 1
+JOURNAL_MIN = 1000  # journal rows before a snapshot rewrite is considered
+
+
+def to_cents(amount) -> int:
+	return int((Decimal(str(amount).strip()) * 100).to_integral_value())
+
+
+def _read_line(f) -> bytes:
+	# one CSV record; a quoted field may span several physical lines
+	line = f.readline()
+	while line and line.count(b'"') % 2 == 1:
+		more = f.readline()
+		if not more:
+			break
+		line += more
+	return line
+
+
+def _parse(line: bytes) -> dict:
+	values = next(csv.reader(io.StringIO(line.decode("utf-8"))), [])
+	return dict(zip(HEADER, values))
+
+
+def _empty_index() -> dict:
+	return {
+		"version": INDEX_VERSION,
+		"size": 0,
+		"mtime_ns": 0,
+		"rows": 0,
+		"totals": {"income": 0, "expense": 0},
+		"months": {},		# "YYYY-MM" -> {"income", "expense", "offsets"}
+		"categories": {},	# lower(name) -> {"name", "income", "expense", "offsets"}
+	}
+
+
+class Ledger:
+	def __init__(self, path: str, columnar: bool = False):
+		self.path = path
+		self.index_path = path + ".idx.json"
+		self.journal_path = path + ".idx.log"
+		self._journal_rows = 0
+		self._ensure_file()
+		self.index = self._load_index()
+		self._columns = None
+		if columnar:
+			from pet_columns import ColumnStore  # numpy is only needed here
+			self._columns = ColumnStore(path)
+
+	# ---------- file + index lifecycle ----------
+
+	def _ensure_file(self):
+		if not os.path.exists(self.path):
+			with open(self.path, "w", newline="", encoding="utf-8") as file:
+				csv.writer(file).writerow(HEADER)
+
+	def _stamp(self) -> dict:
+		st = os.stat(self.path)
+		return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+	def _load_index(self) -> dict:
+		try:
+			with open(self.index_path, encoding="utf-8") as f:
+				self.index = json.load(f)
+			if self.index.get("version") == INDEX_VERSION:
+				self._replay()
+				if all(self.index[k] == v for k, v in self._stamp().items()):
+					return self.index
+		except (OSError, ValueError, KeyError, ArithmeticError):
+			pass  # missing, torn or stale: start over from the CSV
+		return self.rebuild()
+
+	def _replay(self):
+		"""Apply the journal's appends on top of the snapshot."""
+		snapshot_size = self.index["size"]
+		try:
+			f = open(self.journal_path, encoding="utf-8")
+		except FileNotFoundError:
+			return
+		with f:
+			for line in f:
+				entry = json.loads(line)
+				if entry["rows"][0][0] < snapshot_size:
+					continue  # written before the snapshot was (a compaction stopped halfway)
+				for offset, *values in entry["rows"]:
+					self._add_to_index(offset, dict(zip(HEADER, values)))
+				self.index["size"], self.index["mtime_ns"] = entry["size"], entry["mtime_ns"]
+				self._journal_rows += len(entry["rows"])
+
+	def _save_index(self):
+		"""Write the full snapshot, then empty the journal it now includes."""
+		self.index.update(self._stamp())
+		tmp = self.index_path + ".tmp"
+		with open(tmp, "w", encoding="utf-8") as f:
+			json.dump(self.index, f, separators=(",", ":"))
+		os.replace(tmp, self.index_path)
+		open(self.journal_path, "w").close()
+		self._journal_rows = 0
+
+	def _journal(self, appended):
+		self.index.update(self._stamp())
+		entry = {"size": self.index["size"], "mtime_ns": self.index["mtime_ns"],
+				 "rows": [[offset] + [row[k] for k in HEADER] for offset, row in appended]}
+		with open(self.journal_path, "a", encoding="utf-8") as f:
+			f.write(json.dumps(entry, separators=(",", ":")) + "\n")
+		self._journal_rows += len(appended)
+		if self._journal_rows >= max(JOURNAL_MIN, self.index["rows"] - self._journal_rows):
+			self._save_index()
+
+	def _add_to_index(self, offset: int, row: dict):
+		amount = to_cents(row["amount"])
+		kind = row["type"]
+		bucket_keys = ("income", "expense")
+
+		month = self.index["months"].setdefault(row["date"][:7], {"income": 0, "expense": 0, "offsets": []})
+		cat = self.index["categories"].setdefault(row["category"].lower(),
+			{"name": row["category"], "income": 0, "expense": 0, "offsets": []})
+
+		month["offsets"].append(offset)
+		cat["offsets"].append(offset)
+		if kind in bucket_keys:
+			month[kind] += amount
+			cat[kind] += amount
+			self.index["totals"][kind] += amount
+		self.index["rows"] += 1
+
+	def scan(self):
+		"""Yield (byte offset, row dict) for every data row of the CSV."""
+		with open(self.path, "rb") as f:
+			_read_line(f)  # header
+			while True:
+				offset = f.tell()
+				line = _read_line(f)
+				if not line:
+					break
+				if line.strip():
+					yield offset, _parse(line)
+
+	def rebuild(self) -> dict:
+		"""Full scan of the CSV (only after an external edit or first run)."""
+		self.index = _empty_index()
+		for offset, row in self.scan():
+			try:
+				self._add_to_index(offset, row)
+			except (KeyError, ArithmeticError, ValueError):
+				continue  # malformed row: kept in the CSV, ignored by queries
+		self._save_index()
+		return self.index
+
+	def columns(self):
+		"""The column cache, (re)built if stale; None unless columnar=True."""
+		if self._columns is not None:
+			stamp = self._stamp()
+			if not self._columns.load(stamp):
+				self._columns.build(self.scan(), stamp)
+		return self._columns
+
+	# ---------- writes ----------
+
+	def append(self, rows):
+		"""Append rows (dicts or sequences in HEADER order) in one write."""
+		rows = [r if isinstance(r, dict) else dict(zip(HEADER, r)) for r in rows]
+		if not rows:
+			return 0
+		if self._stamp() != {k: self.index[k] for k in ("size", "mtime_ns")}:
+			self.rebuild()  # edited behind our back since open()
+		cols_fresh = self._columns is not None and self._columns.load(self._stamp())
+
+		buf = io.StringIO()
+		writer = csv.writer(buf)
+		encoded = []
+		for row in rows:
+			buf.seek(0)
+			buf.truncate()
+			writer.writerow([row.get(k, "") for k in HEADER])
+			encoded.append(buf.getvalue().encode("utf-8"))
+
+		with open(self.path, "ab") as f:
+			offset = f.tell()
+			f.write(b"".join(encoded))
+
+		appended = []
+		for row, data in zip(rows, encoded):
+			appended.append((offset, {k: str(row.get(k, "")) for k in HEADER}))
+			offset += len(data)
+		for offset, row in appended:
+			self._add_to_index(offset, row)
+		self._journal(appended)
+		if cols_fresh:
+			self._columns.extend(appended, self._stamp())
+		return len(rows)
+
+	# ---------- reads ----------
+
+	def rows_at(self, offsets):
+		with open(self.path, "rb") as f:
+			for offset in offsets:
+				f.seek(offset)
+				yield _parse(_read_line(f))
+
+	def all_rows(self):
+		with open(self.path, "r", encoding="utf-8", newline="") as f:
+			yield from csv.DictReader(f)
+
+	def totals(self) -> dict:
+		"""{"income", "expense", "balance"} in cents."""
+		t = self.index["totals"]
+		return {"income": t["income"], "expense": t["expense"], "balance": t["income"] - t["expense"]}
+
+	def month(self, prefix: str) -> dict:
+		"""Totals + offsets of rows whose date starts with `prefix` (YYYY, YYYY-MM, ...)."""
+		out = {"income": 0, "expense": 0, "offsets": []}
+		if len(prefix) > 7:
+			# finer than a month (e.g. a single day): narrow down inside that month
+			offsets = self.month(prefix[:7])["offsets"]
+			for offset, row in zip(offsets, self.rows_at(offsets)):
+				if row.get("date", "").startswith(prefix):
+					out["offsets"].append(offset)
+					if row.get("type") in ("income", "expense"):
+						out[row["type"]] += to_cents(row["amount"])
+			return out
+
+		for ym, m in self.index["months"].items():
+			if ym.startswith(prefix):
+				out["income"] += m["income"]
+				out["expense"] += m["expense"]
+				out["offsets"].extend(m["offsets"])
+		out["offsets"].sort()
+		return out
+
+	def category(self, name: str) -> dict:
+		return self.index["categories"].get(name.lower(), {"name": name, "income": 0, "expense": 0, "offsets": []})
+
+	def expenses_by_category(self) -> dict:
+		return {c["name"]: c["expense"] for c in self.index["categories"].values() if c["expense"]}
+
+	def monthly(self) -> dict:
+		"""{"YYYY-MM": (income_cents, expense_cents)} for every month, sorted."""
+		return {ym: (m["income"], m["expense"]) for ym, m in sorted(self.index["months"].items())}
@@ -5,9 +5,11 @@ from decimal import Decimal, InvalidOperation
 
 from flask import Blueprint, request, jsonify, g, current_app, send_file
 from itsdangerous import URLSafeTimedSerializer, BadSignature, SignatureExpired
-from sqlalchemy import asc, desc
+from sqlalchemy import asc, desc, tuple_
 
-from models.models import db, User, Record, Category
+from models.models import db, User, Record, Category, Budget
+from services import anomalies, balance, budgets, fx, importer, parquet, reports
+from services.passwords import login_throttle, PasswordBusy
 
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
@@ -65,7 +67,9 @@ def record_to_dict(r: Record):
         "type": r.type,
         "category": r.category,
         "amount": float(r.amount),
+        "currency": fx.code(r.currency),
         "description": r.description or "",
+        "anomaly": r.anomaly,
     }
 
 def _apply_record_filters(base_q, args, user_id):
@@ -74,6 +78,7 @@ def _apply_record_filters(base_q, args, user_id):
     f_from      = (args.get("date_from") or "").strip()
     f_to        = (args.get("date_to") or "").strip()
     f_q         = (args.get("q") or "").strip()
+    f_anomaly   = (args.get("anomaly") or "").strip()
     sort        = args.get("sort", "desc")
 
     q = base_q.filter_by(user_id=user_id)
@@ -87,29 +92,11 @@ def _apply_record_filters(base_q, args, user_id):
         q = q.filter(Record.date <= f_to)
     if f_q:
         q = q.filter(Record.description.ilike(f"%{f_q}%"))
+    q = anomalies.filter_query(q, f_anomaly)
 
     q = q.order_by(asc(Record.date) if sort == "asc" else desc(Record.date))
     return q
 
-def _parse_date_any(s: str) -> str:
-    s = (s or "").strip()
-    from datetime import datetime
-    for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y"):
-        try:
-            return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
-        except Exception:
-            pass
-    try:
-        s2 = s.replace(".", "/").replace("-", "/")
-        parts = [int(p) for p in s2.split("/") if p]
-        if len(parts) == 3:
-            # предполагаме M/D/Y
-            m, d, y = parts
-            return datetime(y, m, d).strftime("%Y-%m-%d")
-    except Exception:
-        pass
-    raise ValueError(f"Unrecognized date: {s}")
-
 # ---------- auth ----------
 
 @api_bp.post("/login")
@@ -121,11 +108,30 @@ def api_login():
     if not username or not password:
         return jsonify({"error": "username and password are required"}), 400
 
+    # token buckets (per username / per IP) before any KDF work
+    wait = login_throttle().check(username, request.remote_addr)
+    if wait:
+        resp = jsonify({"error": "too many login attempts"})
+        resp.headers["Retry-After"] = str(math.ceil(wait))
+        return resp, 429
+
     user = User.query.filter_by(username=username).first()
-    if not user or not user.check_password(password):
-        # if you don't have User.check_password, chachge with werkzeug.security.check_password_hash(user.password, password)
+    try:
+        ok = bool(user) and user.check_password(password)
+    except PasswordBusy:
+        resp = jsonify({"error": "server busy, retry shortly"})
+        resp.headers["Retry-After"] = "1"
+        return resp, 503
+    if not ok:
         return jsonify({"error": "invalid credentials"}), 401
 
+    # transparent re-hash to the current cost policy
+    try:
+        if user.upgrade_password(password):
+            db.session.commit()
+    except PasswordBusy:
+        pass  # retried on the next login
+
     token = generate_token(user.id)
     return jsonify({"token": token, "user": {"id": user.id, "username": user.username}}), 200
 
@@ -169,12 +175,109 @@ def api_delete_category(cid):
     c = Category.query.get_or_404(cid)
     if c.user_id != g.api_user.id:
         return jsonify({"error": "forbidden"}), 403
+    budgets.drop_category(db.session, g.api_user.id, c.name)
     db.session.delete(c)
     db.session.commit()
     return jsonify({"status": "deleted"})
 
+# ---------- budgets ----------
+
+@api_bp.get("/budgets")
+@token_required
+def api_list_budgets():
+    month = request.args.get("month") or budgets.current_month()
+    return jsonify({
+        "month": month,
+        "items": budgets.status(db.session, g.api_user.id, month),
+        "alerts": [dict(a) for a in budgets.alerts(db.session, g.api_user.id)],
+    })
+
+@api_bp.post("/budgets")
+@token_required
+def api_set_budget():
+    data = request.get_json(silent=True) or {}
+    category = (data.get("category") or "").strip()
+    try:
+        limit = Decimal(str(data.get("limit") or "").replace(",", ".").strip())
+        if limit <= 0:
+            raise InvalidOperation
+    except (InvalidOperation, ValueError):
+        return jsonify({"error": "limit must be a positive number"}), 400
+    if not Category.query.filter_by(user_id=g.api_user.id, name=category).first():
+        return jsonify({"error": "unknown category"}), 400
+
+    b = budgets.set_limit(db.session, g.api_user.id, category, float(limit))
+    db.session.commit()
+    # alerts reach g once the commit went through (record_events.notify)
+    over = g.get("budget_alerts", [])
+    return jsonify({"id": b.id, "category": b.category, "limit": b.limit, "alert": bool(over)}), 201
+
+@api_bp.delete("/budgets/<int:bid>")
+@token_required
+def api_delete_budget(bid):
+    b = Budget.query.get_or_404(bid)
+    if b.user_id != g.api_user.id:
+        return jsonify({"error": "forbidden"}), 403
+    db.session.delete(b)
+    db.session.commit()
+    return jsonify({"status": "deleted"})
+
+# ---------- reports (pandas, services/reports.py) ----------
+
+def _report_frame():
+    """The user's cached frame cut by ?type= (expense; '' = all) & ?from= & ?to=, or an error response."""
+    type_ = request.args.get("type", "expense").strip().lower()
+    if type_ not in ("income", "expense", ""):
+        return None, (jsonify({"error": "type must be 'income', 'expense' or empty"}), 400)
+    bounds = []
+    for name in ("from", "to"):
+        raw = (request.args.get(name) or "").strip()
+        day = parse_date_yyyy_mm_dd(raw) if raw else None
+        if raw and not day:
+            return None, (jsonify({"error": f"{name} must be YYYY-MM-DD"}), 400)
+        bounds.append(day)
+    df = reports.frame(db.session, g.api_user)
+    return reports.select_rows(df, type_, *bounds), None
+
+def _bounded_int(name, default, lo, hi):
+    try:
+        return max(lo, min(hi, int(request.args.get(name, default))))
+    except ValueError:
+        return default
+
+@api_bp.get("/reports/pivot")
+@token_required
+def api_report_pivot():
+    df, err = _report_frame()
+    return err or jsonify(reports.category_pivot(df))
+
+@api_bp.get("/reports/rolling")
+@token_required
+def api_report_rolling():
+    df, err = _report_frame()
+    return err or jsonify(reports.rolling_average(df, _bounded_int("window", 30, 1, 366)))
+
+@api_bp.get("/reports/merchants")
+@token_required
+def api_report_merchants():
+    df, err = _report_frame()
+    return err or jsonify({"items": reports.top_merchants(df, _bounded_int("limit", 10, 1, 100))})
+
+@api_bp.get("/reports/weekdays")
+@token_required
+def api_report_weekdays():
+    df, err = _report_frame()
+    return err or jsonify(reports.weekday_heatmap(df))
+
 # ---------- records (filters + pagination) ----------
 
+def _parse_cursor(value):
+    # "YYYY-MM-DD:id" -> (date, id), as returned in next_cursor
+    day, _, rid = (value or "").partition(":")
+    if not parse_date_yyyy_mm_dd(day) or not rid.isdigit():
+        return None
+    return day, int(rid)
+
 @api_bp.get("/records")
 @token_required
 def api_list_records():
@@ -184,9 +287,11 @@ def api_list_records():
     f_from      = (request.args.get("date_from") or "").strip()
     f_to        = (request.args.get("date_to") or "").strip()
     f_q         = (request.args.get("q") or "").strip()
+    f_anomaly   = (request.args.get("anomaly") or "").strip()   # '1' (any) | 'amount' | 'duplicate'
     sort        = request.args.get("sort", "desc")
     page        = max(1, int(request.args.get("page", 1)))
     per_page    = min(100, max(1, int(request.args.get("per", 20))))
+    with_balance = request.args.get("balance") == "1"
 
     q = Record.query.filter_by(user_id=g.api_user.id)
 
@@ -200,19 +305,36 @@ def api_list_records():
         q = q.filter(Record.date <= f_to)
     if f_q:
         q = q.filter(Record.description.ilike(f"%{f_q}%"))
-
-    q = q.order_by(asc(Record.date) if sort == "asc" else desc(Record.date))
-
-    pagination = db.paginate(q, page=page, per_page=per_page, error_out=False)
-    items = [record_to_dict(r) for r in pagination.items]
-
-    return jsonify({
-        "items": items,
-        "page": pagination.page,
-        "per": per_page,
-        "total": pagination.total,
-        "pages": pagination.pages
-    })
+    q = anomalies.filter_query(q, f_anomaly)
+    if with_balance and (f_category or f_type in ("income", "expense") or f_q or f_anomaly):
+        return jsonify({"error": "balance is only available with date filters"}), 400
+
+    direction = asc if sort == "asc" else desc
+    q = q.order_by(direction(Record.date), direction(Record.id))
+
+    if "cursor" in request.args:
+        # keyset page: rows after the cursor, no OFFSET and no COUNT
+        key = _parse_cursor(request.args["cursor"])
+        if key is None:
+            return jsonify({"error": "invalid cursor"}), 400
+        after = tuple_(Record.date, Record.id)
+        q = q.filter(after > tuple_(*key) if sort == "asc" else after < tuple_(*key))
+        rows = q.limit(per_page).all()
+        body = {"per": per_page}
+    else:
+        pagination = db.paginate(q, page=page, per_page=per_page, error_out=False)
+        rows = pagination.items
+        body = {"page": pagination.page, "per": per_page, "total": pagination.total, "pages": pagination.pages}
+
+    items = [record_to_dict(r) for r in rows]
+    if with_balance:
+        balances = balance.page_balances(db.session, g.api_user.id, rows)
+        for item in items:
+            item["balance"] = balances[item["id"]]
+
+    body["items"] = items
+    body["next_cursor"] = f"{rows[-1].date}:{rows[-1].id}" if len(rows) == per_page else None
+    return jsonify(body)
 
 @api_bp.post("/records")
 @token_required
@@ -248,9 +370,15 @@ def api_create_record():
     except Exception:
         return jsonify({"error": "amount must be a positive number"}), 400
 
+    # currency: base (default) or one with loaded FX rates
+    try:
+        currency = fx.normalize(data.get("currency"))
+    except ValueError:
+        return jsonify({"error": "unknown currency"}), 400
+
     r = Record(
         date=date_val, type=entry_type, category=category,
-        amount=float(amount), description=desc, user_id=g.api_user.id
+        amount=float(amount), currency=currency, description=desc, user_id=g.api_user.id
     )
     db.session.add(r)
     db.session.commit()
@@ -274,23 +402,26 @@ def api_update_record(rid):
 
     data = request.get_json(silent=True) or {}
 
+    # validate everything before touching `r`: the lookups below would otherwise autoflush
+    # a half-applied edit and run the record_events listeners twice
+    changes = {}
     if "date" in data:
         d = (str(data.get("date")) or "").strip()
         if not parse_date_yyyy_mm_dd(d):
             return jsonify({"error": "date must be YYYY-MM-DD"}), 400
-        r.date = d
+        changes["date"] = d
 
     if "type" in data:
         t = (str(data.get("type")) or "").strip().lower()
         if t not in ("income", "expense"):
             return jsonify({"error": "type must be 'income' or 'expense'"}), 400
-        r.type = t
+        changes["type"] = t
 
     if "category" in data:
         c = (str(data.get("category")) or "").strip()
         if not Category.query.filter_by(user_id=g.api_user.id, name=c).first():
             return jsonify({"error": "category does not exist"}), 400
-        r.category = c
+        changes["category"] = c
 
     if "amount" in data:
         amt_raw = str(data.get("amount")).replace(",", ".")
@@ -300,11 +431,19 @@ def api_update_record(rid):
                 raise InvalidOperation
         except Exception:
             return jsonify({"error": "amount must be a positive number"}), 400
-        r.amount = float(amount)
+        changes["amount"] = float(amount)
+
+    if "currency" in data:
+        try:
+            changes["currency"] = fx.normalize(data.get("currency"))
+        except ValueError:
+            return jsonify({"error": "unknown currency"}), 400
 
     if "description" in data:
-        r.description = str(data.get("description") or "")
+        changes["description"] = str(data.get("description") or "")
 
+    for field, value in changes.items():
+        setattr(r, field, value)
     db.session.commit()
     return jsonify(record_to_dict(r))
 
@@ -326,9 +465,9 @@ def api_export_csv():
 
     output = io.StringIO()
     writer = csv.writer(output)
-    writer.writerow(["date", "type", "category", "amount", "description"])
+    writer.writerow(["date", "type", "category", "amount", "description", "currency"])
     for r in records:
-        writer.writerow([r.date, r.type, r.category, f"{float(r.amount):.2f}", r.description or ""])
+        writer.writerow([r.date, r.type, r.category, f"{float(r.amount):.2f}", r.description or "", fx.code(r.currency)])
     output.seek(0)
 
     filename = f"records_{g.api_user.username}.csv"
@@ -339,14 +478,28 @@ def api_export_csv():
         download_name=filename
     )
 
+@api_bp.get("/records/export/parquet")
+@token_required
+def api_export_parquet():
+    if not parquet.available():
+        return jsonify({"error": "Parquet support needs pyarrow on the server"}), 501
+    q = _apply_record_filters(Record.query, request.args, g.api_user.id)
+    buf, _ = parquet.write_records(q)
+    buf.seek(0)
+    filename = f"records_{g.api_user.username}.parquet"
+    return send_file(buf, mimetype=parquet.MIMETYPE, as_attachment=True, download_name=filename)
+
 @api_bp.get("/records/export/pdf")
 @token_required
 def api_export_pdf():
     q = _apply_record_filters(Record.query, request.args, g.api_user.id)
     records = q.all()
 
-    income = sum(float(r.amount) for r in records if r.type == "income")
-    expense = sum(float(r.amount) for r in records if r.type == "expense")
+    # totals converted + summed in SQL, then shown in ?currency= at today's rate
+    currency, scale = fx.reporting(request.args.get("currency"), datetime.now().strftime("%Y-%m-%d"))
+    totals = fx.totals(q)
+    income = totals["income"] * scale
+    expense = totals["expense"] * scale
     balance = income - expense
 
     buf = io.BytesIO()
@@ -354,14 +507,14 @@ def api_export_pdf():
     styles = getSampleStyleSheet()
     elems = []
     elems.append(Paragraph(f"Expense Tracker — {g.api_user.username}", styles["Title"]))
-    elems.append(Paragraph(f"Summary: Income {income:.2f} BGN  |  Expense {expense:.2f} BGN  |  Balance {balance:.2f} BGN", styles["Normal"]))
+    elems.append(Paragraph(f"Summary: Income {income:.2f} {currency}  |  Expense {expense:.2f} {currency}  |  Balance {balance:.2f} {currency}", styles["Normal"]))
     elems.append(Spacer(1, 12))
 
-    data = [["Date", "Type", "Category", "Amount (BGN)", "Description"]]
+    data = [["Date", "Type", "Category", "Amount", "Currency", "Description"]]
     for r in records:
-        data.append([r.date, r.type.title(), r.category, f"{float(r.amount):.2f}", r.description or ""])
+        data.append([r.date, r.type.title(), r.category, f"{float(r.amount):.2f}", fx.code(r.currency), r.description or ""])
 
-    table = Table(data, colWidths=[90, 70, 140, 100, 360])
+    table = Table(data, colWidths=[90, 70, 140, 100, 60, 300])
     table.setStyle(TableStyle([
         ("GRID", (0,0), (-1,-1), 0.25, colors.grey),
         ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#f3f4f6")),
@@ -392,52 +545,57 @@ def api_import_csv():
     if len(raw) > ALLOWED_BYTES:
         return jsonify({"error": "CSV is too large (max 5MB)"}), 400
 
-    try:
-        content = raw.decode("utf-8-sig")
-    except UnicodeDecodeError:
-        content = raw.decode("cp1251", errors="ignore")
-
-    reader = csv.DictReader(io.StringIO(content))
-    if reader.fieldnames:
-        reader.fieldnames = [(fn or "").strip().lower() for fn in reader.fieldnames]
-
-    required = {"date", "type", "category", "amount", "description"}
-    if not required.issubset(set(reader.fieldnames or [])):
+    reader = importer.decode_csv(raw)
+    if not importer.has_header(reader):
         return jsonify({"error": "CSV header must include: date,type,category,amount,description"}), 400
 
-    existing_cats = {c.name.lower() for c in Category.query.filter_by(user_id=g.api_user.id).all()}
-    added, errors = 0, []
-
+    rows, errors = [], []
     for i, raw_row in enumerate(reader, start=2):
-        row = {(k or "").strip().lower(): (v or "").strip() for k, v in (raw_row or {}).items()}
         try:
-            date = _parse_date_any(row.get("date", ""))
-            type_ = (row.get("type") or "").lower()
-            if type_ not in ("income", "expense"):
-                raise ValueError("Invalid type")
-            cat = row.get("category") or "Uncategorized"
-            amt = float(Decimal((row.get("amount","").replace(",", ".") or "0")))
-            if amt <= 0:
-                raise ValueError("Amount must be positive")
-            desc = row.get("description","")
-
-            if create_missing and cat.lower() not in existing_cats:
-                db.session.add(Category(name=cat, user_id=g.api_user.id))
-                existing_cats.add(cat.lower())
-
-            db.session.add(Record(
-                date=date, type=type_, category=cat, amount=amt,
-                description=desc, user_id=g.api_user.id
-            ))
-            added += 1
+            rows.append(importer.parse_row(raw_row, fx.base_currency()))
         except Exception:
             errors.append(i)
             continue
 
-    db.session.commit()
-    res = {"imported": added}
+    # batched insert; rows already stored (same fingerprint) are skipped
+    stats = importer.bulk_insert(g.api_user.id, importer.fingerprint_rows(g.api_user.id, rows),
+                                 create_missing_categories=create_missing)
+    added = stats["inserted"]
+    res = {"imported": added, "duplicates": stats["duplicates"]}
     if errors:
         res["skipped_rows"] = errors[:10]
         res["skipped_count"] = len(errors)
         return jsonify(res), 207  # Multi-Status-like
     return jsonify(res), 201
+
+@api_bp.post("/records/import/parquet")
+@token_required
+def api_import_parquet():
+    ALLOWED_BYTES = 50 * 1024 * 1024  # 50MB
+
+    if not parquet.available():
+        return jsonify({"error": "Parquet support needs pyarrow on the server"}), 501
+
+    file = request.files.get("file")
+    create_missing = (request.form.get("create_missing_categories") == "on")
+
+    if not file or not file.filename.lower().endswith(".parquet"):
+        return jsonify({"error": "Please upload a .parquet file"}), 400
+
+    raw = file.read()
+    if len(raw) > ALLOWED_BYTES:
+        return jsonify({"error": "Parquet file is too large (max 50MB)"}), 400
+
+    try:
+        rows, errors = parquet.read_rows(raw, fx.base_currency())
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    stats = importer.bulk_insert(g.api_user.id, importer.fingerprint_rows(g.api_user.id, rows),
+                                 create_missing_categories=create_missing)
+    res = {"imported": stats["inserted"], "duplicates": stats["duplicates"]}
+    if errors:
+        res["skipped_rows"] = errors[:10]
+        res["skipped_count"] = len(errors)
+        return jsonify(res), 207
+    return jsonify(res), 201
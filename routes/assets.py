@@ -0,0 +1,27 @@
+import os
+import mimetypes
+from flask import Blueprint, current_app, abort, send_file
+from werkzeug.security import safe_join
+from assets import DIST_DIR, accepted_encoding
+
+assets_bp = Blueprint("assets", __name__, url_prefix="/assets")
+
+@assets_bp.get("/<path:filename>")
+def serve(filename):
+    # fingerprinted files never change -> cache forever, pick a pre-compressed variant
+    path = safe_join(os.path.join(current_app.static_folder, DIST_DIR), filename)
+    if not path or not os.path.isfile(path):
+        abort(404)
+
+    enc = accepted_encoding()
+    suffix = {"br": ".br", "gzip": ".gz"}.get(enc)
+    if suffix and os.path.isfile(path + suffix):
+        mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+        resp = send_file(path + suffix, mimetype=mimetype, conditional=True)
+        resp.headers["Content-Encoding"] = enc
+    else:
+        resp = send_file(path, conditional=True)
+
+    resp.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+    resp.vary.add("Accept-Encoding")
+    return resp
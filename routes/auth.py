@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, request, redirect, url_for, flash
-from werkzeug.security import generate_password_hash, check_password_hash
 from flask_login import login_user, logout_user, login_required, current_user
 from models.models import db, User
+from services.passwords import login_throttle, PasswordBusy
 from sqlalchemy import func
 
 auth_bp = Blueprint("auth", __name__, url_prefix="/auth")
@@ -34,9 +34,18 @@ def register():
             flash("Username is already taken.", "warning")
             return render_template("register.html", username=username)
 
-        # generate hash (default pbkdf2:sha256)
-        hashed_pw = generate_password_hash(password)
-        user = User(username=username, password=hashed_pw)
+        # registration shares the login buckets: it also runs the KDF
+        if login_throttle().check(username, request.remote_addr):
+            flash("Too many attempts. Please wait a moment and try again.", "warning")
+            return render_template("register.html", username=username), 429
+
+        # hash with the configured policy, off the request thread
+        user = User(username=username)
+        try:
+            user.set_password(password)
+        except PasswordBusy:
+            flash("Server is busy. Please try again in a moment.", "warning")
+            return render_template("register.html", username=username), 503
         db.session.add(user)
         db.session.commit()
 
@@ -57,9 +66,26 @@ def login():
         remember = request.form.get("remember") == "on"
         next_url = request.args.get("next") or url_for("home.index")
 
+        # token buckets (per username / per IP) before any KDF work
+        if login_throttle().check(username, request.remote_addr):
+            flash("Too many login attempts. Please wait a moment and try again.", "warning")
+            return render_template("login.html", username=username), 429
+
         user = User.query.filter(func.lower(User.username) == username.lower()).first()
 
-        if user and check_password_hash(user.password, password):
+        try:
+            ok = bool(user) and user.check_password(password)
+        except PasswordBusy:
+            flash("Server is busy. Please try again in a moment.", "warning")
+            return render_template("login.html", username=username), 503
+
+        if ok:
+            # transparent re-hash to the current cost policy
+            try:
+                if user.upgrade_password(password):
+                    db.session.commit()
+            except PasswordBusy:
+                pass  # retried on the next login
             login_user(user, remember=remember)
             flash("Welcome back!", "success")
             return redirect(next_url)
@@ -0,0 +1,59 @@
+from decimal import Decimal, InvalidOperation
+
+from flask import Blueprint, render_template, request, redirect, url_for, flash, g
+from flask_login import login_required, current_user
+from models.models import db, Budget, Category
+from services import budgets
+
+
+budgets_bp = Blueprint("budgets", __name__, url_prefix="/budgets")
+
+@budgets_bp.after_app_request
+def flash_budget_alerts(response):
+    # alerts are evaluated on write (services/budgets.py) and land in g once it commits; tell the user
+    for a in g.pop("budget_alerts", []):
+        if request.blueprint != "api":
+            flash(f"Budget for {a['category']} exceeded in {a['month']}: "
+                  f"{a['spent']:.2f} of {a['limit']:.2f}.", "warning")
+    return response
+
+@budgets_bp.route("/", methods=["GET", "POST"])
+@login_required
+def list_budgets():
+    if request.method == "POST":
+        category = (request.form.get("category") or "").strip()
+        try:
+            limit = Decimal((request.form.get("limit") or "").replace(",", ".").strip())
+            if limit <= 0:
+                raise InvalidOperation
+        except (InvalidOperation, ValueError):
+            flash("Limit must be a positive number.", "danger")
+            return redirect(url_for("budgets.list_budgets"))
+        if not Category.query.filter_by(user_id=current_user.id, name=category).first():
+            flash("Please select one of your categories.", "danger")
+            return redirect(url_for("budgets.list_budgets"))
+
+        budgets.set_limit(db.session, current_user.id, category, float(limit))
+        db.session.commit()
+        flash(f"Monthly budget for {category} set to {limit:.2f}.", "success")
+        return redirect(url_for("budgets.list_budgets"))
+
+    month = budgets.current_month()
+    return render_template(
+        "budgets.html",
+        month=month,
+        budgets=budgets.status(db.session, current_user.id, month),
+        alerts=budgets.alerts(db.session, current_user.id),
+        categories=Category.query.filter_by(user_id=current_user.id).order_by(Category.name).all(),
+    )
+
+@budgets_bp.route("/delete/<int:id>", methods=["POST"])
+@login_required
+def delete_budget(id):
+    budget = Budget.query.get_or_404(id)
+    if budget.user_id != current_user.id:
+        return "Unauthorized", 403
+    db.session.delete(budget)
+    db.session.commit()
+    flash("Budget removed.", "success")
+    return redirect(url_for("budgets.list_budgets"))
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, flash
 from flask_login import login_required, current_user
 from models.models import db, Record, Category
 from sqlalchemy import func
+from services import budgets, record_events
 
 
 categories_bp = Blueprint("categories", __name__, url_prefix="/categories")
@@ -49,6 +50,7 @@ def delete_category(id):
         flash(f"Cannot delete '{cat.name}' – it is used by {in_use} record(s).", "warning")
         return redirect(url_for("categories.add_category"))
 
+    budgets.drop_category(db.session, current_user.id, cat.name)
     db.session.delete(cat)
     db.session.commit()
     flash("Category deleted.", "success")
@@ -80,10 +82,12 @@ def rename_category(id):
     cat.name = new_name
     db.session.flush()  # new name, but stil not commit
 
-    # renew user records with this category
+    # renew user records with this category (fingerprints are recomputed on the next import)
     (Record.query
      .filter_by(user_id=current_user.id, category=old_name)
-     .update({Record.category: new_name}))
+     .update({Record.category: new_name, Record.fingerprint: None}))
+    budgets.rename_category(db.session, current_user.id, old_name, new_name)
+    record_events.user_changed(db.session, current_user.id)
     db.session.commit()
 
     flash(f"Category renamed to '{new_name}'.", "success")
@@ -0,0 +1,28 @@
+import os
+from flask import Blueprint, jsonify, current_app
+from sqlalchemy import text
+from models.models import db
+
+health_bp = Blueprint("health", __name__)
+
+@health_bp.get("/healthz")
+def healthz():
+    # liveness: the process is up and serving
+    return jsonify({"status": "ok"})
+
+@health_bp.get("/readyz")
+def readyz():
+    # readiness: templates compiled + DB pool warmed in *this* worker
+    state = current_app.extensions.get("warmup", {})
+    checks = {
+        "templates": state.get("templates", 0) > 0,
+        "engine": bool(state.get("engine")) and state.get("pid") == os.getpid(),
+    }
+    try:
+        db.session.execute(text("SELECT 1"))
+        checks["database"] = True
+    except Exception:
+        checks["database"] = False
+
+    ready = all(checks.values())
+    return jsonify({"status": "ready" if ready else "starting", "checks": checks}), (200 if ready else 503)
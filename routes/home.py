@@ -1,7 +1,8 @@
-from flask import Blueprint, render_template, request
+from flask import Blueprint, render_template, request, jsonify, url_for, current_app
 from flask_login import login_required, current_user
-from models.models import Record
-from collections import defaultdict
+from models.models import db, Record
+from services import columnar, dashboard, fx
+from services.aggregation import chart_payload
 from datetime import datetime, timedelta, date
 from sqlalchemy import and_
 
@@ -65,74 +66,149 @@ def filtered_query(user_id: int, scope: str, base: date):
     prefix = base.strftime("%Y")
     return q.filter(Record.date.like(f"{prefix}%"))
 
+def period_end(scope: str, base: date) -> date:
+    if scope == "day":
+        return base
+    if scope == "week":
+        return base + timedelta(days=6)
+    if scope == "month":
+        return prev_next_dates(scope, base)[1] - timedelta(days=1)
+    return date(base.year, 12, 31)
+
+def default_bucket(start: date, end: date) -> str:
+    # keep the bar count readable for any range length
+    days = (end - start).days + 1
+    if days <= 45:
+        return "day"
+    if days <= 190:
+        return "week"
+    if days <= 3 * 366:
+        return "month"
+    if days <= 10 * 366:
+        return "quarter"
+    return "year"
+
+def _parse_day(value):
+    try:
+        return datetime.strptime(value or "", "%Y-%m-%d").date()
+    except ValueError:
+        return None
+
+def _range_args():
+    """-> (start, end, bucket, ui) from ?from=&to= (custom) or ?scope=&date=."""
+    start, end = _parse_day(request.args.get("from")), _parse_day(request.args.get("to"))
+    if start and end:
+        if end < start:
+            start, end = end, start
+        span = end - start + timedelta(days=1)
+        ui = {"scope": "custom", "base": start, "title": f"{start.isoformat()} – {end.isoformat()}",
+              "prev": start - span, "next": start + span, "prev_end": start - timedelta(days=1)}
+    else:
+        # ?scope=day|week|month|year & ?date=YYYY-MM-DD (or now)
+        scope = request.args.get("scope", "month")
+        if scope not in VALID_SCOPES:
+            scope = "month"
+        base = normalize_base_date(scope, datetime.combine(_parse_day(request.args.get("date")) or date.today(),
+                                                           datetime.min.time()))
+        start, end = base, period_end(scope, base)
+        prev_d, next_d = prev_next_dates(scope, base)
+        ui = {"scope": scope, "base": base, "title": period_label(scope, base), "prev": prev_d, "next": next_d,
+              "prev_end": period_end(scope, prev_d)}
+
+    bucket = request.args.get("bucket")
+    if bucket not in dashboard.BUCKETS:
+        bucket = default_bucket(start, end)
+    # ?currency=EUR: totals are kept in base currency, shown at the period's closing rate
+    ui["currency"], ui["scale"] = fx.reporting(request.args.get("currency"), end.isoformat())
+    return start, end, bucket, ui
+
+def _bounded_arg(name, limit):
+    # client may ask for fewer slices/points than configured, never more
+    try:
+        return max(1, min(limit, int(request.args.get(name, limit))))
+    except ValueError:
+        return limit
+
+def _compare_totals(comparison):
+    out = {}
+    for key in ("income", "expense"):
+        cur = sum(comparison["current"][key].values())
+        prev = sum(comparison["previous"][key].values())
+        out[key] = {"current": round(cur, 2), "previous": round(prev, 2),
+                    "delta": round(cur - prev, 2), "pct": dashboard.pct_change(cur, prev)}
+    return out
+
 @home_bp.route("/")
 @login_required
 def index():
-    scope = request.args.get("scope", "month")
-    if scope not in VALID_SCOPES:
-        scope = "month"
+    start, end, bucket, ui = _range_args()
 
-    # ?date=YYYY-MM-DD or now
-    try:
-        base_in = datetime.strptime(request.args.get("date", ""), "%Y-%m-%d")
-    except Exception:
-        base_in = datetime.now()
-
-    base = normalize_base_date(scope, base_in)
-    prev_d, next_d = prev_next_dates(scope, base)
-
-    # filtered records from DB, by date for stable charts
-    records = (filtered_query(current_user.id, scope, base)
-               .order_by(Record.date.asc())
-               .all())
-
-    # SUMMARY
-    income = sum(r.amount for r in records if r.type == "income")
-    expense = sum(r.amount for r in records if r.type == "expense")
-    balance = income - expense
-
-    # PIE: expenses / incomes by category
-    exp_by_cat = defaultdict(float)
-    inc_by_cat = defaultdict(float)
-    for r in records:
-        if r.type == "expense":
-            exp_by_cat[r.category] += r.amount
-        elif r.type == "income":
-            inc_by_cat[r.category] += r.amount
-
-    # (optional) sort by value
-    exp_items = sorted(exp_by_cat.items(), key=lambda x: x[1], reverse=True)
-    inc_items = sorted(inc_by_cat.items(), key=lambda x: x[1], reverse=True)
-
-    # MONTHLY BAR (по филтрираните записи)
-    monthly_income = defaultdict(float)
-    monthly_expense = defaultdict(float)
-    for r in records:
-        ym = r.date[:7]  # 'YYYY-MM'
-        if r.type == "income":
-            monthly_income[ym] += r.amount
-        else:
-            monthly_expense[ym] += r.amount
-    months = sorted(set(monthly_income.keys()) | set(monthly_expense.keys()))
+    # SUMMARY: the user's cached columns, else one grouped query (rollups for whole months);
+    # charts load from /chart-data. ?compare=1: the same over this + the previous period
+    cols = columnar.columns(db.session, current_user)
+    comparison = None
+    if request.args.get("compare") == "1":
+        comparison = dashboard.compare(current_user.id, start, end, ui["prev"], ui["prev_end"], ui["scale"], cols)
+        cats = comparison["current"]
+    else:
+        cats = dashboard.by_category(current_user.id, start, end, ui["scale"], cols)
+    income = sum(cats["income"].values())
+    expense = sum(cats["expense"].values())
+
+    if ui["scope"] == "custom":
+        range_args = {"from": start.isoformat(), "to": end.isoformat(), "bucket": bucket}
+        prev_args = {"from": ui["prev"].isoformat(), "to": (ui["prev"] + (end - start)).isoformat(), "bucket": bucket}
+        next_args = {"from": ui["next"].isoformat(), "to": (ui["next"] + (end - start)).isoformat(), "bucket": bucket}
+    else:
+        range_args = {"scope": ui["scope"], "date": ui["base"].isoformat(), "bucket": bucket}
+        prev_args = {"scope": ui["scope"], "date": ui["prev"].isoformat(), "bucket": bucket}
+        next_args = {"scope": ui["scope"], "date": ui["next"].isoformat(), "bucket": bucket}
+    if comparison:
+        for args in (range_args, prev_args, next_args):
+            args["compare"] = "1"
+    if request.args.get("currency"):
+        for args in (range_args, prev_args, next_args):
+            args["currency"] = ui["currency"]
 
     return render_template(
         "index.html",
         income=round(income, 2),
         expense=round(expense, 2),
-        balance=round(balance, 2),
-        # pies
-        cat_labels=[k for k, _ in exp_items],
-        cat_values=[v for _, v in exp_items],
-        inc_labels=[k for k, _ in inc_items],
-        inc_values=[v for _, v in inc_items],
-        # bars
-        months=months,
-        income_vals=[monthly_income[m] for m in months],
-        expense_vals=[monthly_expense[m] for m in months],
+        balance=round(income - expense, 2),
+        has_income=bool(cats["income"]),
+        has_expense=bool(cats["expense"]),
+        chart_data_url=url_for("home.chart_data", **range_args),
         # ui state
-        scope=scope,
-        base_date_str=base.strftime("%Y-%m-%d"),
-        prev_date_str=prev_d.strftime("%Y-%m-%d"),
-        next_date_str=next_d.strftime("%Y-%m-%d"),
-        period_title=period_label(scope, base),
+        scope=ui["scope"],
+        bucket=bucket,
+        buckets=dashboard.BUCKETS,
+        range_args=range_args,
+        prev_args=prev_args,
+        next_args=next_args,
+        from_str=start.isoformat(),
+        to_str=end.isoformat(),
+        base_date_str=ui["base"].strftime("%Y-%m-%d"),
+        period_title=ui["title"],
+        comparison=comparison,
+        compare_totals=_compare_totals(comparison) if comparison else None,
+        currency=ui["currency"],
+    )
+
+@home_bp.get("/chart-data")
+@login_required
+def chart_data():
+    start, end, bucket, ui = _range_args()
+
+    # PIES + BARS: grouped queries, gap-filled buckets, then top-N slices / bounded bars
+    summary = dashboard.summary(current_user.id, start, end, bucket, ui["scale"],
+                                columnar.columns(db.session, current_user))
+    payload = chart_payload(
+        summary["by_category"], summary["series"],
+        max_slices=_bounded_arg("slices", current_app.config["CHART_MAX_SLICES"]),
+        max_points=_bounded_arg("points", current_app.config["CHART_MAX_POINTS"]),
     )
+    payload["bucket"] = bucket
+    payload["currency"] = ui["currency"]
+    resp = jsonify(payload)
+    resp.headers["Cache-Control"] = "private, max-age=60"
+    return resp
@@ -0,0 +1,23 @@
+import hmac
+
+from flask import Blueprint, Response, abort, current_app, request
+
+metrics_bp = Blueprint("metrics", __name__)
+
+def _allowed():
+    token = current_app.config.get("METRICS_TOKEN")
+    sent = request.headers.get("Authorization", "")
+    if token and hmac.compare_digest(sent.encode(), f"Bearer {token}".encode()):
+        return True
+    return request.remote_addr in current_app.config.get("METRICS_ALLOW", ())
+
+@metrics_bp.get("/metrics")
+def metrics():
+    # endpoint names, latencies and cache sizes are internal: scrapers only (config METRICS_ALLOW / METRICS_TOKEN)
+    if not _allowed():
+        abort(403)
+    # Prometheus text format; counters are per worker process
+    body = current_app.extensions["metrics"].render()
+    if "column_cache" in current_app.extensions:
+        body += current_app.extensions["column_cache"].render()
+    return Response(body, mimetype="text/plain; version=0.0.4")
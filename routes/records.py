@@ -1,14 +1,24 @@
 import csv
 import io
 from sqlalchemy import desc, asc
-from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file
+from flask import Blueprint, render_template, request, redirect, url_for, flash, send_file, g
 from flask_login import login_required, current_user
-from models.models import db, Record, Category
+from models.models import db, Record, Category, RecurringRule
+from services import anomalies, balance, fx, importer, parquet, recurring
 from decimal import Decimal, InvalidOperation
 from datetime import datetime
 
 records_bp = Blueprint("records", __name__, url_prefix="/records")
 
+@records_bp.after_app_request
+def flash_anomalies(response):
+    # flags are set on write (services/anomalies.py) and land in g once it commits; tell the user
+    kinds = g.pop("anomalies", [])
+    if kinds and request.blueprint != "api":
+        flash("This expense looks like a duplicate of an earlier one." if kinds == ["duplicate"] else
+              f"{len(kinds)} expense(s) flagged as unusual - see Records, filter Flagged.", "warning")
+    return response
+
 @records_bp.route("/")
 @login_required
 def list_records():
@@ -23,6 +33,7 @@ def list_records():
     f_from     = (request.args.get("date_from") or "").strip()    # 'YYYY-MM-DD'
     f_to       = (request.args.get("date_to") or "").strip()      # 'YYYY-MM-DD'
     f_q        = (request.args.get("q") or "").strip()       # search in description
+    f_anomaly  = (request.args.get("anomaly") or "").strip()  # '1' (any) | 'amount' | 'duplicate' | ''
 
     # sanitize pagination
     try:
@@ -55,14 +66,22 @@ def list_records():
         # simple "contains" on description (case-insensitive за SQLite)
         q = q.filter(Record.description.ilike(f"%{f_q}%"))
 
-    # sort per date
-    order_col = asc(Record.date) if sort == "asc" else desc(Record.date)
-    q = q.order_by(order_col)
+    # flagged by services/anomalies.py
+    q = anomalies.filter_query(q, f_anomaly)
+
+    # sort per date (id breaks ties, so pages and running balances are stable)
+    direction = asc if sort == "asc" else desc
+    q = q.order_by(direction(Record.date), direction(Record.id))
 
     # paginate (Flask-SQLAlchemy 3.x)
     pagination = db.paginate(q, page=page, per_page=per_page, error_out=False)
     records = pagination.items
 
+    # running balance: only while the rows are a contiguous run of the ledger (date filters only)
+    balances = None
+    if not (f_category or f_type in ("income", "expense") or f_q or f_anomaly):
+        balances = balance.page_balances(db.session, current_user.id, records)
+
     # for select „Category“ 
     categories = Category.query.filter_by(user_id=current_user.id).order_by(Category.name.asc()).all()
 
@@ -75,13 +94,14 @@ def list_records():
     return render_template(
         "records.html",
         records=records,
+        balances=balances,
         categories=categories, # for select
         sort=sort,
         per=per_str,
         # pagination state
         pagination=pagination, p=p, total=total, start=start, end=end,
         # current filters (за sticky UI)
-        f_category=f_category, f_type=f_type, f_from=f_from, f_to=f_to, f_q=f_q
+        f_category=f_category, f_type=f_type, f_from=f_from, f_to=f_to, f_q=f_q, f_anomaly=f_anomaly
     )
 
 @records_bp.route("/export/csv")
@@ -92,9 +112,9 @@ def export_csv():
 
     output = io.StringIO()
     writer = csv.writer(output, lineterminator="\n")
-    writer.writerow(["date", "type", "category", "amount", "description"])
+    writer.writerow(["date", "type", "category", "amount", "description", "currency"])
     for r in records:
-        writer.writerow([r.date, r.type, r.category, f"{r.amount:.2f}", r.description or ""])
+        writer.writerow([r.date, r.type, r.category, f"{r.amount:.2f}", r.description or "", fx.code(r.currency)])
 
     output.seek(0)
     filename = f"records_{current_user.username}.csv"
@@ -105,6 +125,19 @@ def export_csv():
         download_name=filename
     )
 
+@records_bp.route("/export/parquet")
+@login_required
+def export_parquet():
+    if not parquet.available():
+        flash("Parquet export needs pyarrow on the server.", "danger")
+        return redirect(url_for("records.list_records"))
+    # typed columns, streamed from the DB in batches (services/parquet.py)
+    q = Record.query.filter_by(user_id=current_user.id).order_by(Record.date.asc(), Record.id.asc())
+    buf, _ = parquet.write_records(q)
+    buf.seek(0)
+    filename = f"records_{current_user.username}.parquet"
+    return send_file(buf, mimetype=parquet.MIMETYPE, as_attachment=True, download_name=filename)
+
 from reportlab.lib.pagesizes import A4, landscape
 from reportlab.lib import colors
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
@@ -114,9 +147,13 @@ from reportlab.lib.styles import getSampleStyleSheet
 @login_required
 def export_pdf():
     # selectable: filter period; there is only for user
-    records = Record.query.filter_by(user_id=current_user.id).order_by(Record.date.asc()).all()
-    income = sum(r.amount for r in records if r.type == "income")
-    expense = sum(r.amount for r in records if r.type == "expense")
+    q = Record.query.filter_by(user_id=current_user.id).order_by(Record.date.asc())
+    records = q.all()
+    # totals converted + summed in SQL, then shown in ?currency= at today's rate
+    currency, scale = fx.reporting(request.args.get("currency"), datetime.now().strftime("%Y-%m-%d"))
+    totals = fx.totals(q)
+    income = totals["income"] * scale
+    expense = totals["expense"] * scale
     balance = income - expense
 
     buf = io.BytesIO()
@@ -125,14 +162,14 @@ def export_pdf():
     styles = getSampleStyleSheet()
     elems = []
     elems.append(Paragraph(f"Expense Tracker — {current_user.username}", styles["Title"]))
-    elems.append(Paragraph(f"Summary: Income {income:.2f} BGN  |  Expense {expense:.2f} BGN  |  Balance {balance:.2f} BGN", styles["Normal"]))
+    elems.append(Paragraph(f"Summary: Income {income:.2f} {currency}  |  Expense {expense:.2f} {currency}  |  Balance {balance:.2f} {currency}", styles["Normal"]))
     elems.append(Spacer(1, 12))
 
-    data = [["Date", "Type", "Category", "Amount (BGN)", "Description"]]
+    data = [["Date", "Type", "Category", "Amount", "Currency", "Description"]]
     for r in records:
-        data.append([r.date, r.type.title(), r.category, f"{r.amount:.2f}", r.description or ""])
+        data.append([r.date, r.type.title(), r.category, f"{r.amount:.2f}", fx.code(r.currency), r.description or ""])
 
-    table = Table(data, colWidths=[90, 70, 140, 100, 360])
+    table = Table(data, colWidths=[90, 70, 140, 100, 60, 300])
     table.setStyle(TableStyle([
         ("GRID", (0,0), (-1,-1), 0.25, colors.grey),
         ("BACKGROUND", (0,0), (-1,0), colors.HexColor("#f3f4f6")),
@@ -148,25 +185,6 @@ def export_pdf():
     filename = f"records_{current_user.username}.pdf"
     return send_file(buf, mimetype="application/pdf", as_attachment=True, download_name=filename)
 
-def _parse_date_any(s: str) -> str:
-    s = (s or "").strip()
-    for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%-m/%-d/%Y", "%d/%m/%Y"):  # покриваме и EU
-        try:
-            return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
-        except Exception:
-            pass
-    # fallback: rough split
-    try:
-        s2 = s.replace(".", "/").replace("-", "/")
-        parts = s2.split("/")
-        if len(parts) == 3:
-            # guess M/D/Y
-            m, d, y = [int(p) for p in parts]
-            return datetime(y, m, d).strftime("%Y-%m-%d")
-    except Exception:
-        pass
-    raise ValueError(f"Unrecognized date: {s}")
-
 @records_bp.route("/import/csv", methods=["POST"])
 @login_required
 def import_csv():
@@ -192,85 +210,72 @@ def import_csv():
         flash("CSV is too large (max 5MB).", "danger")
         return redirect(url_for("records.list_records"))
 
-    # try for decoding
-    try:
-        content = raw.decode("utf-8-sig")
-    except UnicodeDecodeError:
-        content = raw.decode("cp1251", errors="ignore")
-
-    reader = csv.DictReader(io.StringIO(content))
-
-    # normalise header's
-    if reader.fieldnames:
-        reader.fieldnames = [ (fn or "").strip().lower() for fn in reader.fieldnames ]
-
-    required = {"date", "type", "category", "amount", "description"}
-    if not required.issubset(set(reader.fieldnames or [])):
+    reader = importer.decode_csv(raw)
+    if not importer.has_header(reader):
         flash("CSV header must include: date,type,category,amount,description", "danger")
         return redirect(url_for("records.list_records"))
 
-    # cash for existing categories for this  user (case-insensitive)
-    existing_cats = {c.name.lower() for c in Category.query.filter_by(user_id=current_user.id).all()}
-
-    added_count = 0
+    rows = []
     errors = []  # keep row numbers (start from 2, becouse row  1 is header)
 
     for i, raw_row in enumerate(reader, start=2):
-        # normalize keys/values (strip)
-        row = { (k or "").strip().lower(): (v or "").strip() for k, v in (raw_row or {}).items() }
-
         try:
-            # date
-            date = _parse_date_any(row.get("date", ""))
-
-            # type
-            type_ = (row.get("type", "") or "").lower()
-            if type_ not in ("income", "expense"):
-                raise ValueError("Invalid type")
-
-            # category
-            cat = row.get("category", "")
-            if not cat:
-                cat = "Uncategorized"
-
-            # amount
-            amt_raw = (row.get("amount", "") or "").replace(",", ".")
-            amt = float(Decimal(amt_raw))
-            if amt <= 0:
-                raise ValueError("Amount must be positive")
-
-            # description
-            desc = row.get("description", "")
-
-            # if necessary, create a missing category (for this user), keep in set avoidable dublicates
-            if create_missing_categories and cat.lower() not in existing_cats:
-                db.session.add(Category(name=cat, user_id=current_user.id))
-                existing_cats.add(cat.lower())
-
-            # record
-            db.session.add(Record(
-                date=date,
-                type=type_,
-                category=cat,
-                amount=amt,
-                description=desc,
-                user_id=current_user.id
-            ))
-            added_count += 1
-
+            rows.append(importer.parse_row(raw_row, fx.base_currency()))
         except Exception:
             errors.append(i)
             continue
 
-    db.session.commit()
+    # batched insert; rows already stored (same fingerprint) are skipped
+    stats = importer.bulk_insert(current_user.id, importer.fingerprint_rows(current_user.id, rows),
+                                 create_missing_categories=create_missing_categories)
+    added_count = stats["inserted"]
+    dup_info = f" Skipped {stats['duplicates']} duplicates." if stats["duplicates"] else ""
 
     # message to 10 number   of mising lines
     if errors:
         skip_info = ", ".join(map(str, errors[:10])) + (" ..." if len(errors) > 10 else "")
-        flash(f"Imported {added_count} records. Skipped rows: {skip_info}", "warning")
+        flash(f"Imported {added_count} records.{dup_info} Skipped rows: {skip_info}", "warning")
     else:
-        flash(f"Imported {added_count} records.", "success")
+        flash(f"Imported {added_count} records.{dup_info}", "success")
+
+    return redirect(url_for("records.list_records"))
+
+@records_bp.route("/import/parquet", methods=["POST"])
+@login_required
+def import_parquet():
+    MAX_BYTES = 50 * 1024 * 1024  # 50MB; Parquet is several times denser than CSV
+
+    file = request.files.get("file")
+    create_missing_categories = request.form.get("create_missing_categories") == "on"
+
+    if not parquet.available():
+        flash("Parquet import needs pyarrow on the server.", "danger")
+        return redirect(url_for("records.list_records"))
+
+    if not file or not file.filename.lower().endswith(".parquet"):
+        flash("Please upload a .parquet file.", "danger")
+        return redirect(url_for("records.list_records"))
+
+    raw = file.read()
+    if len(raw) > MAX_BYTES:
+        flash("Parquet file is too large (max 50MB).", "danger")
+        return redirect(url_for("records.list_records"))
 
+    # column-wise validation, row numbers of the rejected rows come back
+    try:
+        rows, errors = parquet.read_rows(raw, fx.base_currency())
+    except ValueError as e:
+        flash(f"Can't import this file: {e}", "danger")
+        return redirect(url_for("records.list_records"))
+
+    stats = importer.bulk_insert(current_user.id, importer.fingerprint_rows(current_user.id, rows),
+                                 create_missing_categories=create_missing_categories)
+    dup_info = f" Skipped {stats['duplicates']} duplicates." if stats["duplicates"] else ""
+    if errors:
+        skip_info = ", ".join(map(str, errors[:10])) + (" ..." if len(errors) > 10 else "")
+        flash(f"Imported {stats['inserted']} records.{dup_info} Skipped rows: {skip_info}", "warning")
+    else:
+        flash(f"Imported {stats['inserted']} records.{dup_info}", "success")
     return redirect(url_for("records.list_records"))
 
 @records_bp.route("/add", methods=["GET", "POST"])
@@ -284,6 +289,7 @@ def add_record():
         amount_raw = (request.form.get("amount") or "").replace(",", ".").strip()
         date_val = request.form.get("date") or datetime.now().strftime("%Y-%m-%d")
         desc = (request.form.get("description") or "").strip()
+        repeat = (request.form.get("repeat") or "").strip()
 
         if entry_type not in ("income", "expense"):
             flash("Invalid type. Choose Income or Expense.", "danger")
@@ -293,6 +299,13 @@ def add_record():
             flash("Please select a category.", "danger")
             return render_template("add.html", categories=categories)
 
+        # date (also the anchor of a recurring rule)
+        try:
+            datetime.strptime(date_val, "%Y-%m-%d")
+        except ValueError:
+            flash("Date must be YYYY-MM-DD.", "danger")
+            return render_template("add.html", categories=categories)
+
         try:
             amount = Decimal(amount_raw)
             if amount <= 0:
@@ -302,12 +315,36 @@ def add_record():
             # return the entered values so you don't have to type them again (selectable)
             return render_template("add.html", categories=categories)
 
+        try:
+            currency = fx.normalize(request.form.get("currency"))
+        except ValueError:
+            flash("Unknown currency.", "danger")
+            return render_template("add.html", categories=categories)
+
+        if repeat in recurring.FREQUENCIES:
+            if currency:
+                flash(f"Recurring entries are in {fx.base_currency()} only.", "danger")
+                return render_template("add.html", categories=categories)
+            # a rule instead of a record; occurrences up to today are written right away
+            rule = RecurringRule(
+                type=entry_type, category=category, amount=float(amount), description=desc,
+                frequency=repeat, interval=1, start_date=date_val, next_date=date_val,
+                user_id=current_user.id
+            )
+            db.session.add(rule)
+            db.session.flush()
+            stats = recurring.materialize(rule_ids=[rule.id])  # commits with the rule
+            db.session.commit()  # rule starting in the future: nothing materialized yet
+            flash(f"Recurring {repeat} entry added ({stats['inserted']} record(s) so far).", "success")
+            return redirect(url_for("recurring.list_rules"))
+
         rec = Record(
             date=date_val,
             type=entry_type,
             category=category,
             amount=float(amount),  # save float
             description=desc,
+            currency=currency,
             user_id=current_user.id
         )
         db.session.add(rec)
@@ -359,10 +396,18 @@ def edit_record(id):
             flash("Amount must be a positive number.", "danger")
             return render_template("edit_record.html", record=record, categories=categories)
 
+        # currency (base or one with loaded rates)
+        try:
+            currency = fx.normalize(request.form.get("currency", record.currency))
+        except ValueError:
+            flash("Unknown currency.", "danger")
+            return render_template("edit_record.html", record=record, categories=categories)
+
         record.type = entry_type
         record.category = category
         record.date = date_val
         record.amount = float(amount)
+        record.currency = currency
         record.description = desc
         db.session.commit()
         flash("Record updated.", "success")
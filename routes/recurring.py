@@ -0,0 +1,29 @@
+from flask import Blueprint, render_template, redirect, url_for, flash
+from flask_login import login_required, current_user
+from models.models import db, Record, RecurringRule
+
+
+recurring_bp = Blueprint("recurring", __name__, url_prefix="/recurring")
+
+@recurring_bp.route("/")
+@login_required
+def list_rules():
+    rules = (RecurringRule.query
+             .filter_by(user_id=current_user.id)
+             .order_by(RecurringRule.next_date.is_(None), RecurringRule.next_date, RecurringRule.id)
+             .all())
+    return render_template("recurring.html", rules=rules)
+
+@recurring_bp.route("/delete/<int:id>", methods=["POST"])
+@login_required
+def delete_rule(id):
+    rule = RecurringRule.query.get_or_404(id)
+    if rule.user_id != current_user.id:
+        return "Unauthorized", 403
+
+    # records already written stay; they just stop pointing at the rule
+    Record.query.filter_by(rule_id=rule.id).update({Record.rule_id: None})
+    db.session.delete(rule)
+    db.session.commit()
+    flash("Recurring entry stopped. Existing records were kept.", "success")
+    return redirect(url_for("recurring.list_rules"))
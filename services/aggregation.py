@@ -0,0 +1,129 @@
+"""Vectorized aggregation of ledger columns, and chart shaping for the dashboard.
+
+`aggregate_columns` takes column-encoded `(month, type, category, amount)`
+data (pet.py's column cache, pet_columns.py) and yields totals, per-category
+sums and per-month sums for both income and expense in a few bincounts. Rows
+whose type is neither income nor expense are left out of both, count included.
+The web dashboard doesn't come through here: it sums in SQL over the monthly
+rollups (services/dashboard.py).
+
+Amounts are summed as given: integer cents (pet.py) stay integers, floats stay floats.
+
+For charts, `top_n` folds the long tail of categories into one "Other" slice
+and `downsample` merges neighbouring points, so `chart_payload` stays small
+whatever the account size.
+"""
+import math
+
+import numpy as np
+
+def _result(income, expense, count, inc_cat, exp_cat, inc_month, exp_month):
+    return {
+        "income": income,
+        "expense": expense,
+        "balance": income - expense,
+        "count": count,
+        "by_category": {"income": dict(inc_cat), "expense": dict(exp_cat)},
+        "by_month": {"income": dict(inc_month), "expense": dict(exp_month)},
+        "months": sorted(set(inc_month) | set(exp_month)),
+    }
+
+def aggregate_columns(month_codes, month_labels, type_codes, cat_codes, cat_labels, amounts):
+    """Vectorized aggregate over pre-encoded columns.
+
+    month_codes / cat_codes index into month_labels / cat_labels,
+    type_codes is 0 for income and 1 for expense (anything else is ignored).
+    """
+    amounts = np.asarray(amounts)
+    integral = np.issubdtype(amounts.dtype, np.integer)
+    is_inc = np.asarray(type_codes) == 0
+    is_exp = np.asarray(type_codes) == 1
+
+    def sums(codes, mask, n):
+        out = np.bincount(codes[mask], weights=amounts[mask], minlength=n)
+        return out.round().astype(np.int64) if integral else out
+
+    def nonzero(labels, values, present):
+        return {labels[i]: (int(v) if integral else float(v)) for i, v in enumerate(values) if present[i]}
+
+    month_codes = np.asarray(month_codes)
+    cat_codes = np.asarray(cat_codes)
+    nm, nc = len(month_labels), len(cat_labels)
+
+    inc_month = sums(month_codes, is_inc, nm)
+    exp_month = sums(month_codes, is_exp, nm)
+    inc_cat = sums(cat_codes, is_inc, nc)
+    exp_cat = sums(cat_codes, is_exp, nc)
+
+    # "present" = at least one row, even if the sum is 0
+    inc_m_seen = np.bincount(month_codes[is_inc], minlength=nm) > 0
+    exp_m_seen = np.bincount(month_codes[is_exp], minlength=nm) > 0
+    inc_c_seen = np.bincount(cat_codes[is_inc], minlength=nc) > 0
+    exp_c_seen = np.bincount(cat_codes[is_exp], minlength=nc) > 0
+
+    income = amounts[is_inc].sum()
+    expense = amounts[is_exp].sum()
+    if integral:
+        income, expense = int(income), int(expense)
+    else:
+        income, expense = float(income), float(expense)
+
+    return _result(
+        income, expense, int(is_inc.sum() + is_exp.sum()),
+        nonzero(cat_labels, inc_cat, inc_c_seen), nonzero(cat_labels, exp_cat, exp_c_seen),
+        nonzero(month_labels, inc_month, inc_m_seen), nonzero(month_labels, exp_month, exp_m_seen),
+    )
+
+def sorted_items(d: dict):
+    """(label, value) pairs, largest value first (pie chart order)."""
+    return sorted(d.items(), key=lambda x: x[1], reverse=True)
+
+# ---------- chart shaping ----------
+
+OTHER = "Other"
+
+def top_n(d: dict, n: int, other: str = OTHER):
+    """Largest n-1 items plus one `other` item with the rest (if there is a rest)."""
+    items = sorted_items(d)
+    if n <= 0 or len(items) <= n:
+        return items
+    head, tail = items[:n - 1], items[n - 1:]
+    return head + [(other, sum(v for _, v in tail))]
+
+def downsample(labels, series, max_points: int):
+    """Merge consecutive points into at most max_points buckets (values summed).
+
+    series is a list of value lists aligned with labels; merged labels read
+    "first..last".
+    """
+    if max_points <= 0 or len(labels) <= max_points:
+        return list(labels), [list(s) for s in series]
+    size = math.ceil(len(labels) / max_points)
+    out_labels, out_series = [], [[] for _ in series]
+    for i in range(0, len(labels), size):
+        chunk = labels[i:i + size]
+        out_labels.append(chunk[0] if len(chunk) == 1 else f"{chunk[0]}..{chunk[-1]}")
+        for out, values in zip(out_series, series):
+            out.append(sum(values[i:i + size]))
+    return out_labels, out_series
+
+def chart_payload(by_category: dict, series: dict, max_slices: int, max_points: int, ndigits: int = 2):
+    """Compact chart JSON: parallel label/value arrays, rounded, bounded in size.
+
+    by_category: {"income": {cat: sum}, "expense": {...}};
+    series: {"labels": [...], "income": [...], "expense": [...]}.
+    """
+    def pie(d):
+        items = top_n(d, max_slices)
+        return {"labels": [k for k, _ in items], "values": [round(v, ndigits) for _, v in items]}
+
+    labels, (inc_vals, exp_vals) = downsample(series["labels"], [series["income"], series["expense"]], max_points)
+    return {
+        "expense": pie(by_category["expense"]),
+        "income": pie(by_category["income"]),
+        "series": {
+            "labels": labels,
+            "income": [round(v, ndigits) for v in inc_vals],
+            "expense": [round(v, ndigits) for v in exp_vals],
+        },
+    }
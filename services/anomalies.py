@@ -0,0 +1,213 @@
+"""Unusual expenses: amounts far above a category's norm, and duplicated charges.
+
+Two flags, stored on the record (Record.anomaly):
+
+* 'amount': more than ANOMALY_SIGMA standard deviations above the mean of
+  the user's other expenses in that category (base currency, services/fx.py),
+  once the category has ANOMALY_MIN_COUNT of them
+* 'duplicate': an earlier expense with the same date, category, amount,
+  currency and description exists (the first one stays unflagged)
+
+On write, a record_events listener checks each new expense against
+CategoryStat - count / mean / M2 per (user, category), updated with
+Welford's method on every add, edit and delete - so the check is O(1): one
+SELECT of the touched stats, one indexed lookup of same-day expenses, the
+stats write, and an UPDATE only for flags that changed. Rows from bulk inserts (imports, recurring rules) have no id at
+that point; they only update the stats and get their flags from the batch.
+
+`flask anomalies scan` is that batch: all expenses in one query, per-group
+sums with NumPy, every record compared with all the others in its category
+(leave-one-out), duplicates by hashing the key columns. It rewrites the
+stats and the flags that changed, so it also repairs any drift.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+from flask import current_app, has_app_context
+from sqlalchemy import and_, bindparam, delete, insert, or_, select, tuple_, update
+
+from models.models import db, CategoryStat, Record
+from services import fx, record_events
+
+KINDS = ("amount", "duplicate")
+BATCH_SIZE = 5000
+
+S = CategoryStat.__table__
+
+def _settings():
+    config = current_app.config if has_app_context() else {}
+    return float(config.get("ANOMALY_SIGMA", 5.0)), int(config.get("ANOMALY_MIN_COUNT", 10))
+
+# ---------- Welford ----------
+
+def _add(stat, x):
+    n, mean, m2 = stat
+    n += 1
+    d = x - mean
+    mean += d / n
+    return [n, mean, m2 + d * (x - mean)]
+
+def _remove(stat, x):
+    n, mean, m2 = stat
+    if n <= 1:
+        return [0, 0.0, 0.0]
+    new_mean = (n * mean - x) / (n - 1)
+    return [n - 1, new_mean, max(0.0, m2 - (x - mean) * (x - new_mean))]
+
+def is_unusual(stat, x, sigma, min_count):
+    n, mean, m2 = stat
+    return n >= min_count and m2 > 0 and x > mean + sigma * math.sqrt(m2 / (n - 1))
+
+# ---------- on write ----------
+
+def _same_day(connection, changes):
+    """For the ids in `changes`: ({ids with an earlier expense of the same key}, {id: stored flag}).
+    One query on the (user_id, date) index."""
+    ids = {c.id for c in changes}
+    rows = connection.execute(
+        select(Record.id, Record.anomaly, Record.user_id, Record.date, Record.category, Record.amount,
+               Record.currency, Record.description)
+        # OR of pairs rather than a row-value IN: SQLite only seeks (user_id, date) for the former
+        .where(or_(*(and_(Record.user_id == u, Record.date == d) for u, d in {(c.user_id, c.date) for c in changes})),
+               Record.type == "expense")
+        .order_by(Record.id)
+    )
+    seen, dups, stored = set(), set(), {}
+    for rid, flag, *key in rows:
+        key = (*key[:3], round(key[3], 2), key[4], key[5] or "")
+        if rid in ids:
+            stored[rid] = flag
+            if key in seen:
+                dups.add(rid)
+        seen.add(key)
+    return dups, stored
+
+def check(connection, changes):
+    """Update CategoryStat for expense changes and flag the new / edited ones."""
+    expenses = [c for c in changes if c.type == "expense"]
+    # an edited record (-old, +new with the same id) is re-judged, its flag possibly cleared
+    edited = {c.id for c in changes if c.sign < 0 and c.id is not None}
+    if not expenses:
+        return {}
+    keys = {(c.user_id, c.category) for c in expenses}
+    stats = {(u, cat): [n, mean, m2] for u, cat, n, mean, m2 in connection.execute(
+        select(S.c.user_id, S.c.category, S.c.count, S.c.mean, S.c.m2)
+        .where(tuple_(S.c.user_id, S.c.category).in_(keys)))}
+    known = set(stats)
+
+    sigma, min_count = _settings()
+    added = [c for c in expenses if c.sign > 0 and c.id is not None]
+    dups, stored = _same_day(connection, added) if added else (set(), {})
+    flags = {c.id: None for c in changes if c.sign > 0 and c.id in edited}
+    for c in expenses:
+        key = (c.user_id, c.category)
+        stat = stats.setdefault(key, [0, 0.0, 0.0])
+        x = fx.to_base(c.amount, c.currency, c.date, connection)
+        if c.sign > 0:
+            if c.id is not None:
+                flags[c.id] = ("duplicate" if c.id in dups
+                               else "amount" if is_unusual(stat, x, sigma, min_count) else None)
+            stats[key] = _add(stat, x)
+        else:
+            stats[key] = _remove(stat, x)
+
+    updates = [{"k_user": u, "k_category": cat, "n": n, "mean": mean, "m2": m2}
+               for (u, cat), (n, mean, m2) in stats.items() if (u, cat) in known]
+    inserts = [{"user_id": u, "category": cat, "count": n, "mean": mean, "m2": m2}
+               for (u, cat), (n, mean, m2) in stats.items() if (u, cat) not in known and n > 0]
+    if updates:
+        connection.execute(
+            update(S).where(S.c.user_id == bindparam("k_user"), S.c.category == bindparam("k_category"))
+            .values(count=bindparam("n"), mean=bindparam("mean"), m2=bindparam("m2")),
+            updates,
+        )
+    if inserts:
+        connection.execute(insert(S), inserts)
+
+    # records not in `stored` are edits that are no longer expenses: always cleared
+    writes = [{"rid": rid, "kind": kind} for rid, kind in flags.items() if rid not in stored or kind != stored[rid]]
+    if writes:
+        connection.execute(update(Record).where(Record.id == bindparam("rid")).values(anomaly=bindparam("kind")),
+                           writes)
+    flagged = {rid: kind for rid, kind in flags.items() if kind}
+    record_events.notify("anomalies", flagged.values())
+    return flagged
+
+@record_events.subscribe
+def _on_records_changed(connection, changes, users):
+    if users:
+        # bulk updates without row details (category rename): redo those users
+        scan(connection, users)
+        changes = [c for c in changes if c.user_id not in users]
+    check(connection, changes)
+
+# ---------- batch ----------
+
+def scan(connection, user_ids=None):
+    """Recompute CategoryStat and every expense's flag (all users, or only `user_ids`).
+    Returns {"records", "amount", "duplicate", "changed"}."""
+    q = (select(Record.id, Record.user_id, Record.date, Record.category, fx.base_amount(), Record.currency,
+                Record.description, Record.anomaly)
+         .where(Record.type == "expense").order_by(Record.id))
+    stats_q = delete(S)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        q = q.where(Record.user_id.in_(user_ids))
+        stats_q = stats_q.where(S.c.user_id.in_(user_ids))
+    df = pd.DataFrame(connection.execute(q).all(),
+                      columns=["id", "user_id", "date", "category", "amount", "currency", "description", "anomaly"])
+    connection.execute(stats_q)
+    if df.empty:
+        return {"records": 0, "amount": 0, "duplicate": 0, "changed": 0}
+    df["amount"] = df["amount"].astype("float64").fillna(0.0)
+    x = df["amount"].to_numpy()
+
+    # per (user, category): count, mean, M2
+    group, keys = pd.factorize(pd.MultiIndex.from_arrays([df["user_id"], df["category"]]))
+    n = np.bincount(group, minlength=len(keys)).astype("float64")
+    mean = np.bincount(group, weights=x, minlength=len(keys)) / np.maximum(n, 1)
+    dev = x - mean[group]
+    m2 = np.bincount(group, weights=dev * dev, minlength=len(keys))
+
+    # each record against the others in its group (Welford removal, vectorized)
+    sigma, min_count = _settings()
+    ng = n[group]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rest_mean = (ng * mean[group] - x) / (ng - 1)
+        rest_m2 = m2[group] - dev * dev * ng / (ng - 1)
+        rest_std = np.sqrt(rest_m2 / (ng - 2))
+        unusual = (ng - 1 >= min_count) & (rest_m2 > 0) & (x > rest_mean + sigma * rest_std)
+
+    key_cols = [df["user_id"], df["date"], df["category"], (x * 100).round(),
+                df["currency"].fillna(""), df["description"].fillna("")]
+    duplicate = pd.DataFrame(dict(enumerate(key_cols))).duplicated(keep="first").to_numpy()
+
+    kind = np.where(duplicate, "duplicate", np.where(unusual, "amount", None))
+    old = df["anomaly"].to_numpy(dtype=object)
+    changed = np.flatnonzero(kind != old)
+    ids = df["id"].to_numpy()
+    for lo in range(0, len(changed), BATCH_SIZE):
+        part = changed[lo:lo + BATCH_SIZE]
+        connection.execute(update(Record).where(Record.id == bindparam("rid")).values(anomaly=bindparam("kind")),
+                           [{"rid": int(ids[i]), "kind": kind[i]} for i in part])
+    connection.execute(insert(S), [
+        {"user_id": int(u), "category": cat, "count": int(c), "mean": float(mu), "m2": float(v)}
+        for (u, cat), c, mu, v in zip(keys, n, mean, m2)])
+    return {"records": len(df), "amount": int((kind == "amount").sum()),
+            "duplicate": int(duplicate.sum()), "changed": len(changed)}
+
+def scan_all():
+    result = scan(db.session.connection())
+    db.session.commit()
+    return result
+
+# ---------- reads ----------
+
+def filter_query(q, value):
+    """/records and /api/records ?anomaly=1 (any flag) | amount | duplicate; anything else: no filter."""
+    if value in KINDS:
+        return q.filter(Record.anomaly == value)
+    if value == "1":
+        return q.filter(Record.anomaly.isnot(None))
+    return q
@@ -0,0 +1,102 @@
+"""Running balance (income - expense) in (date, id) order.
+
+The balance after a record is `SUM(signed amount) OVER (ORDER BY date, id)`.
+A page only needs the balance before its first row (the "opening"); that
+comes from the nearest BalanceCheckpoint before it plus at most EVERY
+records after the checkpoint, so any page costs the same no matter how deep.
+
+Checkpoints are kept by a services/record_events listener: the ones at or
+after the earliest changed date are dropped, then the missing ones are
+recomputed from the last remaining checkpoint with one INSERT ... SELECT
+over a window function. Both statements run on the flush's connection.
+"""
+from collections import defaultdict
+
+from sqlalchemy import case, delete, func, insert, literal, select, tuple_
+
+from models.models import BalanceCheckpoint, Record
+from services import fx, record_events
+
+EVERY = 256  # records per checkpoint
+
+C = BalanceCheckpoint.__table__
+
+# in base currency (services/fx.py)
+signed = case((Record.type == "income", fx.base_amount()), else_=-fx.base_amount())
+
+def _last_checkpoint(user_id, before=None):
+    """Scalar subqueries (date, record_id, position, balance) of the latest checkpoint (before a key)."""
+    q = select(C).where(C.c.user_id == user_id)
+    if before is not None:
+        q = q.where(tuple_(C.c.date, C.c.record_id) < tuple_(*before))
+    q = q.order_by(C.c.date.desc(), C.c.record_id.desc()).limit(1)
+    return [q.with_only_columns(col).scalar_subquery() for col in (C.c.date, C.c.record_id, C.c.position, C.c.balance)]
+
+def opening_expr(user_id, date, record_id):
+    """SQL expression: balance of the user's records strictly before (date, record_id)."""
+    cp_date, cp_id, _, cp_balance = _last_checkpoint(user_id, before=(date, record_id))
+    tail = (select(func.coalesce(func.sum(signed), 0))
+            .where(Record.user_id == user_id,
+                   Record.date >= func.coalesce(cp_date, ""),
+                   tuple_(Record.date, Record.id) > tuple_(func.coalesce(cp_date, ""), func.coalesce(cp_id, 0)),
+                   tuple_(Record.date, Record.id) < tuple_(date, record_id))
+            .scalar_subquery())
+    return func.coalesce(cp_balance, 0) + tail
+
+def page_balances(session, user_id, records):
+    """{record.id: balance after it} for a page of records that is contiguous in (date, id) order
+    (the whole ledger, optionally cut by a date range). One statement."""
+    if not records:
+        return {}
+    lo = min((r.date, r.id) for r in records)
+    hi = max((r.date, r.id) for r in records)
+    order = (Record.date, Record.id)
+    rows = session.execute(
+        select(Record.id, opening_expr(user_id, *lo) + func.sum(signed).over(order_by=order))
+        .where(Record.user_id == user_id,
+               Record.date >= lo[0], Record.date <= hi[0],
+               tuple_(*order) >= tuple_(*lo), tuple_(*order) <= tuple_(*hi))
+    )
+    return {rid: round(balance, 2) for rid, balance in rows}
+
+# ---------- checkpoints ----------
+
+def refresh(connection, user_id, since=None):
+    """Drop checkpoints from date `since` on (all if None) and rebuild the missing ones."""
+    stale = delete(C).where(C.c.user_id == user_id)
+    if since is not None:
+        stale = stale.where(C.c.date >= since)
+    connection.execute(stale)
+
+    cp_date, cp_id, cp_position, cp_balance = _last_checkpoint(user_id)
+    order = (Record.date, Record.id)
+    w = (select(Record.date, Record.id,
+                (func.coalesce(cp_position, 0) + func.row_number().over(order_by=order)).label("position"),
+                (func.coalesce(cp_balance, 0) + func.sum(signed).over(order_by=order)).label("balance"))
+         .where(Record.user_id == user_id,
+                Record.date >= func.coalesce(cp_date, ""),
+                tuple_(*order) > tuple_(func.coalesce(cp_date, ""), func.coalesce(cp_id, 0)))
+         .subquery())
+    connection.execute(insert(C).from_select(
+        ["user_id", "date", "record_id", "position", "balance"],
+        select(literal(user_id), w.c.date, w.c.id, w.c.position, w.c.balance).where(w.c.position % EVERY == 0),
+    ))
+
+@record_events.subscribe
+def _on_records_changed(connection, changes, users):
+    since = defaultdict(lambda: None)
+    for c in changes:
+        if c.user_id not in users:
+            since[c.user_id] = min(since[c.user_id] or c.date, c.date)
+    for user_id in users:
+        refresh(connection, user_id)
+    for user_id, day in since.items():
+        refresh(connection, user_id, day)
+
+def rebuild_all(connection):
+    """Recompute every user's checkpoints (databases created before they existed)."""
+    users = connection.execute(select(Record.user_id).distinct()).scalars().all()
+    connection.execute(delete(C))
+    for user_id in users:
+        refresh(connection, user_id)
+    return connection.execute(select(func.count()).select_from(C)).scalar()
@@ -0,0 +1,115 @@
+"""Monthly budgets per expense category.
+
+A budget's spend is the MonthlyRollup row of (user, month, 'expense',
+category), which every record write path already keeps current
+(services/rollups.py), so nothing re-sums records: the status of all of a
+user's budgets is one join over budgets x rollups, O(number of budgets).
+
+Over-limit alerts are evaluated on write: a record_events listener (run
+after the rollups listener) looks only at the (user, month, category) keys
+the write touched and stores a BudgetAlert the first time a month goes
+over. Alerts raised during a web request are also flashed, once the write
+has committed (record_events.notify).
+"""
+from datetime import date, datetime
+
+from sqlalchemy import and_, insert, select, tuple_
+
+from models.models import Budget, BudgetAlert, MonthlyRollup
+from services import record_events, rollups  # noqa: F401 - rollups must subscribe first
+
+B = Budget.__table__
+A = BudgetAlert.__table__
+M = MonthlyRollup.__table__
+
+def current_month() -> str:
+    return date.today().strftime("%Y-%m")
+
+def _spend_join(month):
+    return B.outerjoin(M, and_(M.c.user_id == B.c.user_id, M.c.month == month,
+                               M.c.type == "expense", M.c.category == B.c.category))
+
+def status(session, user_id, month=None):
+    """[{id, category, limit, spent, remaining, pct, over}] for the month (default: this one)."""
+    month = month or current_month()
+    rows = session.execute(
+        select(B.c.id, B.c.category, B.c.limit, M.c.amount)
+        .select_from(_spend_join(month))
+        .where(B.c.user_id == user_id)
+        .order_by(B.c.category)
+    )
+    out = []
+    for bid, category, limit, spent in rows:
+        spent = round(spent or 0, 2)
+        out.append({"id": bid, "category": category, "limit": limit, "spent": spent,
+                     "remaining": round(limit - spent, 2),
+                     "pct": round(spent / limit * 100, 1) if limit else None,
+                     "over": spent > limit})
+    return out
+
+def alerts(session, user_id, limit=12):
+    """Latest alerts, newest first."""
+    return session.execute(
+        select(A.c.month, A.c.spent, A.c.limit, A.c.created_at, B.c.category)
+        .join(B, B.c.id == A.c.budget_id)
+        .where(A.c.user_id == user_id)
+        .order_by(A.c.month.desc(), A.c.created_at.desc())
+        .limit(limit)
+    ).mappings().all()
+
+def check(connection, keys):
+    """Store alerts for budgets over their limit in the given (user_id, month, category) keys.
+    One SELECT; one INSERT when something went over for the first time that month."""
+    if not keys:
+        return []
+    rows = connection.execute(
+        select(B.c.id.label("budget_id"), B.c.user_id, B.c.category, B.c.limit,
+               M.c.month, M.c.amount.label("spent"))
+        .select_from(B.join(M, and_(M.c.user_id == B.c.user_id, M.c.type == "expense",
+                                    M.c.category == B.c.category)))
+        .where(tuple_(B.c.user_id, B.c.category).in_({(u, c) for u, _, c in keys}),
+               M.c.month.in_({m for _, m, _ in keys}),
+               M.c.amount > B.c.limit,
+               ~select(A.c.id).where(A.c.budget_id == B.c.id, A.c.month == M.c.month).exists())
+    ).mappings()
+    over = [dict(r) for r in rows if (r["user_id"], r["month"], r["category"]) in keys]
+    if over:
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        connection.execute(insert(A), [
+            {"budget_id": o["budget_id"], "user_id": o["user_id"], "month": o["month"],
+             "spent": o["spent"], "limit": o["limit"], "created_at": now} for o in over
+        ])
+        record_events.notify("budget_alerts", over)
+    return over
+
+@record_events.subscribe
+def _on_records_changed(connection, changes, users):
+    # only a growing expense can cross a limit
+    keys = {(c.user_id, c.date[:7], c.category) for c in changes if c.type == "expense" and c.sign > 0}
+    if users:
+        # bulk updates without row details (category rename): re-check this month's budgets
+        month = current_month()
+        keys |= {(u, month, category) for u, category in connection.execute(
+            select(B.c.user_id, B.c.category).where(B.c.user_id.in_(users)))}
+    check(connection, keys)
+
+# ---------- writes ----------
+
+def set_limit(session, user_id, category, limit):
+    """Create or update the category's budget; alerts at once if this month is already over."""
+    budget = session.query(Budget).filter_by(user_id=user_id, category=category).first()
+    if budget is None:
+        budget = Budget(user_id=user_id, category=category, limit=limit)
+        session.add(budget)
+    else:
+        budget.limit = limit
+    session.flush()
+    check(session.connection(), {(user_id, current_month(), category)})
+    return budget
+
+def rename_category(session, user_id, old, new):
+    session.query(Budget).filter_by(user_id=user_id, category=old).update({Budget.category: new})
+
+def drop_category(session, user_id, name):
+    for budget in session.query(Budget).filter_by(user_id=user_id, category=name):
+        session.delete(budget)
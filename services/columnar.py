@@ -0,0 +1,203 @@
+"""In-process columnar copy of each user's records, for analytics without SQL.
+
+One UserColumns per user, rows in (date, id) order:
+
+    day       int32   days since 1970-01-01 (sorted: ranges are two searchsorted)
+    month     int32   months since 1970-01
+    cents     int64   amount in base-currency cents (services/fx.py)
+    type      uint8   0 = income, 1 = expense
+    cat       int32   code into `categories`
+    merchant  int32   code into `merchants` (normalized description, '' = none)
+
+Entries are keyed by User.data_version, which every record write - and a
+rate import, for users with foreign-currency records - bumps in its own
+transaction (services/reports.py), so a cached copy is only used
+while it is current - in any worker. ColumnCache keeps the most recently
+used users within COLUMN_CACHE_BYTES (0 = off); a user bigger than the
+whole budget is served from a fresh load and not kept. hits / misses /
+evictions are exported on /metrics.
+
+The dashboard (services/dashboard.py) and /api/reports read these arrays;
+the first view of a user costs one query, repeated views none.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+
+import numpy as np
+import pandas as pd
+from flask import current_app
+from sqlalchemy import select
+
+from models.models import Record
+from services import fx
+
+EPOCH = date(1970, 1, 1).toordinal()
+TYPES = ("income", "expense")
+
+def day_number(d: date) -> int:
+    return d.toordinal() - EPOCH
+
+class UserColumns:
+    __slots__ = ("day", "month", "cents", "type", "cat", "merchant", "categories", "merchants")
+
+    ARRAYS = ("day", "month", "cents", "type", "cat", "merchant")
+
+    def __init__(self, day, month, cents, type_, cat, merchant, categories, merchants):
+        self.day, self.month, self.cents, self.type = day, month, cents, type_
+        self.cat, self.merchant = cat, merchant
+        self.categories, self.merchants = categories, merchants
+
+    def __len__(self):
+        return len(self.day)
+
+    @property
+    def nbytes(self) -> int:
+        labels = sum(len(s) + 49 for s in self.categories) + sum(len(s) + 49 for s in self.merchants)
+        return sum(getattr(self, a).nbytes for a in self.ARRAYS) + labels
+
+    def span(self, start: date, end: date):
+        """(lo, hi) slice of the rows dated start..end."""
+        lo = int(np.searchsorted(self.day, day_number(start), "left"))
+        hi = int(np.searchsorted(self.day, day_number(end), "right"))
+        return lo, hi
+
+def load(connection, user_id) -> UserColumns:
+    from services.reports import merchant_keys  # reports imports this module
+
+    rows = connection.execute(
+        select(Record.date, Record.type, Record.category, fx.base_amount(), Record.description)
+        .where(Record.user_id == user_id)
+        .order_by(Record.date, Record.id)
+    ).all()
+    if not rows:
+        empty = np.empty(0, dtype=np.int32)
+        return UserColumns(empty, empty, np.empty(0, np.int64), np.empty(0, np.uint8), empty, empty, [], [])
+    dates, types, cats, amounts, descs = zip(*rows)
+    days = pd.to_datetime(pd.Series(dates, dtype=object), format="%Y-%m-%d", errors="coerce").to_numpy()
+    valid = ~np.isnat(days)
+    if not valid.all():
+        # rows saved before the add form checked dates have no day to bucket them on: left out
+        keep = np.flatnonzero(valid)
+        types, cats, amounts, descs = ([column[i] for i in keep] for column in (types, cats, amounts, descs))
+        days = days[keep]
+    days = days.astype("datetime64[D]")
+    cat_codes, categories = pd.factorize(pd.Series(cats, dtype=object))
+    merchant_codes, merchants = pd.factorize(merchant_keys(pd.Series(descs, dtype=object)).astype(object))
+    return UserColumns(
+        day=days.astype(np.int32),
+        month=days.astype("datetime64[M]").astype(np.int32),
+        cents=np.rint(np.nan_to_num(np.array(amounts, dtype=np.float64)) * 100).astype(np.int64),
+        type_=(np.array(types, dtype=object) == "expense").astype(np.uint8),
+        cat=cat_codes.astype(np.int32),
+        merchant=merchant_codes.astype(np.int32),
+        categories=list(categories),
+        merchants=list(merchants),
+    )
+
+class ColumnCache:
+    """LRU of user id -> (data version, UserColumns) within a total byte budget."""
+
+    def __init__(self, budget_bytes):
+        self.budget = budget_bytes
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.bytes = 0
+        self.hits = self.misses = self.evictions = 0
+
+    def get(self, user_id, version, loader):
+        with self._lock:
+            entry = self._data.get(user_id)
+            if entry and entry[0] == version:
+                self._data.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+        cols = loader()
+        size = cols.nbytes
+        with self._lock:
+            self.misses += 1
+            old = self._data.pop(user_id, None)
+            if old:
+                self.bytes -= old[1].nbytes
+            if size <= self.budget:
+                self._data[user_id] = (version, cols)
+                self.bytes += size
+                while self.bytes > self.budget:
+                    _, (_, evicted) = self._data.popitem(last=False)
+                    self.bytes -= evicted.nbytes
+                    self.evictions += 1
+        return cols
+
+    def stats(self):
+        with self._lock:
+            return {"users": len(self._data), "bytes": self.bytes, "budget": self.budget,
+                    "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def render(self) -> str:
+        """Prometheus lines for /metrics (per worker process)."""
+        s = self.stats()
+        out = []
+        for name, kind, help_, value in (
+            ("app_column_cache_hits_total", "counter", "Column cache lookups served from memory.", s["hits"]),
+            ("app_column_cache_misses_total", "counter", "Column cache loads from the database.", s["misses"]),
+            ("app_column_cache_evictions_total", "counter", "Users evicted to stay within the budget.", s["evictions"]),
+            ("app_column_cache_bytes", "gauge", "Bytes held by the column cache.", s["bytes"]),
+            ("app_column_cache_users", "gauge", "Users held by the column cache.", s["users"]),
+        ):
+            out += [f"# HELP {name} {help_}", f"# TYPE {name} {kind}", f"{name} {value}"]
+        return "\n".join(out) + "\n"
+
+def init_columnar(app):
+    app.extensions["column_cache"] = ColumnCache(app.config.get("COLUMN_CACHE_BYTES", 64 * 2**20))
+
+def columns(session, user):
+    """The user's UserColumns (cached while User.data_version is unchanged); None if the cache is off."""
+    cache = current_app.extensions.get("column_cache")
+    if cache is None or cache.budget <= 0:
+        return None
+    return cache.get(user.id, user.data_version, lambda: load(session.connection(), user.id))
+
+# ---------- aggregations ----------
+
+def by_category(cols: UserColumns, start: date, end: date, scale: float = 1.0):
+    """dashboard.by_category() from the arrays: one bincount per type."""
+    lo, hi = cols.span(start, end)
+    out = {"income": {}, "expense": {}, "count": hi - lo}
+    cat, cents, type_ = cols.cat[lo:hi], cols.cents[lo:hi], cols.type[lo:hi]
+    n = len(cols.categories)
+    for code, name in enumerate(TYPES):
+        mask = type_ == code
+        counts = np.bincount(cat[mask], minlength=n)
+        sums = np.bincount(cat[mask], weights=cents[mask], minlength=n)
+        for i in np.flatnonzero(counts):
+            out[name][cols.categories[i]] = sums[i] / 100 * scale
+    return out
+
+def daily_sums(cols: UserColumns, start: date, end: date):
+    """[(day 'YYYY-MM-DD', income, expense)] for the days in range that have records."""
+    lo, hi = cols.span(start, end)
+    if lo == hi:
+        return []
+    day, cents, type_ = cols.day[lo:hi], cols.cents[lo:hi], cols.type[lo:hi]
+    first = int(day[0])
+    offset = day - first
+    size = int(offset[-1]) + 1
+    income = np.bincount(offset, weights=np.where(type_ == 0, cents, 0), minlength=size)
+    expense = np.bincount(offset, weights=np.where(type_ == 1, cents, 0), minlength=size)
+    present = np.flatnonzero(np.bincount(offset, minlength=size))
+    labels = np.datetime_as_string((present + first).astype("datetime64[D]"))
+    return list(zip(labels.tolist(), (income[present] / 100).tolist(), (expense[present] / 100).tolist()))
+
+def to_frame(cols: UserColumns) -> pd.DataFrame:
+    """The typed DataFrame services/reports.py works on, built from the arrays (no query)."""
+    first = int(cols.month.min()) if len(cols) else 0
+    span = int(cols.month.max()) - first + 1 if len(cols) else 0
+    month_labels = np.datetime_as_string(np.arange(first, first + span).astype("datetime64[M]")).tolist()
+    return pd.DataFrame({
+        "date": cols.day.astype("datetime64[D]").astype("datetime64[ns]"),
+        "month": pd.Categorical.from_codes(cols.month - first, month_labels),
+        "type": pd.Categorical.from_codes(cols.type.astype(np.int8), TYPES),
+        "category": pd.Categorical.from_codes(cols.cat, cols.categories),
+        "amount": cols.cents / 100,
+        "merchant": pd.Categorical.from_codes(cols.merchant, cols.merchants),
+    })
@@ -0,0 +1,176 @@
+"""Dashboard queries over any [start, end] range, bucketed by day/week/month/quarter/year.
+
+Each question is one grouped SQL statement; the (small) grouped result is
+folded into buckets and gap-filled in Python:
+
+* ranges made of whole months read MonthlyRollup (services/rollups.py), so a
+  ten-year view costs ~ months x categories rows instead of every record
+* other ranges group the raw records by day (day/week buckets) or by month,
+  on the (user_id, date) index
+
+A period-over-period comparison is the same category query over both
+periods at once, split by a CASE on the date.
+
+Sums are in base currency (raw records are converted in the statement by
+services/fx.py); `scale` turns them into a reporting currency, one factor
+per call applied to the grouped rows.
+
+Given the user's cached record columns (`cols`, services/columnar.py) the
+same answers come from bincounts over the arrays instead, with no query.
+"""
+from datetime import date, timedelta
+
+from sqlalchemy import case, func, literal
+
+from models.models import db, MonthlyRollup, Record
+from services import columnar, fx
+
+BUCKETS = ("day", "week", "month", "quarter", "year")
+
+# ---------- buckets ----------
+
+def bucket_key(day: str, bucket: str) -> str:
+    """'YYYY-MM-DD' (or 'YYYY-MM' for month-grain input) -> bucket label."""
+    if bucket == "day":
+        return day
+    if bucket == "week":
+        d = date.fromisoformat(day)
+        return (d - timedelta(days=d.weekday())).isoformat()  # Monday
+    if bucket == "month":
+        return day[:7]
+    if bucket == "quarter":
+        return f"{day[:4]}-Q{(int(day[5:7]) + 2) // 3}"
+    return day[:4]
+
+def bucket_labels(start: date, end: date, bucket: str):
+    """Every bucket label between start and end, in order (the gap-fill skeleton)."""
+    labels = []
+    if bucket in ("day", "week"):
+        step = 1 if bucket == "day" else 7
+        d = start if bucket == "day" else start - timedelta(days=start.weekday())
+        while d <= end:
+            labels.append(d.isoformat())
+            d += timedelta(days=step)
+        return labels
+    y, m = start.year, start.month
+    while (y, m) <= (end.year, end.month):
+        label = bucket_key(f"{y:04d}-{m:02d}-01", bucket)
+        if not labels or labels[-1] != label:
+            labels.append(label)
+        y, m = (y + 1, 1) if m == 12 else (y, m + 1)
+    return labels
+
+def month_aligned(start: date, end: date) -> bool:
+    """True if [start, end] is a run of whole months."""
+    return start.day == 1 and (end + timedelta(days=1)).day == 1
+
+# ---------- queries ----------
+
+def _rollup_q(user_id, start, end, *cols):
+    return (db.session.query(*cols)
+            .filter(MonthlyRollup.user_id == user_id,
+                    MonthlyRollup.month >= start.strftime("%Y-%m"),
+                    MonthlyRollup.month <= end.strftime("%Y-%m")))
+
+def _record_q(user_id, start, end, *cols):
+    return (db.session.query(*cols)
+            .filter(Record.user_id == user_id,
+                    Record.date >= start.isoformat(),
+                    Record.date <= end.isoformat()))
+
+def _category_rows(user_id, start, end, split=None):
+    """(part, type, category, sum, count) rows; part is 1 from `split` on, else 0."""
+    if month_aligned(start, end) and (split is None or split.day == 1):
+        part = case((MonthlyRollup.month >= split.strftime("%Y-%m"), 1), else_=0) if split else literal(1)
+        keys = (MonthlyRollup.type, MonthlyRollup.category)
+        q = _rollup_q(user_id, start, end, part, *keys, func.sum(MonthlyRollup.amount), func.sum(MonthlyRollup.count))
+    else:
+        part = case((Record.date >= split.isoformat(), 1), else_=0) if split else literal(1)
+        keys = (Record.type, Record.category)
+        q = _record_q(user_id, start, end, part, *keys, func.sum(fx.base_amount()), func.count(Record.id))
+    return q.group_by(part, *keys) if split else q.group_by(*keys)
+
+def by_category(user_id: int, start: date, end: date, scale: float = 1.0, cols=None):
+    """{"income": {cat: sum}, "expense": {cat: sum}, "count": n} for the range."""
+    if cols is not None:
+        return columnar.by_category(cols, start, end, scale)
+    out = {"income": {}, "expense": {}, "count": 0}
+    for _, type_, category, amount, n in _category_rows(user_id, start, end):
+        side = out["income"] if type_ == "income" else out["expense"]
+        side[category] = side.get(category, 0) + (amount or 0) * scale
+        out["count"] += n or 0
+    return out
+
+def pct_change(current, previous):
+    if not previous:
+        return None
+    return round((current - previous) / abs(previous) * 100, 1)
+
+def compare(user_id: int, start: date, end: date, prev_start: date, prev_end: date, scale: float = 1.0,
+            cols=None):
+    """Current vs previous period in one grouped query.
+
+    The previous period must end right before `start` (prev_next_dates does
+    that). Returns {"current": by_category-like, "previous": ..., "rows":
+    [{type, category, current, previous, delta, pct}, ...] largest change first}.
+    """
+    if cols is not None:
+        previous = columnar.by_category(cols, prev_start, start - timedelta(days=1), scale)
+        current = columnar.by_category(cols, start, end, scale)
+    else:
+        periods = ({"income": {}, "expense": {}, "count": 0}, {"income": {}, "expense": {}, "count": 0})
+        for part, type_, category, amount, n in _category_rows(user_id, prev_start, end, split=start):
+            side = periods[part]["income" if type_ == "income" else "expense"]
+            side[category] = side.get(category, 0) + (amount or 0) * scale
+            periods[part]["count"] += n or 0
+        previous, current = periods
+
+    rows = []
+    for type_ in ("expense", "income"):
+        cur, prev = current[type_], previous[type_]
+        for category in cur.keys() | prev.keys():
+            c, p = cur.get(category, 0), prev.get(category, 0)
+            rows.append({"type": type_, "category": category, "current": round(c, 2),
+                         "previous": round(p, 2), "delta": round(c - p, 2), "pct": pct_change(c, p)})
+    rows.sort(key=lambda r: (r["type"], -abs(r["delta"]), r["category"]))
+    return {"current": current, "previous": previous, "rows": rows}
+
+def series(user_id: int, start: date, end: date, bucket: str, scale: float = 1.0, cols=None):
+    """{"labels": [...], "income": [...], "expense": [...]} with every bucket present."""
+    if cols is not None:
+        rows = ((day, type_, amount) for day, income, expense in columnar.daily_sums(cols, start, end)
+                for type_, amount in (("income", income), ("expense", expense)))
+    elif bucket in ("day", "week"):
+        grain = Record.date
+        rows = _record_q(user_id, start, end, grain, Record.type, func.sum(fx.base_amount())).group_by(grain, Record.type)
+    elif month_aligned(start, end):
+        rows = (_rollup_q(user_id, start, end, MonthlyRollup.month, MonthlyRollup.type, func.sum(MonthlyRollup.amount))
+                .group_by(MonthlyRollup.month, MonthlyRollup.type))
+    else:
+        grain = func.substr(Record.date, 1, 7)
+        rows = _record_q(user_id, start, end, grain, Record.type, func.sum(fx.base_amount())).group_by(grain, Record.type)
+
+    labels = bucket_labels(start, end, bucket)
+    income = dict.fromkeys(labels, 0)
+    expense = dict.fromkeys(labels, 0)
+    for key, type_, amount in rows:
+        label = bucket_key(key if len(key) > 7 else key + "-01", bucket)
+        target = income if type_ == "income" else expense
+        if label in target:
+            target[label] += (amount or 0) * scale
+    return {"labels": labels,
+            "income": [income[k] for k in labels],
+            "expense": [expense[k] for k in labels]}
+
+def summary(user_id: int, start: date, end: date, bucket: str, scale: float = 1.0, cols=None):
+    cats = by_category(user_id, start, end, scale, cols)
+    income = sum(cats["income"].values())
+    expense = sum(cats["expense"].values())
+    return {
+        "income": income,
+        "expense": expense,
+        "balance": income - expense,
+        "count": cats["count"],
+        "by_category": {"income": cats["income"], "expense": cats["expense"]},
+        "series": series(user_id, start, end, bucket, scale, cols),
+    }
@@ -0,0 +1,33 @@
+"""Content hash of a record, used to spot duplicate imports.
+
+Stored in Record.fingerprint (indexed together with user_id). Kept free of
+model imports so both models/models.py and services/importer.py can use it.
+"""
+import hashlib
+import re
+
+_ws = re.compile(r"\s+")
+
+def normalize_description(desc: str) -> str:
+    return _ws.sub(" ", (desc or "").strip().lower())
+
+def fingerprint(user_id, date, type_, category, amount, description, occurrence=0) -> str:
+    """sha1 over (user, date, type, category, amount, normalized description).
+
+    `occurrence` tells apart identical rows inside one import (two equal
+    coffees on the same day): the n-th copy gets n, so a re-run maps every
+    row onto the same fingerprint again.
+    """
+    key = "|".join([str(user_id), date, type_, (category or "").strip().lower(),
+                    f"{float(amount):.2f}", normalize_description(description)])
+    if occurrence:
+        key += f"#{occurrence}"
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+def date_fingerprinter(user_id, type_, category, amount, description):
+    """fingerprint() for many dates of one otherwise fixed row (recurring rules):
+    the constant part of the key is built once, each call only hashes."""
+    head = f"{user_id}|"
+    tail = "|" + "|".join([type_, (category or "").strip().lower(),
+                           f"{float(amount):.2f}", normalize_description(description)])
+    return lambda date: hashlib.sha1(f"{head}{date}{tail}".encode("utf-8")).hexdigest()
@@ -0,0 +1,212 @@
+"""Currencies: records in any currency, totals in one.
+
+Record.currency NULL means the base currency (BASE_CURRENCY): existing rows
+need no migration and the bulk writers (imports, recurring rules) keep
+writing base-currency rows. FxRate holds the base-currency value of one unit
+of a currency on a day; the table is loaded from a local CSV
+(`flask fx import`), nothing is fetched over the network.
+
+Everything derived (monthly rollups, balance checkpoints, budgets) is kept
+in base currency:
+
+* SQL paths sum base_amount(): a CASE that only looks a rate up for foreign
+  rows - the latest one on or before the record's date, else the earliest
+  after it - on the (currency, date) unique index, inside the same grouped
+  statement
+* the incremental path (rollup / anomaly-stat deltas of one flush) converts
+  with rate(), an LRU cache of (currency, date) lookups per process. Entries
+  belong to a rates version - max(FxRate.id), which every import raises -
+  read once per transaction, so a `flask fx import` in another process is
+  seen by the next write and deltas never mix old and new rates
+
+Reports in another currency (?currency=EUR) scale the base totals by
+factor(): the closing rate of the period, one cached lookup per report.
+"""
+import csv
+import io
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from sqlalchemy import bindparam, case, delete, func, insert, select
+
+from models.models import db, FxRate, Record
+
+F = FxRate.__table__
+
+def base_currency() -> str:
+    return current_app.config["BASE_CURRENCY"]
+
+def reporting_currency() -> str:
+    return current_app.config["REPORTING_CURRENCY"]
+
+def currencies(session=None):
+    """Base currency first, then every currency with at least one rate."""
+    session = session or db.session
+    loaded = session.execute(select(F.c.currency).distinct().order_by(F.c.currency)).scalars()
+    base = base_currency()
+    return [base] + [c for c in loaded if c != base]
+
+def normalize(value):
+    """Form/API input -> value for Record.currency (None = base); ValueError if there are no rates for it."""
+    value = (value or "").strip().upper()
+    if not value or value == base_currency():
+        return None
+    if value not in currencies():
+        raise ValueError(f"unknown currency {value}")
+    return value
+
+def code(currency) -> str:
+    """Record.currency -> display code."""
+    return currency or base_currency()
+
+# ---------- SQL ----------
+
+def rate_expr(currency, day):
+    """Scalar subquery: base value of one `currency` unit on `day` (nearest earlier rate, else later)."""
+    before = (select(F.c.rate).where(F.c.currency == currency, F.c.date <= day)
+              .order_by(F.c.date.desc()).limit(1).scalar_subquery())
+    after = (select(F.c.rate).where(F.c.currency == currency, F.c.date > day)
+             .order_by(F.c.date.asc()).limit(1).scalar_subquery())
+    return func.coalesce(before, after)
+
+def base_amount(amount=Record.amount, currency=Record.currency, day=Record.date):
+    """SQL expression: the amount in base currency (NULL for a currency without rates)."""
+    return case((currency.is_(None), amount), else_=amount * rate_expr(currency, day))
+
+# ---------- cached lookups ----------
+
+def version(connection):
+    """Rates version: import_rates writes every row with a new id above all earlier ones."""
+    return connection.execute(select(func.max(F.c.id))).scalar() or 0
+
+def _version(connection):
+    # once per transaction: an import committed elsewhere shows up in the next one
+    txn = connection.get_transaction()
+    seen = connection.info.get("fx_version")
+    if txn is None or seen is None or seen[0] is not txn:
+        seen = connection.info["fx_version"] = (txn, version(connection))
+    return seen[1]
+
+class RateCache:
+    """LRU of (currency, date) -> rate for one rates version; misses are one indexed
+    query on the caller's connection. Currencies without rates are not cached."""
+
+    def __init__(self, size):
+        self.size = size
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.version = None
+        self.hits = self.misses = 0
+
+    def get(self, connection, currency, day):
+        key = (currency, day)
+        current = _version(connection)
+        with self._lock:
+            if current != self.version:
+                self._data.clear()
+                self.version = current
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+        value = connection.execute(select(rate_expr(currency, day))).scalar()
+        with self._lock:
+            self.misses += 1
+            if value is not None and current == self.version:
+                self._data[key] = value
+                if len(self._data) > self.size:
+                    self._data.popitem(last=False)
+        return value
+
+def init_fx(app):
+    app.extensions["fx_rates"] = RateCache(app.config.get("FX_CACHE_SIZE", 4096))
+    # currency pickers and labels in templates
+    app.add_template_global(currencies)
+    app.add_template_global(code, "currency_code")
+
+def _cache():
+    return current_app.extensions["fx_rates"]
+
+def rate(currency, day, connection=None):
+    """Base value of one unit of `currency` on `day` (1.0 for the base currency, None without rates)."""
+    if currency is None or currency == base_currency():
+        return 1.0
+    return _cache().get(connection or db.session.connection(), currency, day)
+
+def to_base(amount, currency, day, connection=None) -> float:
+    """Python twin of base_amount(); a currency without rates counts as 0 like the SQL NULL."""
+    r = rate(currency, day, connection)
+    return float(amount or 0) * r if r is not None else 0.0
+
+def factor(currency, day):
+    """Multiplier from base-currency totals to `currency` at `day` (a period's closing rate);
+    None if there are no rates for it."""
+    r = rate(currency, day)
+    return 1.0 / r if r else None
+
+def reporting(requested, day):
+    """?currency= value -> (code, factor); unknown codes fall back to the base currency."""
+    currency = (requested or reporting_currency()).strip().upper()
+    scale = factor(currency, day)
+    if scale is None:
+        return base_currency(), 1.0
+    return currency, scale
+
+def totals(query):
+    """{"income": x, "expense": y} in base currency for the records an ORM query selects,
+    converted and summed in one grouped statement."""
+    out = {"income": 0.0, "expense": 0.0}
+    for type_, amount in query.order_by(None).with_entities(Record.type, func.sum(base_amount())).group_by(Record.type):
+        if type_ in out:
+            out[type_] = amount or 0.0
+    return out
+
+# ---------- rate table ----------
+
+def parse_rates(text):
+    """CSV with date,currency,rate columns -> ([(currency, date, rate)], [bad line numbers])."""
+    rows, errors = [], []
+    for i, row in enumerate(csv.DictReader(io.StringIO(text)), start=2):
+        try:
+            day = (row.get("date") or "").strip()
+            if len(day) != 10 or day[4] != "-" or day[7] != "-":
+                raise ValueError
+            cur = (row.get("currency") or "").strip().upper()
+            if len(cur) != 3:
+                raise ValueError
+            value = float((row.get("rate") or "").replace(",", "."))
+            if value <= 0:
+                raise ValueError
+        except ValueError:
+            errors.append(i)
+            continue
+        rows.append((cur, day, value))
+    return rows, errors
+
+def import_rates(rows, batch_size=5000):
+    """Replace/insert (currency, date, rate) rows; returns the number written.
+
+    Amounts in base currency depend on these rates, so the caller rebuilds
+    rollups and balance checkpoints afterwards (`flask fx import` does).
+    """
+    base = base_currency()
+    latest = {}
+    for cur, day, value in rows:
+        if cur != base:
+            latest[(cur, day)] = value  # a later line for the same key wins
+    connection = db.session.connection()
+    # ids above every earlier one, even where a row is replaced: the cache version moves (RateCache)
+    first = version(connection) + 1
+    items = [{"id": first + i, "currency": c, "date": d, "rate": v} for i, ((c, d), v) in enumerate(latest.items())]
+    for i in range(0, len(items), batch_size):
+        chunk = items[i:i + batch_size]
+        connection.execute(delete(F).where(F.c.currency == bindparam("k_currency"), F.c.date == bindparam("k_date")),
+                           [{"k_currency": r["currency"], "k_date": r["date"]} for r in chunk])
+        connection.execute(insert(F), chunk)
+    return len(items)
+
+def foreign_users(session=None):
+    """Ids of users with at least one record not in base currency."""
+    session = session or db.session
+    return session.execute(select(Record.user_id).where(Record.currency.is_not(None)).distinct()).scalars().all()
@@ -0,0 +1,149 @@
+"""Password hash policy: which KDF and how expensive.
+
+The work factor is calibrated on the deployment hardware
+(`flask hash-policy calibrate --target-ms 50`) and stored in
+instance/hash_policy.json. Hashes that don't match the policy (other
+algorithm, or cost outside +/-25%) are re-hashed on the next successful login.
+
+Resolution order for the active method:
+  1. PASSWORD_HASH_METHOD config/env (explicit override)
+  2. instance/hash_policy.json (calibrated)
+  3. Werkzeug's pbkdf2:sha256 default
+"""
+import hashlib
+import json
+import os
+import time
+from collections import Counter
+from datetime import datetime, timezone
+
+from flask import current_app, has_app_context
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS
+
+POLICY_FILE = "hash_policy.json"
+FALLBACK_METHOD = f"pbkdf2:sha256:{DEFAULT_PBKDF2_ITERATIONS}"
+COST_TOLERANCE = 1.25  # pbkdf2 iterations within [x/1.25, x*1.25] count as current
+
+# ---------- method strings ----------
+
+def canonical(method: str) -> str:
+    """Normalise a Werkzeug method ('pbkdf2', 'pbkdf2:sha256', 'scrypt', ...)."""
+    name, *args = method.split(":")
+    if name == "pbkdf2":
+        hash_name = args[0] if args else "sha256"
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    if name == "scrypt":
+        n, r, p = (map(int, args) if args else (2**15, 8, 1))
+        return f"scrypt:{n}:{r}:{p}"
+    raise ValueError(f"Unknown hash method '{method}'")
+
+def method_of(pwhash: str):
+    """Canonical method of a stored hash ('method$salt$hash'), or None."""
+    if not pwhash or pwhash.count("$") < 2:
+        return None
+    try:
+        return canonical(pwhash.split("$", 1)[0])
+    except ValueError:
+        return None
+
+# ---------- policy ----------
+
+def _policy_path(app):
+    return os.path.join(app.instance_path, POLICY_FILE)
+
+def load_policy(app) -> dict:
+    override = app.config.get("PASSWORD_HASH_METHOD")
+    if override:
+        return {"method": canonical(override), "source": "config"}
+    try:
+        with open(_policy_path(app), encoding="utf-8") as f:
+            policy = json.load(f)
+        policy["method"] = canonical(policy["method"])
+        policy["source"] = "calibrated"
+        return policy
+    except (OSError, ValueError, KeyError):
+        return {"method": FALLBACK_METHOD, "source": "default"}
+
+def save_policy(app, policy: dict) -> str:
+    os.makedirs(app.instance_path, exist_ok=True)
+    path = _policy_path(app)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({k: v for k, v in policy.items() if k != "source"}, f, indent=2)
+    app.extensions["hash_policy"] = load_policy(app)
+    return path
+
+def current_method() -> str:
+    if has_app_context():
+        return current_app.extensions["hash_policy"]["method"]
+    return FALLBACK_METHOD
+
+def needs_rehash(pwhash: str, method: str = None) -> bool:
+    stored = method_of(pwhash)
+    target = canonical(method or current_method())
+    if stored is None:
+        return True
+    if stored == target:
+        return False
+
+    s_name, *s_args = stored.split(":")
+    t_name, *t_args = target.split(":")
+    if s_name != t_name or s_name != "pbkdf2" or s_args[0] != t_args[0]:
+        return True
+    ratio = int(s_args[1]) / int(t_args[1])
+    return not (1 / COST_TOLERANCE <= ratio <= COST_TOLERANCE)
+
+# ---------- calibration ----------
+
+def _time_once(method: str) -> float:
+    name, *args = method.split(":")
+    t0 = time.perf_counter()
+    if name == "pbkdf2":
+        hashlib.pbkdf2_hmac(args[0], b"calibration", b"0123456789abcdef", int(args[1]))
+    else:
+        n, r, p = map(int, args)
+        hashlib.scrypt(b"calibration", salt=b"0123456789abcdef", n=n, r=r, p=p, maxmem=132 * n * r * p)
+    return (time.perf_counter() - t0) * 1000
+
+def measure_ms(method: str, rounds: int = 3) -> float:
+    """Median wall time of one hash with `method`, in ms."""
+    samples = sorted(_time_once(canonical(method)) for _ in range(rounds))
+    return samples[len(samples) // 2]
+
+def calibrate(target_ms: float = 50, algorithm: str = "pbkdf2:sha256") -> dict:
+    """Pick the cost whose single hash takes ~target_ms on this machine."""
+    name = algorithm.split(":")[0]
+    if name == "pbkdf2":
+        hash_name = canonical(algorithm).split(":")[1]
+        probe = 50_000
+        per_iter = measure_ms(f"pbkdf2:{hash_name}:{probe}") / probe
+        iterations = max(10_000, round(target_ms / per_iter / 10_000) * 10_000)
+        method = f"pbkdf2:{hash_name}:{iterations}"
+    elif name == "scrypt":
+        # n must be a power of two: double it until we reach the target
+        n = 2**12
+        while n < 2**20 and measure_ms(f"scrypt:{n}:8:1", rounds=1) < target_ms:
+            n *= 2
+        method = f"scrypt:{n}:8:1"
+    else:
+        raise ValueError(f"Unknown hash algorithm '{algorithm}'")
+
+    return {
+        "method": method,
+        "target_ms": target_ms,
+        "measured_ms": round(measure_ms(method), 1),
+        "calibrated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+    }
+
+# ---------- reporting ----------
+
+def algorithm_counts(hashes, method: str = None) -> dict:
+    """Count stored hashes per canonical method, plus how many are stale."""
+    per_method, stale = Counter(), 0
+    for pwhash in hashes:
+        per_method[method_of(pwhash) or "unknown"] += 1
+        stale += needs_rehash(pwhash, method)
+    return {"methods": dict(per_method.most_common()), "stale": stale}
+
+def init_hash_policy(app):
+    app.extensions["hash_policy"] = load_policy(app)
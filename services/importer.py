@@ -0,0 +1,167 @@
+"""Bulk loading of CSV ledgers (pet.py's expenses.csv / web export format).
+
+Shared pieces:
+  * decode_csv / parse_row - the same decoding + validation rules as the web import
+  * fingerprint_rows       - content hashes (services/fingerprints.py) for a list of rows
+  * bulk_insert            - batched INSERTs with a set-based anti-join on
+                             fingerprints, so re-running an import is a no-op;
+                             one transaction, a failed import leaves nothing behind
+"""
+import csv
+import io
+from collections import Counter
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import insert, select
+
+from models.models import db, Record, Category
+from services import record_events
+from services.fingerprints import fingerprint
+
+HEADER = ("date", "type", "category", "amount", "description")
+
+# ---------- parsing ----------
+
+def parse_date_any(s: str) -> str:
+    s = (s or "").strip()
+    for fmt in ("%Y-%m-%d", "%m/%d/%Y", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(s, fmt).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    try:
+        s2 = s.replace(".", "/").replace("-", "/")
+        parts = [int(p) for p in s2.split("/") if p]
+        if len(parts) == 3:
+            # guess M/D/Y
+            m, d, y = parts
+            return datetime(y, m, d).strftime("%Y-%m-%d")
+    except ValueError:
+        pass
+    raise ValueError(f"Unrecognized date: {s}")
+
+def decode_csv(raw: bytes) -> csv.DictReader:
+    """DictReader over uploaded bytes (utf-8-sig, falling back to cp1251), lower-cased header."""
+    try:
+        content = raw.decode("utf-8-sig")
+    except UnicodeDecodeError:
+        content = raw.decode("cp1251", errors="ignore")
+    reader = csv.DictReader(io.StringIO(content))
+    if reader.fieldnames:
+        reader.fieldnames = [(fn or "").strip().lower() for fn in reader.fieldnames]
+    return reader
+
+def has_header(reader) -> bool:
+    return set(HEADER).issubset(set(reader.fieldnames or []))
+
+def parse_row(raw_row: dict, base_currency=None):
+    """(date, type, category, amount, description) or ValueError.
+
+    Imported rows are in the base currency: an optional currency column (as
+    written by the exports) must be empty or `base_currency`.
+    """
+    row = {(k or "").strip().lower(): (v or "").strip() for k, v in (raw_row or {}).items()}
+    currency = (row.get("currency") or "").upper()
+    if currency and currency != base_currency:
+        raise ValueError(f"Only {base_currency or 'base currency'} rows can be imported")
+    date = parse_date_any(row.get("date", ""))
+    type_ = (row.get("type") or "").lower()
+    if type_ not in ("income", "expense"):
+        raise ValueError("Invalid type")
+    cat = row.get("category") or "Uncategorized"
+    amt = float(Decimal((row.get("amount") or "").replace(",", ".") or "0"))
+    if amt <= 0:
+        raise ValueError("Amount must be positive")
+    return date, type_, cat, amt, row.get("description", "")
+
+# ---------- fingerprints ----------
+
+def fingerprint_rows(user_id, rows):
+    """[(date, type, category, amount, description, fingerprint), ...]"""
+    seen = Counter()
+    out = []
+    for date, type_, cat, amt, desc in rows:
+        base = fingerprint(user_id, date, type_, cat, amt, desc)
+        out.append((date, type_, cat, amt, desc, fingerprint(user_id, date, type_, cat, amt, desc, seen[base])))
+        seen[base] += 1
+    return out
+
+def backfill_fingerprints(user_id, batch_size=5000) -> int:
+    """Fill Record.fingerprint for a user's older rows (created before it existed).
+    Flushed, not committed: the caller's transaction decides."""
+    rows = (db.session.query(Record.id, Record.date, Record.type, Record.category, Record.amount, Record.description)
+            .filter(Record.user_id == user_id, Record.fingerprint.is_(None))
+            .order_by(Record.id)
+            .all())
+    if not rows:
+        return 0
+    seen = Counter()
+    updates = []
+    for rid, date, type_, cat, amt, desc in rows:
+        base = fingerprint(user_id, date, type_, cat, amt, desc)
+        updates.append({"id": rid, "fingerprint": fingerprint(user_id, date, type_, cat, amt, desc, seen[base])})
+        seen[base] += 1
+    for i in range(0, len(updates), batch_size):
+        db.session.execute(db.update(Record), updates[i:i + batch_size])
+    return len(updates)
+
+# ---------- bulk insert ----------
+
+def bulk_insert(user_id, rows, batch_size=5000, create_missing_categories=True):
+    """Insert fingerprinted rows for `user_id`, skipping ones already stored.
+
+    rows: output of fingerprint_rows(). Each batch costs one SELECT (anti-join
+    on the fingerprint index) and one executemany INSERT; everything is
+    committed once at the end, so an error part-way rolls the whole file back.
+    Returns {"inserted": n, "duplicates": n}.
+    """
+    backfill_fingerprints(user_id)
+
+    existing_cats = {name.lower() for (name,) in
+                     db.session.query(Category.name).filter(Category.user_id == user_id)}
+    inserted = duplicates = 0
+
+    for i in range(0, len(rows), batch_size):
+        batch = rows[i:i + batch_size]
+        fps = [r[5] for r in batch]
+        known = set(db.session.scalars(
+            select(Record.fingerprint).where(Record.user_id == user_id, Record.fingerprint.in_(fps))
+        ))
+
+        values = []
+        for date, type_, cat, amt, desc, fp in batch:
+            if fp in known:
+                duplicates += 1
+                continue
+            known.add(fp)
+            values.append({"date": date, "type": type_, "category": cat, "amount": amt,
+                           "description": desc, "user_id": user_id, "fingerprint": fp})
+            if create_missing_categories and cat.lower() not in existing_cats:
+                db.session.add(Category(name=cat, user_id=user_id))
+                existing_cats.add(cat.lower())
+
+        if values:
+            db.session.execute(insert(Record), values)
+            record_events.rows_inserted(db.session, user_id, [
+                (v["date"], v["type"], v["category"], v["amount"]) for v in values])
+            inserted += len(values)
+
+    db.session.commit()
+    return {"inserted": inserted, "duplicates": duplicates}
+
+# ---------- files (run in worker processes) ----------
+
+def parse_ledger_file(path, user_id):
+    """Read + validate + fingerprint one ledger file. Picklable result for a pool."""
+    with open(path, "rb") as f:
+        reader = decode_csv(f.read())
+    if not has_header(reader):
+        return {"path": path, "rows": [], "errors": ["missing header"]}
+    rows, errors = [], []
+    for i, raw_row in enumerate(reader, start=2):
+        try:
+            rows.append(parse_row(raw_row))
+        except Exception:
+            errors.append(i)
+    return {"path": path, "rows": fingerprint_rows(user_id, rows), "errors": errors}
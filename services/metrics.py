@@ -0,0 +1,241 @@
+"""Per-endpoint request instrumentation.
+
+For every request we record, per endpoint:
+
+* wall time (also as a histogram)
+* SQL statements and their total time (engine cursor events)
+* ORM rows hydrated (mapper "load" events)
+* template render time (Flask template signals)
+
+Exposed as Prometheus text on /metrics (routes/metrics.py) and, with
+SERVER_TIMING, as a `Server-Timing` header on every response. Numbers are
+per process: with several gunicorn workers, scrape each or aggregate.
+
+PROFILE_SLOW_MS > 0 turns on a sampling profiler: a background thread takes
+the request thread's stack every PROFILE_INTERVAL_MS, and requests slower
+than the threshold get their samples written to PROFILE_DIR as collapsed
+stacks (`frame;frame;frame count`, input for flamegraph.pl / speedscope).
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter, defaultdict
+
+from flask import g, has_request_context, request, before_render_template, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Mapper
+
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+# ---------- registry ----------
+
+class Metrics:
+    """Thread-safe per-endpoint counters."""
+
+    FIELDS = ("requests", "seconds", "sql_statements", "sql_seconds", "rows", "template_seconds")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+        self._hist = defaultdict(lambda: [0] * len(BUCKETS))
+
+    def observe(self, endpoint, seconds, sql_statements, sql_seconds, rows, template_seconds):
+        with self._lock:
+            d = self._data[endpoint]
+            d["requests"] += 1
+            d["seconds"] += seconds
+            d["sql_statements"] += sql_statements
+            d["sql_seconds"] += sql_seconds
+            d["rows"] += rows
+            d["template_seconds"] += template_seconds
+            hist = self._hist[endpoint]
+            for i, le in enumerate(BUCKETS):
+                if seconds <= le:
+                    hist[i] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return ({k: dict(v) for k, v in self._data.items()},
+                    {k: list(v) for k, v in self._hist.items()})
+
+    def render(self) -> str:
+        """Prometheus text exposition format."""
+        data, hist = self.snapshot()
+        out = []
+
+        def family(name, kind, help_, key):
+            out.append(f"# HELP {name} {help_}")
+            out.append(f"# TYPE {name} {kind}")
+            for ep in sorted(data):
+                out.append(f'{name}{{endpoint="{ep}"}} {data[ep][key]:g}')
+
+        family("app_requests_total", "counter", "Requests handled.", "requests")
+        family("app_sql_statements_total", "counter", "SQL statements executed.", "sql_statements")
+        family("app_sql_seconds_total", "counter", "Time spent in SQL statements.", "sql_seconds")
+        family("app_orm_rows_total", "counter", "ORM rows hydrated.", "rows")
+        family("app_template_seconds_total", "counter", "Time spent rendering templates.", "template_seconds")
+
+        out.append("# HELP app_request_seconds Request wall time.")
+        out.append("# TYPE app_request_seconds histogram")
+        for ep in sorted(data):
+            for le, n in zip(BUCKETS, hist[ep]):
+                out.append(f'app_request_seconds_bucket{{endpoint="{ep}",le="{le:g}"}} {n}')
+            out.append(f'app_request_seconds_bucket{{endpoint="{ep}",le="+Inf"}} {data[ep]["requests"]}')
+            out.append(f'app_request_seconds_sum{{endpoint="{ep}"}} {data[ep]["seconds"]:g}')
+            out.append(f'app_request_seconds_count{{endpoint="{ep}"}} {data[ep]["requests"]}')
+        return "\n".join(out) + "\n"
+
+# ---------- sampling profiler ----------
+
+class Sampler:
+    """One background thread sampling the stacks of the threads registered with start()."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._active = {}  # thread id -> Counter of collapsed stacks
+        self._thread = None
+
+    def start(self, thread_id):
+        with self._lock:
+            self._active[thread_id] = Counter()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._loop, name="request-sampler", daemon=True)
+                self._thread.start()
+
+    def stop(self, thread_id) -> Counter:
+        with self._lock:
+            return self._active.pop(thread_id, Counter())
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            frames = sys._current_frames()
+            with self._lock:
+                if not self._active:
+                    self._thread = None
+                    return
+                for tid, stacks in self._active.items():
+                    frame = frames.get(tid)
+                    if frame is not None:
+                        stacks[_collapse(frame)] += 1
+
+def _collapse(frame) -> str:
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(parts))
+
+def dump_stacks(profile_dir, endpoint, seconds, stacks: Counter) -> str:
+    os.makedirs(profile_dir, exist_ok=True)
+    name = f"{endpoint}-{int(time.time() * 1000)}-{int(seconds * 1000)}ms.folded"
+    path = os.path.join(profile_dir, name)
+    with open(path, "w", encoding="utf-8") as f:
+        for stack, n in stacks.most_common():
+            f.write(f"{stack} {n}\n")
+    return path
+
+# ---------- hooks ----------
+
+def _state():
+    # per-request counters; None outside requests (CLI, startup) or before they start
+    if has_request_context():
+        return g.get("_metrics")
+    return None
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("_metrics_t0", []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get("_metrics_t0")
+    if not starts:
+        return
+    took = time.perf_counter() - starts.pop()
+    st = _state()
+    if st is not None:
+        st["sql_statements"] += 1
+        st["sql_seconds"] += took
+
+def _on_load(target, context):
+    st = _state()
+    if st is not None:
+        st["rows"] += 1
+
+def _before_render(sender, template, context, **extra):
+    st = _state()
+    if st is not None:
+        st["_tpl_t0"] = time.perf_counter()
+
+def _rendered(sender, template, context, **extra):
+    st = _state()
+    if st is not None and "_tpl_t0" in st:
+        st["template_seconds"] += time.perf_counter() - st.pop("_tpl_t0")
+
+_hooks_installed = False
+
+def _install_hooks():
+    # engine/mapper events are global; install them once per process
+    global _hooks_installed
+    if _hooks_installed:
+        return
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+    event.listen(Mapper, "load", _on_load)
+    _hooks_installed = True
+
+def init_metrics(app):
+    if not app.config.get("METRICS_ENABLED", True):
+        return
+    _install_hooks()
+    metrics = app.extensions["metrics"] = Metrics()
+
+    slow_ms = float(app.config.get("PROFILE_SLOW_MS") or 0)
+    sampler = Sampler(app.config.get("PROFILE_INTERVAL_MS", 5) / 1000.0) if slow_ms > 0 else None
+    app.extensions["profiler"] = sampler
+
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_rendered, app)
+
+    @app.before_request
+    def _start():
+        g._metrics = {"t0": time.perf_counter(), "sql_statements": 0, "sql_seconds": 0.0,
+                      "rows": 0, "template_seconds": 0.0}
+        if sampler is not None:
+            sampler.start(threading.get_ident())
+
+    @app.after_request
+    def _finish(response):
+        st = g.pop("_metrics", None)
+        if st is None:
+            return response
+        seconds = time.perf_counter() - st["t0"]
+        endpoint = request.endpoint or "unmatched"
+        metrics.observe(endpoint, seconds, st["sql_statements"], st["sql_seconds"],
+                        st["rows"], st["template_seconds"])
+
+        if sampler is not None:
+            stacks = sampler.stop(threading.get_ident())
+            if seconds * 1000 >= slow_ms and stacks:
+                path = dump_stacks(app.config["PROFILE_DIR"], endpoint, seconds, stacks)
+                app.logger.info("slow request %s (%.0f ms), stacks in %s", endpoint, seconds * 1000, path)
+
+        if app.config.get("SERVER_TIMING"):
+            response.headers["Server-Timing"] = (
+                f'app;dur={seconds * 1000:.1f}, '
+                f'db;dur={st["sql_seconds"] * 1000:.1f};desc="{st["sql_statements"]} queries", '
+                f'tpl;dur={st["template_seconds"] * 1000:.1f}'
+            )
+        return response
+
+    if sampler is not None:
+        @app.teardown_request
+        def _stop_sampling(exc):
+            # after_request is skipped on unhandled errors; don't leave the thread registered
+            sampler.stop(threading.get_ident())
+
+    from routes.metrics import metrics_bp
+    app.register_blueprint(metrics_bp)
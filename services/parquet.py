@@ -0,0 +1,138 @@
+"""Parquet export/import of records, the typed bulk alternative to CSV.
+
+Export streams the query in batches of BATCH_SIZE rows (yield_per, so only
+one batch of Python rows is alive at a time), turns each batch into an Arrow
+record batch and appends it to a Parquet file as a row group:
+
+    date         date32
+    type         dictionary<string>
+    category     dictionary<string>
+    amount       float64
+    description  string
+    currency     dictionary<string>   (ISO code, never empty)
+
+Import reads the whole table with pyarrow and validates column-wise (the
+same rules as importer.parse_row, no per-row parsing or encoding guesses);
+the surviving rows go through the usual fingerprint_rows() / bulk_insert().
+Files written by other tools are accepted as long as the columns can be cast
+(a string date column must be YYYY-MM-DD).
+
+pyarrow is optional: without it available() is False and the routes answer
+that the format isn't supported.
+"""
+import io
+
+try:  # optional: Parquet needs pyarrow, CSV works without it
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover
+    pa = pc = pq = None
+
+from models.models import db, Record
+from services import fx
+from services.importer import HEADER
+
+BATCH_SIZE = 65536  # rows per DB fetch and per row group
+MIMETYPE = "application/vnd.apache.parquet"
+
+COLUMNS = (Record.date, Record.type, Record.category, Record.amount, Record.description, Record.currency)
+
+def available() -> bool:
+    return pq is not None
+
+def schema():
+    labels = pa.dictionary(pa.int32(), pa.string())
+    return pa.schema([("date", pa.date32()), ("type", labels), ("category", labels),
+                      ("amount", pa.float64()), ("description", pa.string()), ("currency", labels)])
+
+# ---------- export ----------
+
+def _batch(rows, base, sch):
+    dates, types, cats, amounts, descs, currencies = zip(*rows)
+    return pa.record_batch([
+        pc.cast(pa.array(dates, pa.string()), pa.date32()),
+        pa.array(types, pa.string()).dictionary_encode(),
+        pa.array(cats, pa.string()).dictionary_encode(),
+        pa.array(amounts, pa.float64()),
+        pc.fill_null(pa.array(descs, pa.string()), ""),
+        pc.fill_null(pa.array(currencies, pa.string()), base).dictionary_encode(),
+    ], schema=sch)
+
+def write_records(query, sink=None, batch_size=BATCH_SIZE):
+    """Write the records selected by an ORM query to `sink` (BytesIO by default); returns (sink, rows)."""
+    sink = sink if sink is not None else io.BytesIO()
+    sch, base = schema(), fx.base_currency()
+    result = db.session.execute(query.with_entities(*COLUMNS).statement,
+                                execution_options={"yield_per": batch_size})
+    n = 0
+    with pq.ParquetWriter(sink, sch, compression="zstd") as writer:
+        for rows in result.partitions():
+            writer.write_batch(_batch(rows, base, sch))
+            n += len(rows)
+    return sink, n
+
+# ---------- import ----------
+
+def _strings(col):
+    return pc.utf8_trim_whitespace(pc.cast(col, pa.string()))
+
+def _dates(col):
+    if pa.types.is_string(col.type) or pa.types.is_large_string(col.type) or pa.types.is_dictionary(col.type):
+        parsed = pc.strptime(_strings(col), format="%Y-%m-%d", unit="s", error_is_null=True)
+        return pc.cast(parsed, pa.date32())
+    return pc.cast(col, pa.date32())
+
+def _amounts(col):
+    if pa.types.is_string(col.type) or pa.types.is_dictionary(col.type):
+        col = pc.replace_substring(_strings(col), ",", ".")
+    try:
+        return pc.cast(col, pa.float64())
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError):
+        # some value isn't a number: fall back to per-value casting, bad ones become null
+        return pa.array([_float_or_none(v) for v in col.to_pylist()], pa.float64())
+
+def _float_or_none(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+def read_rows(raw: bytes, base_currency=None):
+    """Parquet bytes -> ([(date, type, category, amount, description)], [bad row numbers, 1-based]).
+
+    Raises ValueError if the file can't be read or lacks a required column.
+    """
+    try:
+        table = pq.read_table(io.BytesIO(raw))
+    except (pa.ArrowException, OSError) as e:
+        raise ValueError(f"not a Parquet file: {e}") from e
+    names = {n.lower(): n for n in table.column_names}
+    missing = [c for c in HEADER if c != "description" and c not in names]
+    if missing:
+        raise ValueError(f"missing columns: {', '.join(missing)}")
+    table = table.combine_chunks()
+
+    dates = _dates(table[names["date"]])
+    types = pc.utf8_lower(_strings(table[names["type"]]))
+    cats = _strings(table[names["category"]])
+    cats = pc.if_else(pc.fill_null(pc.equal(cats, ""), True), "Uncategorized", cats)
+    amounts = _amounts(table[names["amount"]])
+    if "description" in names:
+        descs = pc.fill_null(_strings(table[names["description"]]), "")
+    else:
+        descs = pa.array([""] * table.num_rows, pa.string())
+
+    valid = pc.and_(pc.is_valid(dates), pc.is_in(types, pa.array(["income", "expense"])))
+    valid = pc.and_(valid, pc.fill_null(pc.greater(amounts, 0), False))
+    if "currency" in names:
+        # base-currency rows only, like the CSV import
+        cur = pc.fill_null(pc.utf8_upper(_strings(table[names["currency"]])), "")
+        allowed = pa.array(["", base_currency] if base_currency else [""])
+        valid = pc.and_(valid, pc.is_in(cur, allowed))
+    valid = pc.fill_null(valid, False)
+
+    errors = (pc.indices_nonzero(pc.invert(valid)).to_numpy() + 1).tolist()
+    columns = [pc.filter(c, valid) for c in (pc.strftime(dates, "%Y-%m-%d"), types, cats, amounts, descs)]
+    rows = list(zip(*(c.to_pylist() for c in columns)))
+    return rows, errors
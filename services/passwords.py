@@ -0,0 +1,151 @@
+"""Password hashing off the request thread.
+
+PBKDF2 is deliberately slow, so a burst of logins would pin every worker's
+CPU. Hashing/verification therefore runs in a small per-process pool:
+
+* at most PASSWORD_POOL_WORKERS KDFs run at once (0 = inline, for dev/tests)
+* at most PASSWORD_QUEUE_DEPTH more may wait; beyond that -> PasswordBusy.
+  A slot is held until its KDF has finished, also when the request gave up
+  waiting for it (PASSWORD_TIMEOUT), so the bound holds under overload
+* LoginThrottle (token buckets per username and per IP) sits in front of it,
+  so rejected attempts never reach the pool at all.
+
+The bound is per process: a deployment runs up to gunicorn workers x
+PASSWORD_POOL_WORKERS KDFs at once. The default pool size is the CPU count
+divided by WEB_CONCURRENCY, but never below 1, so with more gunicorn workers
+than cores (the default 2 x CPU + 1) it exceeds the cores by that factor;
+lower WEB_CONCURRENCY where logins dominate.
+"""
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout
+
+from flask import current_app, has_app_context
+from werkzeug.security import generate_password_hash, check_password_hash
+
+DEFAULTS = {
+    "PASSWORD_POOL_WORKERS": 1,
+    "PASSWORD_QUEUE_DEPTH": 2,
+    "PASSWORD_TIMEOUT": 10.0,
+}
+
+class PasswordBusy(Exception):
+    """The KDF pool is saturated; the caller should answer 503."""
+
+# ---------- pool ----------
+
+_lock = threading.Lock()
+_state = {"pid": None, "pool": None, "slots": None, "workers": None}
+
+def _cfg(key):
+    if has_app_context():
+        return current_app.config.get(key, DEFAULTS[key])
+    return DEFAULTS[key]
+
+def _get_pool():
+    """Per-process pool + admission semaphore (re-created after fork)."""
+    workers = int(_cfg("PASSWORD_POOL_WORKERS"))
+    depth = int(_cfg("PASSWORD_QUEUE_DEPTH"))
+    with _lock:
+        if _state["pid"] != os.getpid() or _state["workers"] != workers:
+            # spawn, not fork: forking a threaded server process is unsafe
+            pool = None
+            if workers > 0:
+                pool = ProcessPoolExecutor(max_workers=workers,
+                                           mp_context=multiprocessing.get_context("spawn"))
+            _state.update(pid=os.getpid(), pool=pool, workers=workers,
+                          slots=threading.BoundedSemaphore(max(1, workers) + depth))
+        return _state["pool"], _state["slots"]
+
+def _run(fn, *args):
+    pool, slots = _get_pool()
+    if not slots.acquire(blocking=False):
+        raise PasswordBusy()
+    if pool is None:
+        try:
+            return fn(*args)
+        finally:
+            slots.release()
+    try:
+        future = pool.submit(fn, *args)
+    except BaseException:
+        slots.release()
+        raise
+    # freed when the KDF is done (or cancelled), not when this request stops waiting
+    future.add_done_callback(lambda _: slots.release())
+    try:
+        return future.result(timeout=float(_cfg("PASSWORD_TIMEOUT")))
+    except FutureTimeout:
+        future.cancel()  # still queued: drop it and free the slot now
+        raise PasswordBusy()
+
+def warm_pool():
+    """Start the pool's processes now instead of on the first login."""
+    pool, _ = _get_pool()
+    if pool is not None:
+        pool.submit(len, "").result()
+
+def hash_password(password: str, method: str = None) -> str:
+    if method is None:
+        return _run(generate_password_hash, password)
+    return _run(generate_password_hash, password, method)
+
+def verify_password(pwhash: str, password: str) -> bool:
+    return _run(check_password_hash, pwhash, password)
+
+# ---------- rate shaping ----------
+
+class TokenBucket:
+    """Classic token bucket per key: `burst` tokens, refilled at `rate`/sec."""
+
+    def __init__(self, rate: float, burst: int, max_keys: int = 10000):
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, key) -> float:
+        """Consume one token. Returns 0 if allowed, else seconds to wait."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, last = self._buckets.get(key, (self.burst, now))
+            tokens = min(self.burst, tokens + (now - last) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            if len(self._buckets) > self.max_keys:
+                self._prune(now)
+        return wait
+
+    def _prune(self, now):
+        # drop buckets that have refilled completely (they carry no state)
+        full = [k for k, (t, last) in self._buckets.items()
+                if t + (now - last) * self.rate >= self.burst]
+        for k in full:
+            del self._buckets[k]
+
+class LoginThrottle:
+    """Per-username and per-IP buckets; both must have a token."""
+
+    def __init__(self, per_minute: float, burst: int):
+        self.users = TokenBucket(per_minute / 60.0, burst)
+        self.ips = TokenBucket(per_minute / 60.0, burst * 4)  # NAT'd offices share an IP
+
+    def check(self, username: str, ip: str) -> float:
+        wait_user = self.users.take((username or "").lower())
+        wait_ip = self.ips.take(ip or "-")
+        return max(wait_user, wait_ip)
+
+def login_throttle() -> LoginThrottle:
+    return current_app.extensions["login_throttle"]
+
+def init_passwords(app):
+    app.extensions["login_throttle"] = LoginThrottle(
+        app.config["LOGIN_RATE_PER_MINUTE"], app.config["LOGIN_RATE_BURST"]
+    )
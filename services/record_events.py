@@ -0,0 +1,116 @@
+"""One place that sees every change to Record rows.
+
+Derived data (monthly rollups, caches, ...) subscribes here instead of each
+write path updating it by hand:
+
+* ORM writes (add / edit / delete, also user cascades) are picked up from
+  the session: before_flush collects the old and new values, after_flush
+  hands them to the listeners on the flush's connection, so everything
+  commits or rolls back together.
+* Bulk statements bypass the unit of work, so their callers publish
+  explicitly: rows_inserted() for executemany INSERTs, user_changed() for
+  UPDATE/DELETE statements whose rows are not known (e.g. a category rename).
+
+Listeners: `@subscribe` on fn(connection, changes, users), where changes is
+a list of Change (sign +1 for a row that now exists, -1 for one that is
+gone; an edit is -old, +new) and users the set of user ids whose records
+changed in some way not described by `changes`. Change.id is the record's
+id for ORM writes and None for bulk inserts.
+
+Listeners run inside the transaction, so anything they want to tell the
+user (budget alerts, anomaly flags) goes through notify(): it reaches
+g[key] for the routes to flash only once the session commits, and is
+dropped if it rolls back.
+"""
+from collections import namedtuple
+
+from flask import g, has_app_context
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+# currency None = base currency (services/fx.py); bulk inserts are always base
+Change = namedtuple("Change", "sign user_id date type category amount currency id", defaults=(None, None))
+
+FIELDS = ("user_id", "date", "type", "category", "amount", "currency")
+
+_listeners = []
+
+def subscribe(fn):
+    _listeners.append(fn)
+    return fn
+
+def publish(connection, changes=(), users=()):
+    changes, users = list(changes), set(users)
+    if not changes and not users:
+        return
+    for fn in _listeners:
+        fn(connection, changes, users)
+
+def rows_inserted(session, user_id, rows):
+    """After `session.execute(insert(Record), ...)`: rows are (date, type, category, amount, ...)."""
+    publish(session.connection(),
+            [Change(1, user_id, r[0], r[1], r[2], r[3]) for r in rows])
+
+def user_changed(session, user_id):
+    """After a bulk UPDATE/DELETE on a user's records."""
+    publish(session.connection(), users=[user_id])
+
+def notify(key, items):
+    """Queue `items` for g[key], delivered when the current transaction commits."""
+    if items and has_app_context():
+        g.setdefault("record_notes", []).append((key, list(items)))
+
+# ---------- session hooks ----------
+
+def _is_record(obj):
+    from models.models import Record  # models imports services; resolve at flush time
+    return isinstance(obj, Record)
+
+def _values(obj, old=False):
+    state = inspect(obj)
+    out = []
+    for f in FIELDS:
+        hist = state.attrs[f].history
+        if old and hist.deleted:
+            out.append(hist.deleted[0])
+        elif old and hist.unchanged:
+            out.append(hist.unchanged[0])
+        else:
+            out.append(getattr(obj, f))
+    return out
+
+# (Change, record) pairs: new records only get their id during the flush
+@event.listens_for(Session, "before_flush")
+def _collect(session, flush_context, instances):
+    changes = session.info.setdefault("record_changes", [])
+    for obj in session.new:
+        if _is_record(obj):
+            changes.append((Change(1, *_values(obj)), obj))
+    for obj in session.deleted:
+        if _is_record(obj):
+            changes.append((Change(-1, *_values(obj, old=True)), obj))
+    for obj in session.dirty:
+        if not _is_record(obj) or obj in session.deleted:
+            continue
+        state = inspect(obj)
+        if any(state.attrs[f].history.has_changes() for f in FIELDS):
+            changes.append((Change(-1, *_values(obj, old=True)), obj))
+            changes.append((Change(1, *_values(obj)), obj))
+
+@event.listens_for(Session, "after_flush")
+def _dispatch(session, flush_context):
+    changes = session.info.pop("record_changes", None)
+    if changes:
+        publish(session.connection(), [c._replace(id=obj.id) for c, obj in changes])
+
+@event.listens_for(Session, "after_commit")
+def _deliver(session):
+    if has_app_context():
+        for key, items in g.pop("record_notes", []):
+            g.setdefault(key, []).extend(items)
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("record_changes", None)
+    if has_app_context():
+        g.pop("record_notes", None)
@@ -0,0 +1,175 @@
+"""Recurring rules (rent, salary, subscriptions) materialized into records.
+
+materialize() loads every rule that is due, expands the occurrences up to a
+date in Python and writes them in large batches: one executemany INSERT per
+`batch_size` rows, one executemany UPDATE of the rules' next_date and one
+record_events publish per batch (rollups and checkpoints are updated per
+batch, not per row).
+
+Idempotent per (rule, occurrence date): a rule's next_date moves forward in
+the same transaction as its records, occurrences already stored are skipped
+(one lookup per batch) and the unique (rule_id, date) index stops a
+concurrent run; that run rolls back and leaves the work to the winner.
+
+Run it from cron (`flask recurring run`) or, with RECURRING_INTERVAL_SECONDS,
+from a background thread started in every worker (see gunicorn.conf.py);
+only the thread holding an flock on RECURRING_LOCK_FILE runs, the others
+keep trying so a restarted worker takes over.
+"""
+import os
+import threading
+from calendar import monthrange
+from datetime import date, timedelta
+
+try:  # flock: one scheduler per host; not on Windows, where only the dev server runs it
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+from sqlalchemy import bindparam, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models.models import db, RecurringRule, Record
+from services import record_events
+from services.fingerprints import date_fingerprinter
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+
+R = RecurringRule.__table__
+
+def _add_months(d: date, months: int, anchor_day: int) -> date:
+    y, m = divmod(d.month - 1 + months, 12)
+    y, m = d.year + y, m + 1
+    return date(y, m, min(anchor_day, monthrange(y, m)[1]))  # 31st -> last day of short months
+
+def next_occurrence(frequency: str, interval: int, current: date, anchor: date) -> date:
+    if frequency == "daily":
+        return current + timedelta(days=interval)
+    if frequency == "weekly":
+        return current + timedelta(weeks=interval)
+    if frequency == "monthly":
+        return _add_months(current, interval, anchor.day)
+    return _add_months(current, 12 * interval, anchor.day)
+
+def occurrences(frequency, interval, start_date, next_date, end_date, until):
+    """-> ([occurrence 'YYYY-MM-DD', ...] up to `until`, new next_date or None when finished)."""
+    anchor = date.fromisoformat(start_date)
+    d = date.fromisoformat(next_date)
+    last = min(until, date.fromisoformat(end_date)) if end_date else until
+    out = []
+    while d <= last:
+        out.append(d.isoformat())
+        d = next_occurrence(frequency, interval, d, anchor)
+    if end_date and d > date.fromisoformat(end_date):
+        return out, None
+    return out, d.isoformat()
+
+def materialize(until=None, rule_ids=None, batch_size=5000):
+    """Write every due occurrence up to `until` (default today). Returns {"rules", "inserted", "skipped"}."""
+    until = until or date.today()
+    q = (select(R.c.id, R.c.user_id, R.c.type, R.c.category, R.c.amount, R.c.description,
+                R.c.frequency, R.c.interval, R.c.start_date, R.c.next_date, R.c.end_date)
+         .where(R.c.next_date.is_not(None), R.c.next_date <= until.isoformat())
+         .order_by(R.c.id))
+    if rule_ids is not None:
+        q = q.where(R.c.id.in_(list(rule_ids)))
+    rules = db.session.execute(q).all()
+
+    stats = {"rules": len(rules), "inserted": 0, "skipped": 0}
+    rows, advances = [], []
+    for rule in rules:
+        dates, next_date = occurrences(rule.frequency, rule.interval, rule.start_date,
+                                       rule.next_date, rule.end_date, until)
+        fp = date_fingerprinter(rule.user_id, rule.type, rule.category, rule.amount, rule.description)
+        base = {"type": rule.type, "category": rule.category, "amount": rule.amount,
+                "description": rule.description or "", "user_id": rule.user_id, "rule_id": rule.id}
+        rows.extend({**base, "date": d, "fingerprint": fp(d)} for d in dates)
+        advances.append({"k_id": rule.id, "next_date": next_date})
+        # flush at rule boundaries, so a rule's records and its next_date commit together
+        if len(rows) >= batch_size:
+            if not _write_batch(rows, advances, batch_size, stats):
+                return stats
+            rows, advances = [], []
+    if advances:
+        _write_batch(rows, advances, batch_size, stats)
+    return stats
+
+def _write_batch(rows, advances, batch_size, stats):
+    try:
+        if rows:
+            # occurrences already stored (a rule whose next_date was moved back, a retried run)
+            known = set(db.session.execute(
+                select(Record.rule_id, Record.date)
+                .where(Record.rule_id.in_({r["rule_id"] for r in rows}), Record.date >= min(r["date"] for r in rows))
+            ).all())
+            fresh = [r for r in rows if (r["rule_id"], r["date"]) not in known]
+            stats["skipped"] += len(rows) - len(fresh)
+            for i in range(0, len(fresh), batch_size):
+                # Core insert on the table: skips the ORM bulk path's per-row bookkeeping
+                db.session.execute(insert(Record.__table__), fresh[i:i + batch_size])
+            record_events.publish(db.session.connection(), [
+                record_events.Change(1, r["user_id"], r["date"], r["type"], r["category"], r["amount"])
+                for r in fresh])
+            stats["inserted"] += len(fresh)
+        db.session.execute(update(R).where(R.c.id == bindparam("k_id")), advances)
+        db.session.commit()
+        return True
+    except IntegrityError:
+        # another run materialized the same occurrences first
+        db.session.rollback()
+        return False
+
+# ---------- background thread ----------
+
+def hold_lock(path):
+    """Take an exclusive flock on `path` without waiting: the open file while held
+    (released when it is closed or the process exits), None if another process has it."""
+    if fcntl is None:
+        return True
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    f = open(path, "a")
+    try:
+        fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        f.close()
+        return None
+    return f
+
+def start_scheduler(app, stop=None):
+    """Materialize due rules every RECURRING_INTERVAL_SECONDS in a daemon thread (0 = off);
+    it only works while it holds RECURRING_LOCK_FILE, so one process of the deployment does.
+    Runs until `stop` (a threading.Event, see stop_scheduler) is set, then lets go of the lock."""
+    interval = app.config.get("RECURRING_INTERVAL_SECONDS", 0)
+    if interval <= 0 or "recurring_scheduler" in app.extensions:
+        return None
+    stop = stop or threading.Event()
+
+    def loop():
+        lock = None
+        try:
+            while not stop.is_set():
+                lock = lock or hold_lock(app.config["RECURRING_LOCK_FILE"])
+                if lock:
+                    with app.app_context():
+                        try:
+                            materialize(batch_size=app.config["RECURRING_BATCH_SIZE"])
+                        except Exception:
+                            app.logger.exception("recurring: materialize failed")
+                        finally:
+                            db.session.remove()
+                stop.wait(interval)
+        finally:
+            if lock and lock is not True:
+                lock.close()
+
+    thread = threading.Thread(target=loop, name="recurring-scheduler", daemon=True)
+    app.extensions["recurring_scheduler"] = {"thread": thread, "stop": stop}
+    thread.start()
+    return thread
+
+def stop_scheduler(app, timeout=None):
+    """Stop the scheduler thread (if one runs) and wait for it; a run in progress finishes first."""
+    scheduler = app.extensions.pop("recurring_scheduler", None)
+    if scheduler:
+        scheduler["stop"].set()
+        scheduler["thread"].join(timeout)
@@ -0,0 +1,134 @@
+"""Heavy reports on a per-user pandas DataFrame (/api/reports/*).
+
+A user's records (amounts already converted to base currency by
+services/fx.py) are worked on as a typed frame:
+
+    date      datetime64[ns]
+    type      category
+    category  category
+    month     category ('YYYY-MM', derived once here rather than per report)
+    amount    float64
+    merchant  category (normalized description, see merchant_keys)
+
+The frame is built from the user's cached record columns
+(services/columnar.py), keyed by User.data_version. The version is bumped by
+a services/record_events listener in the same transaction as every record
+write (and every `flask fx import`, which publishes the users whose base
+amounts moved), so any worker sees a write on its next request: a changed version is
+a cache miss, never a stale report. With the column cache off the frame is
+read straight from the database.
+
+Every report is a handful of vectorized pandas operations on that frame.
+"""
+import re
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import select, update
+
+from models.models import Record, User
+from services import columnar, fx, record_events
+
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+
+# ---------- data version ----------
+
+@record_events.subscribe
+def _bump_version(connection, changes, users):
+    touched = {c.user_id for c in changes} | set(users)
+    connection.execute(update(User).where(User.id.in_(touched))
+                       .values(data_version=User.data_version + 1))
+
+# ---------- frames ----------
+
+_digits = re.compile(r"[0-9#*]+")
+_punct = re.compile(r"[^\w\s]+")
+_space = re.compile(r"\s+")
+
+def merchant_keys(descriptions: pd.Series) -> pd.Series:
+    """'LIDL #123 Sofia ' / 'lidl 456 sofia' -> 'lidl sofia' (vectorized; '' stays '')."""
+    s = descriptions.fillna("").str.lower()
+    s = s.str.replace(_digits, " ", regex=True).str.replace(_punct, " ", regex=True)
+    return s.str.replace(_space, " ", regex=True).str.strip().astype("category")
+
+def load_frame(connection, user_id) -> pd.DataFrame:
+    stmt = (select(Record.date, Record.type, Record.category, fx.base_amount().label("amount"),
+                   Record.description)
+            .where(Record.user_id == user_id)
+            .order_by(Record.date, Record.id))
+    df = pd.read_sql(stmt, connection, parse_dates={"date": {"format": "%Y-%m-%d"}},
+                     dtype={"type": "category", "category": "category", "amount": "float64"})
+    df["amount"] = df["amount"].fillna(0.0)  # a currency without rates, as in the SQL sums
+    months = np.datetime_as_string(df["date"].to_numpy().astype("datetime64[M]"), unit="M")
+    df.insert(1, "month", pd.Categorical(months))
+    df["merchant"] = merchant_keys(df.pop("description"))
+    return df
+
+def frame(session, user) -> pd.DataFrame:
+    """The user's frame; only queries the records when User.data_version moved."""
+    cols = columnar.columns(session, user)
+    if cols is None:
+        return load_frame(session.connection(), user.id)
+    return columnar.to_frame(cols)
+
+def select_rows(df, type_="expense", start=None, end=None):
+    mask = df["type"] == type_ if type_ else np.ones(len(df), dtype=bool)
+    if start is not None:
+        mask &= df["date"] >= pd.Timestamp(start)
+    if end is not None:
+        mask &= df["date"] <= pd.Timestamp(end)
+    return df[mask]
+
+# ---------- reports ----------
+
+def _round(values):
+    return np.round(np.asarray(values, dtype="float64"), 2).tolist()
+
+def category_pivot(df):
+    """Categories x months sums: {"months", "categories", "values" (rows = categories), "totals"}."""
+    if df.empty:
+        return {"months": [], "categories": [], "values": [], "totals": []}
+    table = pd.pivot_table(df, index="category", columns="month", values="amount",
+                           aggfunc="sum", fill_value=0.0, observed=True)
+    table = table.loc[table.sum(axis=1).sort_values(ascending=False).index]
+    return {"months": list(table.columns), "categories": [str(c) for c in table.index],
+            "values": [_round(row) for row in table.to_numpy()], "totals": _round(table.sum(axis=1))}
+
+def rolling_average(df, window=30):
+    """Daily sums (gap days = 0) and their `window`-day trailing mean."""
+    if df.empty:
+        return {"window": window, "dates": [], "daily": [], "rolling": []}
+    daily = df.groupby("date")["amount"].sum()
+    daily = daily.reindex(pd.date_range(daily.index.min(), daily.index.max(), freq="D"), fill_value=0.0)
+    rolling = daily.rolling(window, min_periods=1).mean()
+    return {"window": window, "dates": daily.index.strftime("%Y-%m-%d").tolist(),
+            "daily": _round(daily), "rolling": _round(rolling)}
+
+def top_merchants(df, limit=10):
+    """Largest spend by normalized description: [{merchant, total, count, average, last}]."""
+    df = df[df["merchant"] != ""]
+    if df.empty:
+        return []
+    g = df.groupby("merchant", observed=True).agg(total=("amount", "sum"), count=("amount", "size"),
+                                                  last=("date", "max"))
+    g = g.nlargest(limit, "total")
+    return [{"merchant": m, "total": round(t, 2), "count": int(n), "average": round(t / n, 2),
+             "last": d.strftime("%Y-%m-%d")}
+            for m, t, n, d in zip(g.index, g["total"], g["count"], g["last"])]
+
+def weekday_heatmap(df):
+    """Weekday x month sums ({"weekdays", "months", "values" (rows = weekdays)}) plus the mean
+    spend of each weekday over the days in range."""
+    if df.empty:
+        return {"weekdays": list(WEEKDAYS), "months": [], "values": [[] for _ in WEEKDAYS], "mean": [0.0] * 7}
+    weekday = df["date"].dt.weekday.rename("weekday")
+    table = (df.groupby([weekday, df["month"]], observed=True)["amount"].sum()
+             .unstack("month", fill_value=0.0)
+             .reindex(range(7), fill_value=0.0))
+    # mean per calendar day, so a weekday that occurs more often isn't favoured
+    days = pd.date_range(df["date"].min(), df["date"].max(), freq="D")
+    occurrences = np.bincount(days.weekday, minlength=7)
+    sums = table.sum(axis=1).to_numpy()
+    mean = np.divide(sums, occurrences, out=np.zeros(7), where=occurrences > 0)
+    return {"weekdays": list(WEEKDAYS), "months": list(table.columns),
+            "values": [_round(row) for row in table.to_numpy()], "mean": _round(mean)}
@@ -0,0 +1,88 @@
+"""Monthly rollups: sum/count of records per (user, month, type, category).
+
+Kept current from services/record_events.py, on the connection of the flush
+that changed the records. Amounts are in base currency (services/fx.py). A dashboard range made of whole months reads these
+rows instead of the raw records (services/dashboard.py).
+
+`flask rollups rebuild` recomputes everything from the records (databases
+created before rollups existed, or after manual SQL edits).
+"""
+from collections import defaultdict
+
+from sqlalchemy import bindparam, delete, func, insert, select, update
+
+from models.models import db, MonthlyRollup, Record
+from services import fx, record_events
+
+R = MonthlyRollup.__table__
+
+def _deltas(connection, changes):
+    out = defaultdict(lambda: [0.0, 0])
+    for c in changes:
+        d = out[(c.user_id, c.date[:7], c.type, c.category)]
+        d[0] += c.sign * fx.to_base(c.amount, c.currency, c.date, connection)
+        d[1] += c.sign
+    return {k: v for k, v in out.items() if v[1] or v[0]}
+
+def apply_changes(connection, changes):
+    """Add record changes to the rollups: one SELECT, then executemany UPDATE / DELETE / INSERT."""
+    deltas = _deltas(connection, changes)
+    if not deltas:
+        return
+    # superset of the keys we need (users x months), still a handful of rows
+    counts = {
+        (u, m, t, c): n for u, m, t, c, n in connection.execute(
+            select(R.c.user_id, R.c.month, R.c.type, R.c.category, R.c.count)
+            .where(R.c.user_id.in_({k[0] for k in deltas}), R.c.month.in_({k[1] for k in deltas}))
+        )
+    }
+    updates, deletes, inserts = [], [], []
+    for (u, m, t, c), (amount, count) in deltas.items():
+        key = {"k_user": u, "k_month": m, "k_type": t, "k_category": c}
+        if (u, m, t, c) in counts:
+            if counts[(u, m, t, c)] + count <= 0:
+                deletes.append(key)  # the key's last record went away
+            else:
+                updates.append({**key, "d_amount": amount, "d_count": count})
+        elif count > 0:
+            # a missing key with a negative delta: rows removed together with their
+            # rollups (user cascade) or rollups never built - nothing to subtract from
+            inserts.append({"user_id": u, "month": m, "type": t, "category": c,
+                            "amount": amount, "count": count})
+    key_match = (R.c.user_id == bindparam("k_user"), R.c.month == bindparam("k_month"),
+                 R.c.type == bindparam("k_type"), R.c.category == bindparam("k_category"))
+    if updates:
+        connection.execute(
+            update(R).where(*key_match)
+            .values(amount=R.c.amount + bindparam("d_amount"), count=R.c.count + bindparam("d_count")),
+            updates,
+        )
+    if deletes:
+        connection.execute(delete(R).where(*key_match), deletes)
+    if inserts:
+        connection.execute(insert(R), inserts)
+
+def rebuild(connection, user_ids=None):
+    """Recompute rollups from the records (all users, or only `user_ids`)."""
+    src = (select(Record.user_id, func.substr(Record.date, 1, 7), Record.type, Record.category,
+                  func.sum(fx.base_amount()), func.count(Record.id))
+           .group_by(Record.user_id, func.substr(Record.date, 1, 7), Record.type, Record.category))
+    stmt = delete(R)
+    if user_ids is not None:
+        user_ids = list(user_ids)
+        src = src.where(Record.user_id.in_(user_ids))
+        stmt = stmt.where(R.c.user_id.in_(user_ids))
+    connection.execute(stmt)
+    connection.execute(insert(R).from_select(["user_id", "month", "type", "category", "amount", "count"], src))
+
+@record_events.subscribe
+def _on_records_changed(connection, changes, users):
+    if users:
+        rebuild(connection, users)
+        changes = [c for c in changes if c.user_id not in users]
+    apply_changes(connection, changes)
+
+def rebuild_all():
+    rebuild(db.session.connection())
+    db.session.commit()
+    return db.session.query(func.count(MonthlyRollup.id)).scalar()
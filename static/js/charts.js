@@ -57,3 +57,16 @@ function renderMonthlyChart(months, incomeVals, expenseVals) {
     }
   });
 }
+
+// fetch /chart-data once and draw all three charts
+function loadCharts(url) {
+  if (!document.querySelector('#categoryChart, #incomeChart, #monthlyChart')) return;
+  fetch(url, { credentials: 'same-origin', headers: { 'Accept': 'application/json' } })
+    .then(r => r.ok ? r.json() : Promise.reject(r.status))
+    .then(data => {
+      renderCategoryChart(data.expense.labels, data.expense.values);
+      renderIncomeCategoryChart(data.income.labels, data.income.values);
+      renderMonthlyChart(data.series.labels, data.series.income, data.series.expense);
+    })
+    .catch(err => console.warn('chart data unavailable:', err));
+}
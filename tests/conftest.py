@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+
+import pytest
+from sqlalchemy import event
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from models.models import db, User, Record, Category
+
+TEST_CONFIG = {
+    "TESTING": True,
+    "SECRET_KEY": "test",
+    "SQLALCHEMY_DATABASE_URI": "sqlite://",  # in-memory, one shared connection
+    "JINJA_BYTECODE_CACHE_DIR": "",
+    "PASSWORD_POOL_WORKERS": 0,              # hash inline
+    "PASSWORD_HASH_METHOD": "pbkdf2:sha256:1000",
+    "LOGIN_RATE_BURST": 1000,
+}
+
+PASSWORD = "secret"
+CATEGORIES = ["Food", "Rent", "Salary", "Fun", "Transport"]
+
+def seed(n_records=200):
+    """Two users; alice has `n_records` records over ~1 year, bob a few of his own."""
+    ids = {}
+    for name, n in (("alice", n_records), ("bob", 5)):
+        user = User(username=name)
+        user.set_password(PASSWORD)
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all(Category(name=c, user_id=user.id) for c in CATEGORIES)
+        db.session.add_all(
+            Record(date=f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+                   type="income" if CATEGORIES[i % 5] == "Salary" else "expense",
+                   category=CATEGORIES[i % 5], amount=10 + i % 90,
+                   description=f"{name} record {i}", user_id=user.id)
+            for i in range(n)
+        )
+        db.session.flush()
+        ids[name] = user.id
+    db.session.commit()
+    alice = ids["alice"]
+    ids["record"] = db.session.query(Record.id).filter_by(user_id=alice).order_by(Record.id).first()[0]
+    ids["category"] = db.session.query(Category.id).filter_by(user_id=alice, name="Fun").first()[0]
+    return ids
+
+@pytest.fixture
+def app():
+    app = create_app(TEST_CONFIG)
+    # no app context is held across requests: each request gets its own
+    # session, as in production, so identity-map hits don't hide queries
+    with app.app_context():
+        db.create_all()
+        app.config["SEED_IDS"] = seed()
+        app.config["TEST_ENGINE"] = db.engine
+    yield app
+    with app.app_context():
+        db.session.remove()
+        db.drop_all()
+
+@pytest.fixture
+def ids(app):
+    return app.config["SEED_IDS"]
+
+@pytest.fixture
+def client(app):
+    """Test client with a logged-in session (alice)."""
+    c = app.test_client()
+    r = c.post("/auth/login", data={"username": "alice", "password": PASSWORD})
+    assert r.status_code == 302, r.get_data(as_text=True)
+    return c
+
+@pytest.fixture
+def api_headers(app):
+    r = app.test_client().post("/api/login", json={"username": "alice", "password": PASSWORD})
+    assert r.status_code == 200, r.get_data(as_text=True)
+    return {"Authorization": f"Bearer {r.get_json()['token']}"}
+
+class QueryRecorder:
+    """Collects (statement, seconds) for every SQL statement run inside the block."""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info["_qr_t0"] = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, time.perf_counter() - conn.info.pop("_qr_t0", time.perf_counter())))
+
+    def __enter__(self):
+        event.listen(self.engine, "before_cursor_execute", self._before)
+        event.listen(self.engine, "after_cursor_execute", self._after)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, "before_cursor_execute", self._before)
+        event.remove(self.engine, "after_cursor_execute", self._after)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+    def slow(self, threshold_ms):
+        return [(s, t) for s, t in self.statements if t * 1000 > threshold_ms]
+
+    def report(self):
+        return "\n".join(f"  {t * 1000:7.2f} ms  {' '.join(s.split())[:160]}" for s, t in self.statements)
+
+@pytest.fixture
+def queries(app):
+    """`with queries() as q:` -> q.count, q.slow(ms), q.report()."""
+    return lambda: QueryRecorder(app.config["TEST_ENGINE"])
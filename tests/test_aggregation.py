@@ -0,0 +1,59 @@
+import random
+from collections import defaultdict
+
+import numpy as np
+import pytest
+
+from services.aggregation import aggregate_columns
+
+TYPES = ("income", "expense", "transfer")
+
+def _rows(n, cents, seed=7):
+    rnd = random.Random(seed)
+    return [(f"2024-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}", rnd.choice(TYPES),
+             rnd.choice(["Food", "Rent", "Fun", "Salary"]),
+             rnd.randint(0, 5000) if cents else rnd.randint(0, 5000) / 100) for _ in range(n)]
+
+def _columns(rows):
+    months = sorted({d[:7] for d, *_ in rows})
+    cats = sorted({c for _, _, c, _ in rows})
+    codes = {"income": 0, "expense": 1}
+    return (np.array([months.index(d[:7]) for d, *_ in rows]), months,
+            np.array([codes.get(t, 255) for _, t, _, _ in rows], dtype=np.uint8),
+            np.array([cats.index(c) for _, _, c, _ in rows]), cats,
+            np.array([a for *_, a in rows]))
+
+def _loop(rows):
+    # plain reference: one pass over the row tuples
+    totals, count = defaultdict(int), 0
+    by = {kind: {"income": defaultdict(int), "expense": defaultdict(int)} for kind in ("by_category", "by_month")}
+    for date, type_, category, amount in rows:
+        if type_ in ("income", "expense"):
+            count += 1
+            totals[type_] += amount
+            by["by_category"][type_][category] += amount
+            by["by_month"][type_][date[:7]] += amount
+    return {"income": totals["income"], "expense": totals["expense"],
+            "balance": totals["income"] - totals["expense"], "count": count,
+            "months": sorted(set(by["by_month"]["income"]) | set(by["by_month"]["expense"])),
+            **{kind: {t: dict(d) for t, d in v.items()} for kind, v in by.items()}}
+
+@pytest.mark.parametrize("cents", [True, False])
+def test_loop_and_columns_agree(cents):
+    rows = _rows(2000, cents)
+    loop, vec = _loop(rows), aggregate_columns(*_columns(rows))
+    assert loop["count"] == vec["count"] == sum(t != "transfer" for _, t, _, _ in rows)
+    assert loop["months"] == vec["months"]
+    for key in ("income", "expense", "balance"):
+        assert loop[key] == pytest.approx(vec[key])
+    for kind in ("by_category", "by_month"):
+        for type_ in ("income", "expense"):
+            assert loop[kind][type_] == pytest.approx(vec[kind][type_])
+
+def test_unknown_types_are_ignored():
+    rows = [("2024-01-05", "income", "Salary", 100), ("2024-02-01", "transfer", "Savings", 40),
+            ("2024-01-09", "expense", "Food", 30)]
+    agg = aggregate_columns(*_columns(rows))
+    assert (agg["income"], agg["expense"], agg["count"]) == (100, 30, 2)
+    assert "Savings" not in agg["by_category"]["expense"]
+    assert agg["months"] == ["2024-01"]
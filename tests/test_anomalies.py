@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+from flask import g
+from sqlalchemy import insert
+
+from models.models import db, CategoryStat, Record
+from services import anomalies, record_events
+
+def _add(client, amount, day="2025-03-01", category="Food", description=""):
+    return client.post("/records/add", data={"type": "expense", "category": category, "amount": str(amount),
+                                             "date": day, "description": description}, follow_redirects=True)
+
+def _flag(app, record_id):
+    with app.app_context():
+        return db.session.get(Record, record_id).anomaly
+
+def _stat(app, user_id, category):
+    with app.app_context():
+        s = CategoryStat.query.filter_by(user_id=user_id, category=category).one()
+        amounts = np.array([a for (a,) in db.session.query(Record.amount)
+                            .filter_by(user_id=user_id, category=category, type="expense")])
+        return (s.count, s.mean, s.m2), (len(amounts), amounts.mean(), ((amounts - amounts.mean()) ** 2).sum())
+
+def test_unusual_amount_flagged_on_insert_and_cleared_on_edit(app, client, ids, api_headers):
+    page = _add(client, 5000)
+    assert b"flagged as unusual" in page.data
+    _add(client, 60)
+    c = app.test_client()
+    items = c.get("/api/records?anomaly=amount", headers=api_headers).get_json()["items"]
+    assert [(i["amount"], i["anomaly"]) for i in items] == [(5000.0, "amount")]
+
+    rid = items[0]["id"]
+    c.patch(f"/api/records/{rid}", json={"amount": 40}, headers=api_headers)
+    assert _flag(app, rid) is None
+    (n, mean, m2), expected = _stat(app, ids["alice"], "Food")
+    assert (n, mean, m2) == pytest.approx(expected)
+
+def test_flags_are_flashed_only_after_commit(app, ids):
+    with app.test_request_context():
+        db.session.add(Record(date="2025-03-01", type="expense", category="Food", amount=5000.0, user_id=ids["alice"]))
+        db.session.flush()
+        db.session.rollback()
+        assert "anomalies" not in g
+        db.session.add(Record(date="2025-03-01", type="expense", category="Food", amount=5000.0, user_id=ids["alice"]))
+        db.session.commit()
+        assert g.anomalies == ["amount"]
+
+def test_duplicate_charge(app, client, api_headers):
+    _add(client, 12.5, description="Coffee")
+    page = _add(client, 12.5, description="Coffee")
+    assert b"looks like a duplicate" in page.data
+    _add(client, 12.5, description="Tea")
+    body = app.test_client().get("/api/records?anomaly=1&date_from=2025-03-01", headers=api_headers).get_json()
+    assert [(i["description"], i["anomaly"]) for i in body["items"]] == [("Coffee", "duplicate")]
+
+    listing = client.get("/records/?anomaly=duplicate").get_data(as_text=True)
+    assert listing.count("duplicate?</span>") == 1
+
+def test_deletes_and_bulk_inserts_keep_stats(app, ids):
+    with app.app_context():
+        alice = ids["alice"]
+        db.session.delete(Record.query.filter_by(user_id=alice, category="Rent").first())
+        db.session.commit()
+        db.session.execute(insert(Record), [{"date": "2025-01-01", "type": "expense", "category": "Rent",
+                                             "amount": 75.0, "user_id": alice}])
+        record_events.rows_inserted(db.session, alice, [("2025-01-01", "expense", "Rent", 75.0)])
+        db.session.commit()
+    (n, mean, m2), expected = _stat(app, ids["alice"], "Rent")
+    assert (n, mean, m2) == pytest.approx(expected)
+
+def test_scan_matches_incremental_and_flags_bulk_rows(app, ids):
+    with app.app_context():
+        alice = ids["alice"]
+        before = {(s.user_id, s.category): (s.count, s.mean, s.m2) for s in CategoryStat.query}
+        # bulk rows have no id on write: only the batch flags them
+        rows = [("2025-02-01", "expense", "Fun", 9000.0), ("2025-02-02", "expense", "Fun", 30.0),
+                ("2025-02-02", "expense", "Fun", 30.0)]
+        db.session.execute(insert(Record), [dict(zip(("date", "type", "category", "amount"), r), user_id=alice)
+                                            for r in rows])
+        db.session.commit()
+        result = anomalies.scan_all()
+        assert (result["amount"], result["duplicate"], result["changed"]) == (1, 1, 2)
+        flagged = dict(db.session.query(Record.amount, Record.anomaly).filter(Record.anomaly.isnot(None)))
+        assert flagged == {9000.0: "amount", 30.0: "duplicate"}
+
+        after = {(s.user_id, s.category): (s.count, s.mean, s.m2) for s in CategoryStat.query}
+        assert after.keys() == before.keys()
+        for key in before:
+            if key != (alice, "Fun"):
+                assert after[key] == pytest.approx(before[key])
+        assert anomalies.scan_all()["changed"] == 0
+        assert anomalies.scan(db.session.connection(), [-1]) == {"records": 0, "amount": 0, "duplicate": 0,
+                                                                 "changed": 0}
+
+def test_threshold(app):
+    with app.app_context():
+        stat = [0, 0.0, 0.0]
+        for x in [10, 12, 11, 9, 10, 11, 12, 10, 9, 11]:
+            stat = anomalies._add(stat, x)
+        assert not anomalies.is_unusual(stat, 14, 5, 10)
+        assert anomalies.is_unusual(stat, 20, 5, 10)
+        assert not anomalies.is_unusual(stat, 20, 5, 11)  # too little history
+        for x in [10, 12]:
+            stat = anomalies._remove(stat, x)
+        assert stat == pytest.approx([8, 10.375, 7.875])
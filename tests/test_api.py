@@ -0,0 +1,117 @@
+"""End-to-end API flow (was tests/api_test.py against a live server)."""
+import io
+
+import pytest
+
+from models.models import db, Record
+from services import importer
+
+def test_api_flow(app, api_headers):
+    c = app.test_client()
+    h = api_headers
+
+    r = c.get("/api/me", headers=h)
+    assert r.status_code == 200 and r.get_json()["username"] == "alice"
+
+    r = c.post("/api/categories", json={"name": "TestAPI"}, headers=h)
+    assert r.status_code == 201, r.get_data(as_text=True)
+
+    r = c.post("/api/records", headers=h, json={
+        "date": "2025-08-29", "type": "expense", "category": "TestAPI",
+        "amount": 12.5, "description": "API test expense",
+    })
+    assert r.status_code == 201, r.get_data(as_text=True)
+    record_id = r.get_json()["id"]
+
+    r = c.put(f"/api/records/{record_id}", headers=h, json={
+        "date": "2025-09-01", "type": "expense", "category": "TestAPI",
+        "amount": 99.99, "description": "Edited by API test",
+    })
+    assert r.status_code == 200, r.get_data(as_text=True)
+    assert r.get_json()["amount"] == 99.99
+
+    r = c.get("/api/records", headers=h, query_string={
+        "entry_type": "expense", "category": "TestAPI",
+        "date_from": "2025-01-01", "date_to": "2025-12-31", "q": "Edited",
+    })
+    assert r.status_code == 200
+    assert [rec["id"] for rec in r.get_json()["items"]] == [record_id]
+
+    r = c.get("/api/records/export/csv", headers=h)
+    assert r.status_code == 200 and r.data.startswith(b"\xef\xbb\xbf")
+    exported = r.data
+
+    r = c.get("/api/records/export/pdf", headers=h)
+    assert r.status_code == 200 and r.data.startswith(b"%PDF")
+
+    # re-importing our own export only finds duplicates
+    r = c.post("/api/records/import/csv", headers=h, data={"file": (io.BytesIO(exported), "export.csv")})
+    assert r.status_code == 201, r.get_data(as_text=True)
+    assert r.get_json()["imported"] == 0 and r.get_json()["duplicates"] > 0
+
+    r = c.delete(f"/api/records/{record_id}", headers=h)
+    assert r.status_code == 200
+    assert c.get(f"/api/records/{record_id}", headers=h).status_code == 404
+
+def test_api_requires_token(app):
+    c = app.test_client()
+    assert c.get("/api/records").status_code == 401
+    assert c.get("/api/records", headers={"Authorization": "Bearer nope"}).status_code == 401
+
+def test_update_publishes_record_changes_once(app, ids, api_headers, monkeypatch):
+    from services import record_events
+
+    calls = []
+    monkeypatch.setattr(record_events, "_listeners",
+                        record_events._listeners + [lambda conn, changes, users: calls.append(changes)])
+    r = app.test_client().put(f"/api/records/{ids['record']}", headers=api_headers, json={
+        "date": "2024-05-06", "type": "expense", "category": "Rent", "amount": 99.99, "currency": "BGN"})
+    assert r.status_code == 200
+    assert [[c.sign for c in changes] for changes in calls] == [[-1, 1]]
+
+    # a rejected field leaves the record untouched
+    r = app.test_client().put(f"/api/records/{ids['record']}", headers=api_headers,
+                              json={"amount": 5, "category": "Nope"})
+    assert r.status_code == 400 and len(calls) == 1
+    assert app.test_client().get(f"/api/records/{ids['record']}", headers=api_headers).get_json()["amount"] == 99.99
+
+def test_duplicates_added_by_hand_survive_a_reimport(app, ids, api_headers):
+    c = app.test_client()
+    coffee = {"date": "2025-08-29", "type": "expense", "category": "Food", "amount": 3, "description": "Coffee"}
+    for _ in range(2):
+        assert c.post("/api/records", headers=api_headers, json=coffee).status_code == 201
+    csv_text = "date,type,category,amount,description\n" + "2025-08-29,expense,Food,3,coffee\n" * 3
+
+    r = c.post("/api/records/import/csv", headers=api_headers, data={"file": (io.BytesIO(csv_text.encode()), "c.csv")})
+    assert r.get_json() == {"imported": 1, "duplicates": 2}  # the two stored ones are occurrences 0 and 1
+    exported = c.get("/api/records/export/csv", headers=api_headers).data
+    r = c.post("/api/records/import/csv", headers=api_headers, data={"file": (io.BytesIO(exported), "e.csv")})
+    assert r.get_json()["imported"] == 0
+
+    # an edit that turns one record into a copy of another takes the next ordinal as well
+    with app.app_context():
+        taken = {r.fingerprint for r in Record.query.filter_by(user_id=ids["alice"], description="Coffee")}
+        other = Record.query.filter_by(user_id=ids["alice"]).filter(Record.description != "Coffee").first()
+        other.date, other.type, other.category, other.amount, other.description = (
+            "2025-08-29", "expense", "Food", 3.0, "Coffee")
+        db.session.commit()
+        assert other.fingerprint not in taken and len(taken) == 2
+
+def test_failed_import_leaves_nothing_behind(app, ids, monkeypatch):
+    from services import record_events
+
+    calls = []
+    def rows_inserted(session, user_id, rows):
+        calls.append(len(rows))
+        if len(calls) == 2:
+            raise RuntimeError("disk full")
+    monkeypatch.setattr(record_events, "rows_inserted", rows_inserted)
+
+    rows = [(f"2025-01-{d:02d}", "expense", "NewCat", 1.0, "") for d in range(1, 6)]
+    with app.app_context():
+        before = Record.query.filter_by(user_id=ids["alice"]).count()
+        with pytest.raises(RuntimeError):
+            importer.bulk_insert(ids["alice"], importer.fingerprint_rows(ids["alice"], rows), batch_size=2)
+        db.session.rollback()
+        assert calls == [2, 2]
+        assert Record.query.filter_by(user_id=ids["alice"]).count() == before  # first batch rolled back too
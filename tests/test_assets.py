@@ -0,0 +1,99 @@
+import gzip
+import json
+import os
+
+import brotli
+import pytest
+from flask import Response, jsonify, render_template_string, stream_with_context
+
+from assets import build_assets, load_manifest
+
+CSS = b"body { color: #333; }\n" * 200
+
+@pytest.fixture
+def static_dir(tmp_path):
+    for sub, name, data in (("css", "style.css", CSS), ("js", "app.js", b"console.log(1);\n")):
+        (tmp_path / sub).mkdir()
+        (tmp_path / sub / name).write_bytes(data)
+    return tmp_path
+
+@pytest.fixture
+def routes(app):
+    big = {"rows": [{"id": i, "name": f"row {i}"} for i in range(200)]}
+    app.add_url_rule("/t/big", "t_big", lambda: jsonify(big))
+    app.add_url_rule("/t/small", "t_small", lambda: jsonify(ok=True))
+    app.add_url_rule("/t/png", "t_png", lambda: Response(b"\0" * 5000, mimetype="image/png"))
+    app.add_url_rule("/t/encoded", "t_encoded", lambda: Response(
+        gzip.compress(b"x" * 5000), mimetype="text/plain", headers={"Content-Encoding": "gzip"}))
+    app.add_url_rule("/t/stream", "t_stream", lambda: Response(
+        stream_with_context(iter([b"x" * 5000])), mimetype="text/plain"))
+    return app.test_client()
+
+def test_build_assets_manifest(static_dir):
+    manifest = build_assets(str(static_dir))
+    assert set(manifest) == {"css/style.css", "js/app.js"}
+    hashed = manifest["css/style.css"]
+    assert hashed.startswith("css/style.") and hashed.endswith(".css") and len(hashed.split(".")[1]) == 12
+    out = static_dir / "dist" / hashed
+    assert out.read_bytes() == CSS
+    assert gzip.decompress((static_dir / "dist" / (hashed + ".gz")).read_bytes()) == CSS
+    assert brotli.decompress((static_dir / "dist" / (hashed + ".br")).read_bytes()) == CSS
+    assert load_manifest(str(static_dir)) == manifest
+    assert json.loads((static_dir / "dist" / "manifest.json").read_text()) == manifest
+
+    # content hash: same input, same name; a change, a new name
+    assert build_assets(str(static_dir))["css/style.css"] == hashed
+    (static_dir / "css" / "style.css").write_bytes(CSS + b"a {}\n")
+    assert build_assets(str(static_dir))["css/style.css"] != hashed
+
+def test_asset_url_falls_back_to_static(app, static_dir):
+    with app.test_request_context():
+        app.extensions["assets"] = {}
+        render = lambda: render_template_string('{{ asset_url("css/style.css") }}')
+        assert render() == "/static/css/style.css"
+        app.extensions["assets"] = build_assets(str(static_dir))
+        assert render() == "/assets/" + app.extensions["assets"]["css/style.css"]
+
+def test_assets_served_precompressed_and_immutable(app, static_dir, monkeypatch):
+    manifest = build_assets(str(static_dir))
+    monkeypatch.setattr(app, "static_folder", str(static_dir))
+    url = "/assets/" + manifest["css/style.css"]
+    c = app.test_client()
+    for accept, encoding, decode in (("gzip, br", "br", brotli.decompress), ("gzip", "gzip", gzip.decompress),
+                                     ("identity", None, bytes)):
+        r = c.get(url, headers={"Accept-Encoding": accept})
+        assert r.status_code == 200 and r.mimetype == "text/css"
+        assert r.headers.get("Content-Encoding") == encoding
+        assert r.headers["Cache-Control"] == "public, max-age=31536000, immutable"
+        assert "Accept-Encoding" in r.headers["Vary"]
+        assert decode(r.data) == CSS
+    assert c.get("/assets/css/missing.css").status_code == 404
+    assert c.get("/assets/../css/style.css").status_code == 404
+
+@pytest.mark.parametrize("accept, encoding", [("br, gzip", "br"), ("gzip;q=1.0, br;q=0", "gzip"),
+                                              ("gzip", "gzip"), ("", None)])
+def test_dynamic_responses_compressed_by_negotiation(routes, accept, encoding):
+    r = routes.get("/t/big", headers={"Accept-Encoding": accept})
+    assert r.headers.get("Content-Encoding") == encoding
+    assert "Accept-Encoding" in r.headers["Vary"]
+    body = {"br": brotli.decompress, "gzip": gzip.decompress, None: bytes}[encoding](r.data)
+    assert json.loads(body)["rows"][199]["id"] == 199
+
+def test_compression_threshold_and_skips(app, routes):
+    gz = {"Accept-Encoding": "gzip"}
+    small = routes.get("/t/small", headers=gz)
+    assert "Content-Encoding" not in small.headers and small.get_json() == {"ok": True}
+    assert "Accept-Encoding" in small.headers["Vary"]  # the answer still depends on it
+    app.config["COMPRESS_MIN_SIZE"] = 1
+    assert routes.get("/t/small", headers=gz).headers["Content-Encoding"] == "gzip"
+
+    assert "Content-Encoding" not in routes.get("/t/png", headers=gz).headers  # not a compressible type
+    encoded = routes.get("/t/encoded", headers=gz)  # already encoded: not twice
+    assert gzip.decompress(encoded.data) == b"x" * 5000
+    streamed = routes.get("/t/stream", headers=gz)  # generators are left alone
+    assert "Content-Encoding" not in streamed.headers and streamed.data == b"x" * 5000
+
+def test_send_file_export_is_compressed(client):
+    r = client.get("/records/export/csv", headers={"Accept-Encoding": "gzip"})
+    assert r.headers["Content-Encoding"] == "gzip"
+    assert gzip.decompress(r.data).decode("utf-8-sig").startswith("date,")
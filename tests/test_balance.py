@@ -0,0 +1,71 @@
+import pytest
+
+from models.models import db, BalanceCheckpoint, Record
+from services import balance
+
+def _expected(user_id):
+    """{id: running balance} computed the slow way."""
+    out, total = {}, 0.0
+    for r in Record.query.filter_by(user_id=user_id).order_by(Record.date, Record.id):
+        total += r.amount if r.type == "income" else -r.amount
+        out[r.id] = round(total, 2)
+    return out
+
+def _check_checkpoints(user_id):
+    expected = list(_expected(user_id).items())
+    cps = BalanceCheckpoint.query.filter_by(user_id=user_id).order_by(BalanceCheckpoint.position).all()
+    assert [cp.position for cp in cps] == list(range(balance.EVERY, len(expected) + 1, balance.EVERY))
+    for cp in cps:
+        rid, bal = expected[cp.position - 1]
+        assert cp.record_id == rid and round(cp.balance, 2) == bal
+
+@pytest.fixture
+def small_checkpoints(app, monkeypatch):
+    monkeypatch.setattr(balance, "EVERY", 7)
+    with app.app_context():
+        balance.rebuild_all(db.session.connection())
+        db.session.commit()
+
+def test_checkpoints_follow_writes(app, client, ids, small_checkpoints):
+    with app.app_context():
+        _check_checkpoints(ids["alice"])
+
+    # back-dated add, edit and delete all move the balance of later records
+    client.post("/records/add", data={"type": "income", "category": "Salary", "amount": "1000", "date": "2024-01-01"})
+    client.post(f"/records/edit/{ids['record']}",
+                data={"type": "expense", "category": "Rent", "amount": "77", "date": "2024-06-30"})
+    with app.app_context():
+        victim = Record.query.filter_by(user_id=ids["alice"]).order_by(Record.date).first()
+    client.post(f"/records/delete/{victim.id}")
+
+    with app.app_context():
+        _check_checkpoints(ids["alice"])
+        _check_checkpoints(ids["bob"])
+
+@pytest.mark.parametrize("sort", ["asc", "desc"])
+def test_api_keyset_pages_with_balance(app, ids, api_headers, small_checkpoints, sort):
+    with app.app_context():
+        expected = _expected(ids["alice"])
+
+    c = app.test_client()
+    seen = []
+    body = c.get(f"/api/records?per=30&sort={sort}&balance=1", headers=api_headers).get_json()
+    while True:
+        seen += body["items"]
+        if not body["next_cursor"]:
+            break
+        body = c.get(f"/api/records?per=30&sort={sort}&balance=1&cursor={body['next_cursor']}",
+                     headers=api_headers).get_json()
+
+    assert len(seen) == len(expected) and len({i["id"] for i in seen}) == len(expected)
+    assert all(i["balance"] == expected[i["id"]] for i in seen)
+
+def test_balance_needs_contiguous_rows(client, api_headers, app):
+    html = client.get("/records/?per=20").get_data(as_text=True)
+    assert ">Balance</th>" in html
+    html = client.get("/records/?per=20&category=Food").get_data(as_text=True)
+    assert ">Balance</th>" not in html
+
+    c = app.test_client()
+    assert c.get("/api/records?balance=1&category=Food", headers=api_headers).status_code == 400
+    assert c.get("/api/records?cursor=nope", headers=api_headers).status_code == 400
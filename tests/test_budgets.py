@@ -0,0 +1,78 @@
+from datetime import date
+
+from flask import g
+
+from models.models import db, Budget, BudgetAlert, Record
+from services import budgets
+
+TODAY = date.today().isoformat()
+
+def _add(client, amount, category="Food", day=TODAY):
+    return client.post("/records/add", data={"type": "expense", "category": category,
+                                             "amount": str(amount), "date": day}, follow_redirects=True)
+
+def test_spend_follows_writes(app, client, ids, api_headers):
+    client.post("/budgets/", data={"category": "Food", "limit": "100"})
+    _add(client, 30)
+    app.test_client().post("/api/records", headers=api_headers,
+                           json={"type": "expense", "category": "Food", "amount": 20, "date": TODAY})
+    _add(client, 5, category="Rent")
+
+    with app.app_context():
+        [food] = budgets.status(db.session, ids["alice"])
+        month_food = sum(r.amount for r in Record.query.filter(
+            Record.user_id == ids["alice"], Record.category == "Food", Record.type == "expense",
+            Record.date.like(TODAY[:7] + "%")))
+        assert food["spent"] == round(month_food, 2)
+        assert food["remaining"] == round(100 - month_food, 2)
+
+def test_alert_once_per_month_on_write(app, client, ids, api_headers):
+    client.post("/budgets/", data={"category": "Fun", "limit": "50"})
+    page = _add(client, 40, category="Fun").get_data(as_text=True)
+    assert "exceeded" not in page
+
+    page = _add(client, 20, category="Fun").get_data(as_text=True)
+    assert "Budget for Fun exceeded" in page
+    page = _add(client, 20, category="Fun").get_data(as_text=True)
+    assert "Budget for Fun exceeded" not in page  # already alerted this month
+
+    with app.app_context():
+        assert BudgetAlert.query.filter_by(user_id=ids["alice"]).count() == 1
+
+    body = app.test_client().get("/api/budgets", headers=api_headers).get_json()
+    fun = next(b for b in body["items"] if b["category"] == "Fun")
+    assert fun["over"] and body["alerts"][0]["category"] == "Fun"
+
+def test_budget_follows_category_rename(app, client, ids):
+    client.post("/budgets/", data={"category": "Fun", "limit": "50"})
+    client.post(f"/categories/rename/{ids['category']}", data={"new_name": "Leisure"})
+    with app.app_context():
+        assert [b["category"] for b in budgets.status(db.session, ids["alice"])] == ["Leisure"]
+
+def test_alert_flashed_only_after_commit(app, ids):
+    alice = ids["alice"]
+    over = dict(date=TODAY, type="expense", category="Fun", amount=80.0, user_id=alice)
+    with app.test_request_context():
+        db.session.add(Budget(user_id=alice, category="Fun", limit=50))
+        db.session.commit()
+        db.session.add(Record(**over))
+        db.session.flush()
+        db.session.rollback()
+        assert "budget_alerts" not in g
+        assert BudgetAlert.query.filter_by(user_id=alice).count() == 0
+
+        db.session.add(Record(**over))
+        db.session.flush()
+        assert "budget_alerts" not in g
+        db.session.commit()
+        assert [a["category"] for a in g.budget_alerts] == ["Fun"]
+
+def test_api_limit_below_spend_alerts(app, client, ids, api_headers):
+    _add(client, 40, category="Fun")
+    c = app.test_client()
+    r = c.post("/api/budgets", headers=api_headers, json={"category": "Fun", "limit": 30})
+    assert r.status_code == 201 and r.get_json()["alert"] is True
+    r = c.post("/api/budgets", headers=api_headers, json={"category": "Fun", "limit": 20})
+    assert r.get_json()["alert"] is False  # already alerted this month
+    r = c.post("/api/budgets", headers=api_headers, json={"category": "Rent", "limit": 10**6})
+    assert r.get_json()["alert"] is False
@@ -0,0 +1,47 @@
+from collections import Counter
+
+from services.aggregation import top_n, downsample, chart_payload
+from models.models import db, Record
+
+def test_top_n_folds_tail_into_other():
+    d = {f"c{i}": i for i in range(1, 11)}  # c10 largest
+    items = top_n(d, 4)
+    assert [k for k, _ in items] == ["c10", "c9", "c8", "Other"]
+    assert items[-1][1] == sum(range(1, 8))
+    assert top_n({"a": 1, "b": 2}, 4) == [("b", 2), ("a", 1)]
+
+def test_downsample_keeps_totals():
+    labels = [f"2024-{m:02d}" for m in range(1, 13)]
+    values = list(range(12))
+    out_labels, (out,) = downsample(labels, [values], 5)
+    assert len(out_labels) <= 5
+    assert sum(out) == sum(values)
+    assert out_labels[0] == "2024-01..2024-03"
+
+def test_chart_payload_is_bounded():
+    rows = [(f"{2000 + i // 12}-{i % 12 + 1:02d}-01", "expense", f"cat{i % 300}", 1.0) for i in range(3000)]
+    by_month, by_cat = Counter(), Counter()
+    for day, _, cat, amount in rows:
+        by_month[day[:7]] += amount
+        by_cat[cat] += amount
+    months = sorted(by_month)
+    series = {"labels": months, "income": [0] * len(months), "expense": [by_month[m] for m in months]}
+    payload = chart_payload({"income": {}, "expense": dict(by_cat)}, series, max_slices=8, max_points=24)
+    assert len(payload["expense"]["labels"]) == 8
+    assert len(payload["series"]["labels"]) <= 24
+    assert round(sum(payload["series"]["expense"])) == 3000
+
+def test_chart_data_endpoint(app, client, ids):
+    with app.app_context():
+        db.session.add_all(Record(date="2024-03-02", type="expense", category=f"Tiny{i}", amount=1,
+                                  user_id=ids["alice"]) for i in range(20))
+        db.session.commit()
+    r = client.get("/chart-data?scope=year&date=2024-01-01&slices=5&points=4")
+    assert r.status_code == 200
+    data = r.get_json()
+    assert len(data["expense"]["labels"]) == 5 and data["expense"]["labels"][-1] == "Other"
+    assert len(data["series"]["labels"]) <= 4
+
+    # the dashboard itself no longer inlines chart data
+    html = client.get("/?scope=year&date=2024-01-01").get_data(as_text=True)
+    assert "/chart-data?" in html and "Tiny1" not in html
@@ -0,0 +1,82 @@
+from datetime import date
+
+import pytest
+
+from models.models import db, Record, User
+from services import columnar, dashboard
+
+RANGES = [(date(2024, 1, 1), date(2024, 12, 31)), (date(2024, 2, 10), date(2024, 11, 20)),
+          (date(2024, 3, 5), date(2024, 3, 5)), (date(2030, 1, 1), date(2030, 12, 31))]
+
+def _approx(cats):
+    return {k: pytest.approx(v) if isinstance(v, dict) else v for k, v in cats.items()}
+
+@pytest.mark.parametrize("start, end", RANGES)
+def test_columns_match_sql(app, ids, start, end):
+    with app.app_context():
+        alice = ids["alice"]
+        cols = columnar.load(db.session.connection(), alice)
+        assert columnar.by_category(cols, start, end) == _approx(dashboard.by_category(alice, start, end))
+        for bucket in ("day", "week", "month"):
+            sql = dashboard.series(alice, start, end, bucket)
+            assert dashboard.series(alice, start, end, bucket, cols=cols) == {
+                k: pytest.approx(v) if k != "labels" else v for k, v in sql.items()}
+        sql = dashboard.compare(alice, start, end, date(2023, 12, 1), start, scale=2.0)
+        fast = dashboard.compare(alice, start, end, date(2023, 12, 1), start, scale=2.0, cols=cols)
+        assert fast["rows"] == sql["rows"]
+
+def test_dashboard_reads_cache_until_records_change(app, client, ids, queries):
+    client.get("/?scope=year&date=2024-06-01")
+    with queries() as q:
+        page = client.get("/?scope=year&date=2024-06-01&compare=1")
+        client.get("/chart-data?scope=year&date=2024-06-01&bucket=week")
+    assert page.status_code == 200
+    assert q.count == 3  # the session user per request + the currency picker; no record queries
+
+    client.post("/records/add", data={"type": "expense", "category": "Fun", "amount": "12.34", "date": "2030-01-02"})
+    body = client.get("/chart-data?from=2030-01-01&to=2030-01-03&bucket=day").get_json()
+    assert body["series"] == {"labels": ["2030-01-01", "2030-01-02", "2030-01-03"],
+                              "income": [0, 0, 0], "expense": [0, 12.34, 0]}
+    cache = app.extensions["column_cache"]
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    metrics = client.get("/metrics").get_data(as_text=True)
+    assert "app_column_cache_hits_total 2" in metrics
+    assert "app_column_cache_users 1" in metrics
+
+class _Cols:
+    def __init__(self, nbytes):
+        self.nbytes = nbytes
+
+def test_cache_evicts_within_byte_budget():
+    cache = columnar.ColumnCache(100)
+    for user in (1, 2, 3):
+        cache.get(user, 0, lambda: _Cols(40))
+    assert cache.stats() == {"users": 2, "bytes": 80, "budget": 100, "hits": 0, "misses": 3, "evictions": 1}
+    cache.get(2, 0, lambda: pytest.fail("cached"))       # 2 is now most recent
+    cache.get(4, 0, lambda: _Cols(40))                   # evicts 3, not 2
+    cache.get(2, 1, lambda: _Cols(30))                   # new version replaces in place
+    assert cache.stats()["bytes"] == 70
+    big = cache.get(5, 0, lambda: _Cols(101))            # larger than the budget: served, not kept
+    assert big.nbytes == 101 and cache.stats()["users"] == 2
+
+def test_cache_off_falls_back_to_sql(app, client, ids, api_headers):
+    app.extensions["column_cache"].budget = 0
+    assert client.get("/").status_code == 200
+    assert app.test_client().get("/api/reports/pivot", headers=api_headers).status_code == 200
+    with app.app_context():
+        assert columnar.columns(db.session, db.session.get(User, ids["alice"])) is None
+    assert app.extensions["column_cache"].misses == 0
+
+def test_malformed_stored_date_is_skipped(app, client, ids, api_headers):
+    r = client.post("/records/add", data={"type": "expense", "category": "Fun", "amount": "5", "date": "2024-13-01"})
+    assert r.status_code == 200 and b"Date must be YYYY-MM-DD" in r.data
+    with app.app_context():
+        # a row written before the form validated dates
+        db.session.add(Record(date="2024-13-01", type="expense", category="Fun", amount=5, user_id=ids["alice"]))
+        db.session.commit()
+        cols = columnar.load(db.session.connection(), ids["alice"])
+        assert len(cols) == 200
+    assert client.get("/").status_code == 200
+    assert client.get("/chart-data?scope=year&date=2024-06-01").status_code == 200
+    assert app.test_client().get("/api/reports/pivot", headers=api_headers).status_code == 200
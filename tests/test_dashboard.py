@@ -0,0 +1,95 @@
+import io
+from datetime import date
+
+from sqlalchemy import func
+
+from models.models import db, MonthlyRollup, Record
+from services import dashboard, rollups
+
+def _rollups(user_id):
+    rows = (db.session.query(MonthlyRollup.month, MonthlyRollup.type, MonthlyRollup.category,
+                             MonthlyRollup.amount, MonthlyRollup.count)
+            .filter_by(user_id=user_id))
+    return {(m, t, c): (round(a, 2), n) for m, t, c, a, n in rows}
+
+def _from_records(user_id):
+    rows = (db.session.query(func.substr(Record.date, 1, 7), Record.type, Record.category,
+                             func.sum(Record.amount), func.count(Record.id))
+            .filter_by(user_id=user_id)
+            .group_by(func.substr(Record.date, 1, 7), Record.type, Record.category))
+    return {(m, t, c): (round(a, 2), n) for m, t, c, a, n in rows}
+
+def test_bucket_labels_fill_gaps():
+    assert dashboard.bucket_labels(date(2024, 1, 30), date(2024, 2, 2), "day") == [
+        "2024-01-30", "2024-01-31", "2024-02-01", "2024-02-02"]
+    assert dashboard.bucket_labels(date(2024, 1, 3), date(2024, 1, 16), "week") == [
+        "2024-01-01", "2024-01-08", "2024-01-15"]
+    assert dashboard.bucket_labels(date(2023, 11, 5), date(2024, 4, 1), "quarter") == [
+        "2023-Q4", "2024-Q1", "2024-Q2"]
+    assert dashboard.bucket_key("2024-08-15", "quarter") == "2024-Q3"
+
+def test_series_matches_records(app, ids):
+    with app.app_context():
+        alice = ids["alice"]
+        s = dashboard.series(alice, date(2024, 1, 1), date(2024, 12, 31), "quarter")
+        assert s["labels"] == ["2024-Q1", "2024-Q2", "2024-Q3", "2024-Q4"]
+        total = db.session.query(func.sum(Record.amount)).filter_by(user_id=alice, type="expense").scalar()
+        assert round(sum(s["expense"]), 2) == round(total, 2)
+
+        # unaligned range (raw records) agrees with the month-aligned one (rollups)
+        daily = dashboard.series(alice, date(2024, 3, 1), date(2024, 3, 31), "day")
+        monthly = dashboard.series(alice, date(2024, 3, 1), date(2024, 3, 31), "month")
+        assert len(daily["labels"]) == 31
+        assert round(sum(daily["expense"]), 2) == round(sum(monthly["expense"]), 2)
+
+def test_rollups_follow_every_write(app, client, ids, api_headers):
+    client.post("/records/add", data={"type": "expense", "category": "Food", "amount": "7", "date": "2023-05-05"})
+    client.post(f"/records/edit/{ids['record']}",
+                data={"type": "income", "category": "Salary", "amount": "1000", "date": "2022-01-01"})
+    api = app.test_client()
+    rid = api.post("/api/records", headers=api_headers,
+                   json={"type": "expense", "category": "Fun", "amount": 3, "date": "2021-07-07"}).get_json()["id"]
+    api.delete(f"/api/records/{rid}", headers=api_headers)
+    client.post("/records/import/csv", data={
+        "file": (io.BytesIO(b"date,type,category,amount,description\n2020-02-02,expense,Food,4,x\n"), "x.csv")})
+    client.post(f"/categories/rename/{ids['category']}", data={"new_name": "Leisure"})
+
+    with app.app_context():
+        assert _rollups(ids["alice"]) == _from_records(ids["alice"])
+        assert ("2021-07", "expense", "Fun") not in _rollups(ids["alice"])
+        assert ("2020-02", "expense", "Food") in _rollups(ids["alice"])
+
+        # rebuild gives the same rows
+        before = _rollups(ids["alice"])
+        rollups.rebuild_all()
+        assert _rollups(ids["alice"]) == before
+
+def test_custom_range(client):
+    html = client.get("/?from=2024-03-10&to=2024-03-20&bucket=day").get_data(as_text=True)
+    assert "2024-03-10 – 2024-03-20" in html
+    assert "from=2024-02-28" in html  # previous range of the same length
+
+    data = client.get("/chart-data?from=2024-03-10&to=2024-03-20").get_json()
+    assert data["bucket"] == "day"
+    assert data["series"]["labels"][0] == "2024-03-10" and len(data["series"]["labels"]) == 11
+
+def test_compare_matches_two_single_periods(app, ids):
+    with app.app_context():
+        alice = ids["alice"]
+        for start, end, prev_start, prev_end in [
+            (date(2024, 3, 1), date(2024, 3, 31), date(2024, 2, 1), date(2024, 2, 29)),   # rollups
+            (date(2024, 3, 10), date(2024, 3, 20), date(2024, 2, 28), date(2024, 3, 9)),  # records
+        ]:
+            cmp = dashboard.compare(alice, start, end, prev_start, prev_end)
+            assert cmp["current"] == dashboard.by_category(alice, start, end)
+            assert cmp["previous"] == dashboard.by_category(alice, prev_start, prev_end)
+            for r in cmp["rows"]:
+                assert r["delta"] == round(r["current"] - r["previous"], 2)
+
+    assert dashboard.pct_change(150, 100) == 50.0
+    assert dashboard.pct_change(5, 0) is None
+
+def test_compare_view(client):
+    html = client.get("/?scope=month&date=2024-03-05&compare=1").get_data(as_text=True)
+    assert "Compared with the previous period" in html
+    assert "date=2024-02-01&amp;bucket=day&amp;compare=1" in html  # navigation keeps the mode
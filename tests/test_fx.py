@@ -0,0 +1,146 @@
+from datetime import date
+
+import pytest
+
+from models.models import db, CategoryStat, MonthlyRollup, Record, User
+from services import anomalies, balance, dashboard, fx, importer, rollups
+
+RATES = "date,currency,rate\n2025-01-01,EUR,1.95583\n2025-02-01,EUR,2.0\n2025-01-01,USD,1.8\nbad,EUR,1\n"
+
+def _load_rates(app, text=RATES):
+    with app.app_context():
+        rows, errors = fx.parse_rates(text)
+        assert fx.import_rates(rows) == 3 and errors == [5]
+        db.session.commit()
+
+def _add(client, amount, day, currency="EUR", type_="expense", category="Food"):
+    return client.post("/records/add", data={"type": type_, "category": category, "amount": str(amount),
+                                             "date": day, "currency": currency}, follow_redirects=True)
+
+def test_amounts_are_summed_in_base_currency(app, client, ids):
+    _load_rates(app)
+    _add(client, 100, "2025-01-15", currency="BGN")
+    _add(client, 10, "2025-01-20")             # 19.5583
+    _add(client, 10, "2025-02-10")             # 20.0
+    _add(client, 50, "2025-02-11", currency="USD", type_="income", category="Salary")  # 90.0
+
+    with app.app_context():
+        alice = ids["alice"]
+        # whole months (rollups, kept incrementally) == raw records converted in SQL
+        months = dashboard.by_category(alice, date(2025, 1, 1), date(2025, 2, 28))
+        raw = dashboard.by_category(alice, date(2025, 1, 2), date(2025, 2, 28))
+        assert round(months["expense"]["Food"], 4) == round(raw["expense"]["Food"], 4) == 139.5583
+        assert months["income"]["Salary"] == raw["income"]["Salary"] == 90.0
+
+        before = {(r.month, r.category): r.amount for r in MonthlyRollup.query.filter_by(user_id=alice)}
+        rollups.rebuild(db.session.connection(), [alice])
+        after = {(r.month, r.category): r.amount for r in MonthlyRollup.query.filter_by(user_id=alice)}
+        assert before.keys() == after.keys()
+        assert all(abs(before[k] - after[k]) < 1e-9 for k in before)
+
+        records = Record.query.filter(Record.user_id == alice, Record.date >= "2025-01-01").order_by(Record.date, Record.id).all()
+        balances = balance.page_balances(db.session, alice, records)
+        assert round(balances[records[-1].id] - balances[records[0].id], 2) == round(-19.5583 - 20 + 90, 2)
+
+def test_rate_falls_back_to_nearest(app):
+    _load_rates(app)
+    with app.app_context():
+        assert fx.rate("EUR", "2025-01-31") == 1.95583
+        assert fx.rate("EUR", "2030-01-01") == 2.0
+        assert fx.rate("EUR", "2020-01-01") == 1.95583   # before the first rate: earliest one
+        assert fx.rate("BGN", "2025-01-01") == 1.0
+        assert fx.rate("CHF", "2025-01-01") is None
+
+def test_rate_cache_is_lru(app, queries):
+    _load_rates(app)
+    cache = fx.RateCache(2)
+    with app.app_context():
+        conn = db.session.connection()
+        with queries() as q:
+            for day in ("2025-01-01", "2025-01-02", "2025-01-01", "2025-01-03", "2025-01-02"):
+                cache.get(conn, "EUR", day)
+        assert (cache.hits, cache.misses, q.count) == (1, 4, 5)  # + the rates version, once
+        cache.get(conn, "CHF", "2025-01-01")
+        cache.get(conn, "CHF", "2025-01-01")
+        assert cache.misses == 6  # no rates for CHF: not cached
+
+def test_reporting_currency(app, client, ids, api_headers):
+    _load_rates(app)
+    _add(client, 200, "2025-02-03", currency="BGN")
+    html = client.get("/?scope=month&date=2025-02-01&currency=EUR").get_data(as_text=True)
+    assert "100.0 EUR" in html                  # 200 BGN at the February closing rate
+    assert 'currency=EUR' in html and ">USD</a>" in html
+    data = client.get("/chart-data?scope=month&date=2025-02-01&currency=EUR").get_json()
+    assert data["currency"] == "EUR" and sum(data["series"]["expense"]) == 100.0
+
+    # unknown codes fall back to the base currency
+    assert "BGN" in client.get("/?scope=month&date=2025-02-01&currency=XYZ").get_data(as_text=True)
+
+    r = app.test_client().get("/api/records/export/pdf?currency=EUR", headers=api_headers)
+    assert r.status_code == 200 and r.mimetype == "application/pdf"
+
+def test_api_currency(app, ids, api_headers):
+    _load_rates(app)
+    c = app.test_client()
+    body = {"type": "expense", "category": "Food", "amount": 5, "date": "2025-01-05"}
+    r = c.post("/api/records", headers=api_headers, json={**body, "currency": "usd"})
+    assert r.status_code == 201 and r.get_json()["currency"] == "USD"
+    assert c.post("/api/records", headers=api_headers, json={**body, "currency": "CHF"}).status_code == 400
+    r = c.post("/api/records", headers=api_headers, json=body)
+    assert r.get_json()["currency"] == "BGN"
+
+    rid = r.get_json()["id"]
+    assert c.patch(f"/api/records/{rid}", headers=api_headers, json={"currency": "EUR"}).get_json()["currency"] == "EUR"
+    with app.app_context():
+        assert db.session.get(Record, rid).currency == "EUR"
+
+    csv_text = c.get("/api/records/export/csv", headers=api_headers).get_data(as_text=True)
+    assert csv_text.splitlines()[0].endswith(",currency")
+
+def test_rate_import_rederives_rollups(app, client, ids, tmp_path):
+    _load_rates(app)
+    _add(client, 10, "2025-03-05")
+    with app.app_context():
+        version = db.session.get(User, ids["alice"]).data_version
+    path = tmp_path / "rates.csv"
+    path.write_text("date,currency,rate\n2025-03-01,EUR,3.0\n")
+    result = app.test_cli_runner().invoke(args=["fx", "import", str(path)])
+    assert "1 rates, 0 bad rows, 1 users re-derived" in result.output
+    with app.app_context():
+        spent = db.session.query(MonthlyRollup.amount).filter_by(user_id=ids["alice"], month="2025-03").scalar()
+        assert spent == 30.0
+        # cached columns and anomaly stats follow the new base amounts too
+        assert db.session.get(User, ids["alice"]).data_version == version + 1
+        stat = CategoryStat.query.filter_by(user_id=ids["alice"], category="Food").one()
+        food = [fx.to_base(r.amount, r.currency, r.date) for r in
+                Record.query.filter_by(user_id=ids["alice"], category="Food", type="expense")]
+        assert (stat.count, stat.mean) == pytest.approx((len(food), sum(food) / len(food)))
+
+def test_rates_imported_elsewhere_reach_cached_lookups(app, client, ids, api_headers, tmp_path):
+    _load_rates(app)
+    r = app.test_client().post("/api/records", headers=api_headers, json={
+        "type": "expense", "category": "Food", "amount": 10, "date": "2025-03-05", "currency": "EUR"})
+    rid = r.get_json()["id"]  # converted at 2.0, the rate now in this worker's cache
+    path = tmp_path / "rates.csv"
+    path.write_text("date,currency,rate\n2025-03-01,EUR,3.0\n")
+    # another process: the worker's cache is not told
+    assert app.test_cli_runner().invoke(args=["fx", "import", str(path)]).exit_code == 0
+
+    app.test_client().patch(f"/api/records/{rid}", headers=api_headers, json={"amount": 20})
+    with app.app_context():
+        month = lambda: db.session.query(MonthlyRollup.amount).filter_by(
+            user_id=ids["alice"], month="2025-03", type="expense", category="Food").scalar()
+        assert month() == pytest.approx(60.0)  # -10 + 20 EUR, both at 3.0
+        rollups.rebuild(db.session.connection(), [ids["alice"]])
+        assert month() == pytest.approx(60.0)
+        stat = db.session.query(CategoryStat.mean).filter_by(user_id=ids["alice"], category="Food").scalar()
+        anomalies.scan(db.session.connection(), [ids["alice"]])
+        assert stat == pytest.approx(
+            db.session.query(CategoryStat.mean).filter_by(user_id=ids["alice"], category="Food").scalar())
+
+def test_import_accepts_base_currency_rows_only():
+    row = {"date": "2025-01-01", "type": "expense", "category": "Food", "amount": "3"}
+    assert importer.parse_row({**row, "currency": "bgn"}, "BGN")[3] == 3.0
+    assert importer.parse_row({**row, "currency": ""}, "BGN")[3] == 3.0
+    with pytest.raises(ValueError):
+        importer.parse_row({**row, "currency": "EUR"}, "BGN")
@@ -0,0 +1,96 @@
+import json
+
+import pytest
+
+from models.models import db, User
+from services import hash_policy
+
+def _stored(app, username="alice"):
+    with app.app_context():
+        return User.query.filter_by(username=username).one().password
+
+def _use(app, method):
+    app.config["PASSWORD_HASH_METHOD"] = method
+    hash_policy.init_hash_policy(app)
+
+def test_canonical_forms():
+    assert hash_policy.canonical("pbkdf2") == f"pbkdf2:sha256:{hash_policy.DEFAULT_PBKDF2_ITERATIONS}"
+    assert hash_policy.canonical("pbkdf2:sha512") == f"pbkdf2:sha512:{hash_policy.DEFAULT_PBKDF2_ITERATIONS}"
+    assert hash_policy.canonical("scrypt") == "scrypt:32768:8:1"
+    with pytest.raises(ValueError):
+        hash_policy.canonical("md5")
+    assert hash_policy.method_of("pbkdf2:sha256:1000$salt$hash") == "pbkdf2:sha256:1000"
+    assert hash_policy.method_of("plaintext") is None
+    assert hash_policy.method_of("md5$salt$hash") is None
+
+def test_needs_rehash_tolerance():
+    h = "pbkdf2:sha256:100000$salt$hash"
+    assert not hash_policy.needs_rehash(h, "pbkdf2:sha256:100000")
+    assert not hash_policy.needs_rehash(h, "pbkdf2:sha256:120000")   # within 25%
+    assert not hash_policy.needs_rehash(h, "pbkdf2:sha256:80000")
+    assert hash_policy.needs_rehash(h, "pbkdf2:sha256:130000")
+    assert hash_policy.needs_rehash(h, "pbkdf2:sha256:70000")
+    assert hash_policy.needs_rehash(h, "pbkdf2:sha512:100000")       # other digest
+    assert hash_policy.needs_rehash(h, "scrypt")
+    assert not hash_policy.needs_rehash("scrypt:32768:8:1$salt$hash", "scrypt")
+    assert hash_policy.needs_rehash("garbage", "scrypt")
+
+@pytest.mark.parametrize("login", [
+    lambda c: c.post("/auth/login", data={"username": "alice", "password": "secret"}).status_code == 302,
+    lambda c: c.post("/api/login", json={"username": "alice", "password": "secret"}).status_code == 200,
+])
+def test_login_rehashes_off_policy_hash(app, login):
+    before = _stored(app)
+    assert hash_policy.method_of(before) == "pbkdf2:sha256:1000"
+    _use(app, "pbkdf2:sha256:1100")  # within tolerance: left alone
+    assert login(app.test_client())
+    assert _stored(app) == before
+
+    _use(app, "pbkdf2:sha256:2000")
+    assert login(app.test_client())
+    after = _stored(app)
+    assert hash_policy.method_of(after) == "pbkdf2:sha256:2000"
+    assert login(app.test_client())  # the new hash still verifies
+    assert _stored(app) == after
+
+def test_failed_login_keeps_the_hash(app):
+    before = _stored(app)
+    _use(app, "pbkdf2:sha256:2000")
+    r = app.test_client().post("/api/login", json={"username": "alice", "password": "wrong"})
+    assert r.status_code == 401 and _stored(app) == before
+
+def test_calibrate_bounds(monkeypatch):
+    monkeypatch.setattr(hash_policy, "measure_ms", lambda method, rounds=3: 1000.0)  # very slow machine
+    assert hash_policy.calibrate(50)["method"] == "pbkdf2:sha256:10000"  # never below the floor
+    monkeypatch.setattr(hash_policy, "measure_ms", lambda method, rounds=3: 5.0)  # 50k iterations = 5 ms
+    policy = hash_policy.calibrate(50, "pbkdf2:sha512")
+    assert policy["method"] == "pbkdf2:sha512:500000" and policy["target_ms"] == 50
+    # scrypt doubles n until the target is reached, at most 2**20
+    assert hash_policy.calibrate(50, "scrypt")["method"] == "scrypt:1048576:8:1"
+    monkeypatch.setattr(hash_policy, "measure_ms", lambda method, rounds=3: 100.0)
+    assert hash_policy.calibrate(50, "scrypt")["method"] == "scrypt:4096:8:1"
+    with pytest.raises(ValueError):
+        hash_policy.calibrate(50, "bcrypt")
+
+def test_policy_file_and_resolution_order(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(app, "instance_path", str(tmp_path))
+    app.config["PASSWORD_HASH_METHOD"] = None
+    assert hash_policy.load_policy(app) == {"method": hash_policy.FALLBACK_METHOD, "source": "default"}
+    path = hash_policy.save_policy(app, {"method": "pbkdf2:sha256:300000", "target_ms": 50, "source": "x"})
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f) == {"method": "pbkdf2:sha256:300000", "target_ms": 50}
+    assert app.extensions["hash_policy"]["source"] == "calibrated"
+    app.config["PASSWORD_HASH_METHOD"] = "scrypt"
+    assert hash_policy.load_policy(app) == {"method": "scrypt:32768:8:1", "source": "config"}
+
+def test_algorithm_counts_and_stats_cli(app):
+    hashes = ["pbkdf2:sha256:1000$a$b", "pbkdf2:sha256:1000$c$d", "scrypt:32768:8:1$e$f", "junk"]
+    assert hash_policy.algorithm_counts(hashes, "pbkdf2:sha256:1000") == {
+        "methods": {"pbkdf2:sha256:1000": 2, "scrypt:32768:8:1": 1, "unknown": 1}, "stale": 2}
+
+    with app.app_context():
+        db.session.add(User(username="legacy", password="scrypt:32768:8:1$salt$hash"))
+        db.session.commit()
+    out = app.test_cli_runner().invoke(args=["hash-policy", "stats"]).output.split("\n")
+    assert [line.split() for line in out if line] == [["2", "pbkdf2:sha256:1000"], ["1", "scrypt:32768:8:1"],
+                                                      ["1", "stale", "(re-hashed", "on", "next", "login)"]]
@@ -0,0 +1,77 @@
+import pytest
+
+from models.models import db, Category, Record
+from services import importer
+
+HEADER = "date,type,category,amount,description\n"
+
+LEDGERS = {
+    "jan.csv": HEADER + "2025-01-03,expense,Food,4.50,ledger coffee\n"
+                        "2025-01-03,expense,Food,4.50,ledger coffee\n"   # second coffee: kept
+                        "01/15/2025,income,Salary,2000,ledger pay\n"
+                        "2025-01-20,expense,Books,12,ledger novel\n",
+    "feb.csv": HEADER + "2025-02-01,expense,Rent,500,ledger flat\n"
+                        "not a date,expense,Food,1,ledger broken\n"       # line 3
+                        "2025-02-02,refund,Food,1,ledger broken\n"        # line 4
+                        "2025-02-03,expense,Food,-5,ledger broken\n"      # line 5
+                        "2025-01-03,expense,Food,4.50,ledger coffee\n",   # also in jan.csv
+    "notes.csv": "just,some,other,file\n1,2,3,4\n",
+}
+
+@pytest.fixture
+def ledgers(tmp_path):
+    paths = []
+    for name, text in LEDGERS.items():
+        path = tmp_path / name
+        path.write_text(text, encoding="utf-8")
+        paths.append(str(path))
+    return paths
+
+def _imported(user_id):
+    rows = (db.session.query(Record.date, Record.type, Record.category, Record.amount, Record.description)
+            .filter(Record.user_id == user_id, Record.description.like("ledger %")))
+    return sorted(tuple(r) for r in rows)
+
+def test_parse_ledger_file_reports_bad_lines(ledgers):
+    parsed = importer.parse_ledger_file(ledgers[1], 1)
+    assert parsed["errors"] == [3, 4, 5]
+    assert [r[:5] for r in parsed["rows"]] == [("2025-02-01", "expense", "Rent", 500.0, "ledger flat"),
+                                               ("2025-01-03", "expense", "Food", 4.5, "ledger coffee")]
+    assert importer.parse_ledger_file(ledgers[2], 1) == {"path": ledgers[2], "rows": [], "errors": ["missing header"]}
+
+@pytest.mark.parametrize("workers", [0, 1, 3])  # 0: parsed in this process, else in a process pool
+def test_ledger_import(app, ids, ledgers, workers):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["ledger", "import", "--user", "alice", "--workers", str(workers),
+                                 "--batch-size", "2", *ledgers])
+    assert result.exit_code == 0, result.output
+    lines = result.output.splitlines()
+    assert any(line.startswith(ledgers[1] + ": 1 inserted, 1 duplicates, 3 bad rows") or
+               line.startswith(ledgers[1] + ": 2 inserted, 0 duplicates, 3 bad rows") for line in lines)
+    assert "Total: 3 files, 6 rows, 5 inserted, 1 duplicates, 4 bad rows" in lines[-1]
+
+    with app.app_context():
+        # the same rows whether the files were parsed in worker processes or here
+        assert _imported(ids["alice"]) == [
+            ("2025-01-03", "expense", "Food", 4.5, "ledger coffee"),
+            ("2025-01-03", "expense", "Food", 4.5, "ledger coffee"),
+            ("2025-01-15", "income", "Salary", 2000.0, "ledger pay"),
+            ("2025-01-20", "expense", "Books", 12.0, "ledger novel"),
+            ("2025-02-01", "expense", "Rent", 500.0, "ledger flat"),
+        ]
+        assert Category.query.filter_by(user_id=ids["alice"], name="Books").count() == 1
+
+    # a re-run only finds duplicates
+    result = runner.invoke(args=["ledger", "import", "--user", "alice", "--workers", str(workers), *ledgers])
+    assert "6 rows, 0 inserted, 6 duplicates" in result.output.splitlines()[-1]
+
+def test_ledger_import_options(app, ids, ledgers):
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=["ledger", "import", "--user", "nobody", *ledgers])
+    assert result.exit_code != 0 and "No such user: nobody" in result.output
+
+    result = runner.invoke(args=["ledger", "import", "--user", "bob", "--no-categories", ledgers[0]])
+    assert result.exit_code == 0 and "4 inserted" in result.output
+    with app.app_context():
+        assert Category.query.filter_by(user_id=ids["bob"], name="Books").count() == 0
+        assert len(_imported(ids["bob"])) == 4
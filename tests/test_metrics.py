@@ -0,0 +1,86 @@
+import os
+import re
+import time
+
+from app import create_app
+from conftest import TEST_CONFIG
+
+REMOTE = {"REMOTE_ADDR": "203.0.113.9"}
+
+def test_metrics_only_for_allowed_addresses_or_token(app, api_headers):
+    c = app.test_client()
+    assert c.get("/metrics").status_code == 200  # loopback is allowed by default
+    assert c.get("/metrics", environ_base=REMOTE).status_code == 403
+    # a user's API token is not the metrics token
+    assert c.get("/metrics", environ_base=REMOTE, headers=api_headers).status_code == 403
+
+    app.config["METRICS_TOKEN"] = "scrape-me"
+    assert c.get("/metrics", environ_base=REMOTE, headers={"Authorization": "Bearer wrong"}).status_code == 403
+    r = c.get("/metrics", environ_base=REMOTE, headers={"Authorization": "Bearer scrape-me"})
+    assert r.status_code == 200 and "app_column_cache_users" in r.get_data(as_text=True)
+
+    app.config["METRICS_ALLOW"] = []
+    assert c.get("/metrics").status_code == 403
+
+def _sample(text, name, endpoint, le=None):
+    labels = f'endpoint="{endpoint}"' + (f',le="{le}"' if le else "")
+    m = re.search(rf"^{name}{{{re.escape(labels)}}} (\S+)$", text, re.M)
+    return float(m.group(1)) if m else 0.0
+
+def test_counters_and_histogram_grow_per_endpoint(app, client):
+    read = lambda: app.test_client().get("/metrics").get_data(as_text=True)
+    before = read()
+    for _ in range(2):
+        assert client.get("/records/").status_code == 200
+    after = read()
+
+    ep = "records.list_records"
+    grew = lambda name, le=None: _sample(after, name, ep, le) - _sample(before, name, ep, le)
+    assert grew("app_requests_total") == 2 and grew("app_request_seconds_count") == 2
+    assert grew("app_request_seconds_bucket", "+Inf") == 2
+    assert grew("app_sql_statements_total") >= 2 and grew("app_orm_rows_total") > 0
+    assert grew("app_request_seconds_sum") > 0 and grew("app_template_seconds_total") > 0
+    # cumulative buckets: each one holds at least as many requests as the one before
+    buckets = [_sample(after, "app_request_seconds_bucket", ep, le)
+               for le in ("0.005", "0.01", "0.025", "0.05", "0.1", "0.25", "0.5", "1", "2.5", "5", "+Inf")]
+    assert buckets == sorted(buckets)
+
+def test_server_timing_header(app, client):
+    assert "Server-Timing" not in client.get("/").headers  # off by default
+    app.config["SERVER_TIMING"] = True
+    header = client.get("/").headers["Server-Timing"]
+    m = re.fullmatch(r'app;dur=([\d.]+), db;dur=([\d.]+);desc="(\d+) queries", tpl;dur=([\d.]+)', header)
+    assert m, header
+    app_ms, db_ms, queries, tpl_ms = float(m[1]), float(m[2]), int(m[3]), float(m[4])
+    assert queries > 0 and app_ms >= db_ms and app_ms >= tpl_ms
+
+def _profiled_app(tmp_path, slow_ms):
+    app = create_app({**TEST_CONFIG, "PROFILE_SLOW_MS": slow_ms, "PROFILE_INTERVAL_MS": 1,
+                      "PROFILE_DIR": str(tmp_path)})
+
+    def slow_view():
+        time.sleep(0.05)
+        return "done"
+    app.add_url_rule("/slow", "slow_view", slow_view)
+    app.add_url_rule("/fast", "fast_view", lambda: "done")
+    return app
+
+def test_slow_requests_dump_their_stacks(tmp_path):
+    c = _profiled_app(tmp_path, 20).test_client()
+    assert c.get("/fast").status_code == 200
+    assert os.listdir(tmp_path) == []  # under the threshold: nothing written
+
+    assert c.get("/slow").status_code == 200
+    [name] = os.listdir(tmp_path)
+    assert name.startswith("slow_view-") and name.endswith("ms.folded")
+    with open(tmp_path / name, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    # collapsed stacks, root first: "frame;frame;frame count"
+    assert lines and all(re.fullmatch(r".+ \d+", line) for line in lines)
+    assert any("slow_view (test_metrics.py" in line for line in lines)
+
+def test_profiler_is_off_by_default(app, tmp_path):
+    assert app.extensions["profiler"] is None
+    app.config["PROFILE_DIR"] = str(tmp_path)
+    app.test_client().get("/metrics")
+    assert os.listdir(tmp_path) == []
@@ -0,0 +1,73 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from services import passwords
+
+def _login(app, username="alice", password="secret"):
+    return app.test_client().post("/api/login", json={"username": username, "password": password})
+
+@pytest.fixture
+def pool(app, monkeypatch):
+    """A one-worker pool without queue (threads stand in for the KDF processes)."""
+    app.config.update(PASSWORD_POOL_WORKERS=1, PASSWORD_QUEUE_DEPTH=0, PASSWORD_TIMEOUT=0.05)
+    executor = ThreadPoolExecutor(max_workers=1)
+    slots = threading.BoundedSemaphore(1)
+    monkeypatch.setitem(passwords._state, "pid", os.getpid())
+    monkeypatch.setitem(passwords._state, "workers", 1)
+    monkeypatch.setitem(passwords._state, "pool", executor)
+    monkeypatch.setitem(passwords._state, "slots", slots)
+    yield executor, slots
+    executor.shutdown(wait=True)
+
+def test_login_throttle_answers_429_with_retry_after(app):
+    app.extensions["login_throttle"] = passwords.LoginThrottle(per_minute=6, burst=2)
+    assert [_login(app, password="wrong").status_code for _ in range(2)] == [401, 401]
+    r = _login(app)
+    assert r.status_code == 429 and r.headers["Retry-After"] == "10"  # one token per 10 s
+    # per username: another user still gets in
+    assert _login(app, username="bob").status_code == 200
+
+    page = app.test_client().post("/auth/login", data={"username": "alice", "password": "secret"})
+    assert page.status_code == 429
+
+def test_saturated_pool_answers_503(app, pool):
+    _, slots = pool
+    with app.app_context():
+        slots.acquire()  # another request is hashing
+        try:
+            r = _login(app)
+            assert r.status_code == 503 and r.headers["Retry-After"] == "1"
+            page = app.test_client().post("/auth/login", data={"username": "alice", "password": "secret"})
+            assert page.status_code == 503
+        finally:
+            slots.release()
+    assert _login(app).status_code == 200
+
+def test_slot_held_until_the_kdf_finishes(app, pool):
+    executor, slots = pool
+    release = threading.Event()
+    with app.app_context():
+        try:
+            with pytest.raises(passwords.PasswordBusy):
+                passwords._run(release.wait)  # outlives PASSWORD_TIMEOUT
+            # the KDF is still running: its slot is not free yet
+            assert not slots.acquire(blocking=False)
+        finally:
+            release.set()
+        deadline = time.monotonic() + 5
+        while not slots.acquire(blocking=False):
+            assert time.monotonic() < deadline
+            time.sleep(0.01)
+        slots.release()
+        assert passwords._run(len, "abc") == 3
+
+def test_token_bucket_refills():
+    bucket = passwords.TokenBucket(rate=1000, burst=1)
+    assert bucket.take("k") == 0
+    assert 0 < bucket.take("k") <= 0.001
+    time.sleep(0.01)
+    assert bucket.take("k") == 0
@@ -0,0 +1,123 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+import pet
+import pet_ledger
+from pet_ledger import Ledger
+
+ROWS = [
+    ["2024-01-05", "income", "Salary", "1500.00", "January"],
+    ["2024-01-09", "expense", "Food", "12.40", "lunch, with \"quotes\""],
+    ["2024-01-20", "expense", "food", "7.60", "multi\nline"],
+    ["2024-02-02", "expense", "Rent", "600", ""],
+    ["2024-02-14", "expense", "FOOD", "30.00", ""],
+]
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "expenses.csv")
+
+def _answers(source):
+    return source.totals(), source.expenses_by_category(), source.monthly()
+
+def test_index_and_columns_agree(path):
+    ledger = Ledger(path, columnar=True)
+    ledger.append(ROWS[:3])
+    ledger.columns()  # built from the CSV
+    ledger.append(ROWS[3:])  # then extended in place
+    cols = ledger.columns()
+    assert _answers(cols) == _answers(ledger)
+    # categories are case-insensitive in both, labelled with the first spelling
+    assert ledger.expenses_by_category() == {"Food": 5000, "Rent": 60000}
+    assert ledger.category("FOOD")["expense"] == 5000
+    assert cols.month("2024-01") == ledger.month("2024-01")
+    assert cols.month("2024-01-09")["expense"] == 1240
+
+def test_append_matches_a_rebuild(path):
+    ledger = Ledger(path, columnar=True)
+    ledger.append(ROWS[:1])
+    ledger.columns()
+    inode = os.stat(path + ".cols.npy").st_ino
+    for row in ROWS[1:]:
+        ledger.append([row])
+    assert os.stat(path + ".cols.npy").st_ino == inode  # appended to, not replaced
+    appended = np.load(path + ".cols.npy")
+    with open(path + ".cols.json", encoding="utf-8") as f:
+        assert json.load(f)["rows"] == len(ROWS)
+
+    os.remove(path + ".cols.json")
+    reopened = Ledger(path, columnar=True)
+    assert (reopened.columns().data == appended).all()
+    assert reopened.columns().categories == ["Salary", "Food", "Rent"]
+
+def test_external_edit_rebuilds(path):
+    ledger = Ledger(path, columnar=True)
+    ledger.append(ROWS)
+    with open(path, "a", encoding="utf-8", newline="") as f:
+        f.write("2024-03-01,expense,Fun,5,\n2024-03-02,expense,fun,not a number,\n")
+    reopened = Ledger(path, columnar=True)
+    assert reopened.totals()["expense"] == 65500
+    assert reopened.columns().totals() == reopened.totals()
+    assert reopened.columns().monthly()["2024-03"] == (0, 500)
+
+def test_appends_go_to_the_journal(path, monkeypatch):
+    monkeypatch.setattr(pet_ledger, "JOURNAL_MIN", 4)
+    ledger = Ledger(path)
+    snapshot = os.stat(path + ".idx.json").st_mtime_ns
+    ledger.append(ROWS[:2])
+    ledger.append(ROWS[2:3])
+    assert os.stat(path + ".idx.json").st_mtime_ns == snapshot  # not rewritten
+    with open(path + ".idx.log", encoding="utf-8") as f:
+        assert [len(json.loads(line)["rows"]) for line in f] == [2, 1]
+
+    reopened = Ledger(path)  # snapshot + journal replay
+    assert _answers(reopened) == _answers(ledger)
+    assert reopened.month("2024-01") == ledger.month("2024-01")
+
+    reopened.append(ROWS[3:])  # 5 journal rows >= JOURNAL_MIN: compacted
+    assert os.path.getsize(path + ".idx.log") == 0
+    with open(path + ".idx.json", encoding="utf-8") as f:
+        assert json.load(f)["rows"] == len(ROWS)
+    assert _answers(Ledger(path)) == _answers(reopened)
+
+@pytest.mark.parametrize("damage", ["stale", "corrupt index", "torn journal"])
+def test_index_rebuilt_when_stale_or_damaged(path, damage):
+    ledger = Ledger(path)
+    ledger.append(ROWS)
+    expected = _answers(ledger)
+    if damage == "stale":
+        with open(path, "a", encoding="utf-8", newline="") as f:
+            f.write("2024-03-01,expense,Fun,5,\n")
+        expected = ({"income": 150000, "expense": 65500, "balance": 84500},
+                    {"Food": 5000, "Rent": 60000, "Fun": 500}, {**expected[2], "2024-03": (0, 500)})
+    elif damage == "corrupt index":
+        with open(path + ".idx.json", "w", encoding="utf-8") as f:
+            f.write('{"version": 1, "rows": ')
+    else:
+        with open(path + ".idx.log", "a", encoding="utf-8") as f:
+            f.write('{"size": 1, "rows": [[')
+    reopened = Ledger(path)
+    assert _answers(reopened) == expected
+    assert os.path.getsize(path + ".idx.log") == 0  # a rebuild writes a fresh snapshot
+
+@pytest.mark.parametrize("columnar", [[], ["--no-columnar"]])
+def test_batch_mode(path, tmp_path, capsys, columnar):
+    def run(*argv):
+        code = pet.main(["--file", path, "--json", *columnar, *argv])
+        return code, [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+
+    assert run("add", "income", "Salary", "1500", "--date", "2024-01-05") == (0, [{"added": 1}])
+    batch = tmp_path / "batch.csv"
+    batch.write_text("Date,Type,Category,Amount,Description\n2024-01-09,expense,Food,\"12,40\",\n"
+                     "2024-01-20,expense,food,7.60,\n2024-02-02,transfer,Rent,1,\n", encoding="utf-8")
+    assert run("import", str(batch)) == (0, [{"added": 2, "skipped": 1}])
+    assert run("import", "--strict", str(batch))[0] == 1
+
+    assert run("balance")[1] == [{"income": 1500.0, "expense": 40.0, "balance": 1460.0}]
+    assert run("month", "2024-01")[1] == [{"month": "2024-01", "income": 1500.0, "expense": 40.0,
+                                           "net": 1460.0, "records": 5}]
+    assert run("category", "FOOD")[1] == [{"category": "FOOD", "income": 0.0, "expense": 40.0, "records": 4}]
+    assert pet.main(["--file", path, "add", "expense", "Food", "-3"]) == 2
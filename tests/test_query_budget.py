@@ -0,0 +1,252 @@
+"""Query budgets: every route runs against the seeded in-memory database and may
+issue at most BUDGETS[case] SQL statements, none slower than SLOW_QUERY_MS.
+
+A template or view change that starts querying per row (an N+1) blows the
+budget here. If a change legitimately needs more queries, raise the number in
+BUDGETS in the same commit and say why.
+"""
+import io
+import os
+
+import pytest
+
+SLOW_QUERY_MS = float(os.environ.get("SLOW_QUERY_MS", 50))
+
+CSV = (b"date,type,category,amount,description\n"
+       b"2024-02-01,expense,Food,12.50,lunch\n"
+       b"2024-02-02,income,Bonus,100,new category\n")
+
+def _csv_upload():
+    return {"file": (io.BytesIO(CSV), "import.csv"), "create_missing_categories": "on"}
+
+def _parquet_upload():
+    import pandas as pd
+    buf = io.BytesIO()
+    pd.read_csv(io.BytesIO(CSV)).to_parquet(buf)
+    return {"file": (io.BytesIO(buf.getvalue()), "import.parquet"), "create_missing_categories": "on"}
+
+# (method, endpoint, url, auth, request kwargs, expected status)
+# url may use {record}, {category}, {other_record}, {rule}, {budget}; auth: "session" | "token" | None
+CASES = [
+    ("GET", "home.index", "/", "session", {}, 200),
+    ("GET", "home.index", "/?scope=year&date=2024-06-01", "session", {}, 200),
+    ("GET", "home.chart_data", "/chart-data?scope=year&date=2024-06-01", "session", {}, 200),
+    ("GET", "home.index", "/?from=2024-02-10&to=2024-11-20&bucket=week", "session", {}, 200),
+    ("GET", "home.index", "/?scope=month&date=2024-03-05&compare=1", "session", {}, 200),
+    ("GET", "home.chart_data", "/chart-data?from=2024-02-10&to=2024-11-20&bucket=week", "session", {}, 200),
+    ("GET", "records.list_records", "/records/?per=100", "session", {}, 200),
+    ("GET", "records.list_records", "/records/?category=Food&entry_type=expense&q=record", "session", {}, 200),
+    ("GET", "records.add_record", "/records/add", "session", {}, 200),
+    ("POST", "records.add_record", "/records/add", "session",
+     {"data": {"type": "expense", "category": "Food", "amount": "3.20", "date": "2024-03-03"}}, 302),
+    # a monthly rule starting 12 months back: 12+ records in one batch
+    ("POST", "records.add_record", "/records/add?repeat", "session",
+     {"data": {"type": "expense", "category": "Rent", "amount": "500", "date": "2024-01-01", "repeat": "monthly"}}, 302),
+    ("GET", "records.edit_record", "/records/edit/{record}", "session", {}, 200),
+    ("POST", "records.edit_record", "/records/edit/{record}", "session",
+     {"data": {"type": "expense", "category": "Rent", "amount": "500", "date": "2024-03-01"}}, 302),
+    ("POST", "records.delete_record", "/records/delete/{record}", "session", {}, 302),
+    ("GET", "records.export_csv", "/records/export/csv", "session", {}, 200),
+    ("GET", "records.export_pdf", "/records/export/pdf", "session", {}, 200),
+    ("POST", "records.import_csv", "/records/import/csv", "session", {"data": _csv_upload}, 302),
+    ("GET", "records.export_parquet", "/records/export/parquet", "session", {}, 200),
+    ("POST", "records.import_parquet", "/records/import/parquet", "session", {"data": _parquet_upload}, 302),
+    ("GET", "categories.add_category", "/categories/", "session", {}, 200),
+    ("POST", "categories.add_category", "/categories/", "session", {"data": {"category": "Books"}}, 302),
+    ("GET", "recurring.list_rules", "/recurring/", "session", {}, 200),
+    ("POST", "recurring.delete_rule", "/recurring/delete/{rule}", "session", {}, 302),
+    ("GET", "budgets.list_budgets", "/budgets/", "session", {}, 200),
+    ("POST", "budgets.list_budgets", "/budgets/", "session", {"data": {"category": "Fun", "limit": "50"}}, 302),
+    ("POST", "budgets.delete_budget", "/budgets/delete/{budget}", "session", {}, 302),
+    ("POST", "categories.rename_category", "/categories/rename/{category}", "session",
+     {"data": {"new_name": "Leisure"}}, 302),
+    ("POST", "categories.delete_category", "/categories/delete/{category}", "session", {}, 302),
+    ("GET", "auth.login", "/auth/login", None, {}, 200),
+    ("POST", "auth.login", "/auth/login", None, {"data": {"username": "alice", "password": "secret"}}, 302),
+    ("GET", "auth.register", "/auth/register", None, {}, 200),
+    ("POST", "auth.register", "/auth/register", None,
+     {"data": {"username": "carol", "password": "secret", "confirm": "secret"}}, 302),
+    ("GET", "auth.logout", "/auth/logout", "session", {}, 302),
+    ("POST", "api.api_login", "/api/login", None, {"json": {"username": "alice", "password": "secret"}}, 200),
+    ("GET", "api.api_me", "/api/me", "token", {}, 200),
+    ("GET", "api.api_list_categories", "/api/categories", "token", {}, 200),
+    ("POST", "api.api_create_category", "/api/categories", "token", {"json": {"name": "Books"}}, 201),
+    ("DELETE", "api.api_delete_category", "/api/categories/{category}", "token", {}, 200),
+    ("GET", "api.api_list_budgets", "/api/budgets", "token", {}, 200),
+    ("POST", "api.api_set_budget", "/api/budgets", "token", {"json": {"category": "Fun", "limit": 50}}, 201),
+    ("DELETE", "api.api_delete_budget", "/api/budgets/{budget}", "token", {}, 200),
+    ("GET", "api.api_list_records", "/api/records?per=100", "token", {}, 200),
+    ("GET", "api.api_list_records", "/api/records?per=100&balance=1&cursor=2024-06-01:50", "token", {}, 200),
+    ("POST", "api.api_create_record", "/api/records", "token",
+     {"json": {"type": "expense", "category": "Food", "amount": 4.5, "date": "2024-05-05"}}, 201),
+    ("GET", "api.api_get_record", "/api/records/{record}", "token", {}, 200),
+    ("GET", "api.api_get_record", "/api/records/{other_record}", "token", {}, 403),
+    ("PUT", "api.api_update_record", "/api/records/{record}", "token",
+     {"json": {"type": "expense", "category": "Rent", "amount": 99.99, "date": "2024-05-06"}}, 200),
+    ("PATCH", "api.api_update_record", "/api/records/{record}", "token", {"json": {"amount": 1.5}}, 200),
+    ("DELETE", "api.api_delete_record", "/api/records/{record}", "token", {}, 200),
+    ("GET", "api.api_report_pivot", "/api/reports/pivot", "token", {}, 200),
+    ("GET", "api.api_report_rolling", "/api/reports/rolling?window=7", "token", {}, 200),
+    ("GET", "api.api_report_merchants", "/api/reports/merchants", "token", {}, 200),
+    ("GET", "api.api_report_weekdays", "/api/reports/weekdays?from=2024-03-01", "token", {}, 200),
+    ("GET", "api.api_export_csv", "/api/records/export/csv", "token", {}, 200),
+    ("GET", "api.api_export_pdf", "/api/records/export/pdf", "token", {}, 200),
+    ("POST", "api.api_import_csv", "/api/records/import/csv", "token", {"data": _csv_upload}, 201),
+    ("GET", "api.api_export_parquet", "/api/records/export/parquet", "token", {}, 200),
+    ("POST", "api.api_import_parquet", "/api/records/import/parquet", "token", {"data": _parquet_upload}, 201),
+    ("GET", "assets.serve", "/assets/css/style.css", None, {}, None),
+    ("GET", "static", "/static/css/style.css", None, {}, 200),
+    ("GET", "health.healthz", "/healthz", None, {}, 200),
+    # 503: the test app is not warmed (that happens in gunicorn's post_fork)
+    ("GET", "health.readyz", "/readyz", None, {}, 503),
+    # the test client is 127.0.0.1, in the default METRICS_ALLOW
+    ("GET", "metrics.metrics", "/metrics", None, {}, 200),
+]
+
+# committed SQL statement budgets, keyed "METHOD url-template"
+# (record writes include the rollup upkeep, a SELECT plus an UPDATE/INSERT/DELETE, the
+# balance checkpoint DELETE + INSERT ... SELECT, the budget-limit SELECT and the
+# user's data_version UPDATE, per flush)
+BUDGETS = {
+    "GET /": 3,
+    "GET /?scope=year&date=2024-06-01": 3,
+    "GET /chart-data?scope=year&date=2024-06-01": 3,
+    "GET /?from=2024-02-10&to=2024-11-20&bucket=week": 3,
+    "GET /?scope=month&date=2024-03-05&compare=1": 3,
+    "GET /chart-data?from=2024-02-10&to=2024-11-20&bucket=week": 3,
+    "GET /records/?per=100": 5,
+    "GET /records/?category=Food&entry_type=expense&q=record": 4,
+    "GET /records/add": 3,
+    "POST /records/add": 13,
+    "POST /records/add?repeat": 16,
+    "GET /records/edit/{record}": 4,
+    "POST /records/edit/{record}": 15,
+    "POST /records/delete/{record}": 10,
+    "GET /records/export/csv": 2,
+    "GET /records/export/pdf": 3,
+    "POST /records/import/csv": 15,
+    "GET /records/export/parquet": 2,
+    "POST /records/import/parquet": 15,
+    "GET /categories/": 3,
+    "POST /categories/": 4,
+    "GET /recurring/": 2,
+    "GET /budgets/": 4,
+    "POST /budgets/": 6,
+    "POST /budgets/delete/{budget}": 4,
+    "POST /recurring/delete/{rule}": 4,
+    "POST /categories/rename/{category}": 16,
+    "POST /categories/delete/{category}": 3,
+    "GET /auth/login": 0,
+    "POST /auth/login": 1,
+    "GET /auth/register": 0,
+    "POST /auth/register": 2,
+    "GET /auth/logout": 1,
+    "POST /api/login": 1,
+    "GET /api/me": 1,
+    "GET /api/categories": 2,
+    "POST /api/categories": 4,
+    "DELETE /api/categories/{category}": 4,
+    "GET /api/budgets": 3,
+    "POST /api/budgets": 6,
+    "DELETE /api/budgets/{budget}": 4,
+    "GET /api/records?per=100": 3,
+    "GET /api/records?per=100&balance=1&cursor=2024-06-01:50": 3,
+    "POST /api/records": 14,
+    "GET /api/records/{record}": 2,
+    "GET /api/records/{other_record}": 2,
+    "PUT /api/records/{record}": 15,
+    "PATCH /api/records/{record}": 14,
+    "DELETE /api/records/{record}": 10,
+    "GET /api/reports/pivot": 2,
+    "GET /api/reports/rolling?window=7": 2,
+    "GET /api/reports/merchants": 2,
+    "GET /api/reports/weekdays?from=2024-03-01": 2,
+    "GET /api/records/export/csv": 2,
+    "GET /api/records/export/pdf": 3,
+    "POST /api/records/import/csv": 15,
+    "GET /api/records/export/parquet": 2,
+    "POST /api/records/import/parquet": 15,
+    "GET /assets/css/style.css": 0,
+    "GET /static/css/style.css": 0,
+    "GET /healthz": 0,
+    "GET /readyz": 1,
+    "GET /metrics": 0,
+}
+
+def _id(case):
+    return f"{case[0]} {case[2]}"
+
+def _run(app, ids, queries, case, request_headers=None):
+    method, endpoint, url, auth, kwargs, expected = case
+    client = app.test_client()
+    headers = dict(request_headers or {})
+    if auth == "session":
+        client.post("/auth/login", data={"username": "alice", "password": "secret"})
+    elif auth == "token":
+        token = client.post("/api/login", json={"username": "alice", "password": "secret"}).get_json()["token"]
+        headers["Authorization"] = f"Bearer {token}"
+
+    other = ids["other_record"] if "{other_record}" in url else None
+    path = url.format(record=ids["record"], category=ids["category"], other_record=other, rule=ids["rule"],
+                      budget=ids["budget"])
+    kwargs = {k: (v() if callable(v) else v) for k, v in kwargs.items()}
+
+    with queries() as q:
+        resp = client.open(path, method=method, headers=headers, **kwargs)
+    if expected is not None:
+        assert resp.status_code == expected, f"{_id(case)}: {resp.status_code} {resp.get_data(as_text=True)[:300]}"
+    else:
+        assert resp.status_code < 500, f"{_id(case)}: {resp.status_code}"
+    return q
+
+@pytest.fixture
+def all_ids(app, ids):
+    from models.models import db, Budget, Record, RecurringRule
+    with app.app_context():
+        bob_record = Record.query.filter_by(user_id=ids["bob"]).first()
+        rule = RecurringRule(type="expense", category="Fun", amount=9.99, frequency="monthly",
+                             start_date="2099-01-01", next_date="2099-01-01", user_id=ids["alice"])
+        budget = Budget(category="Food", limit=100000, user_id=ids["alice"])
+        db.session.add_all([rule, budget])
+        db.session.commit()
+        return dict(ids, other_record=bob_record.id, rule=rule.id, budget=budget.id)
+
+@pytest.mark.parametrize("case", CASES, ids=_id)
+def test_query_budget(app, all_ids, queries, case):
+    q = _run(app, all_ids, queries, case)
+    budget = BUDGETS[_id(case)]
+    assert q.count <= budget, (
+        f"{_id(case)} ran {q.count} SQL statements, budget is {budget}:\n{q.report()}"
+    )
+    slow = q.slow(SLOW_QUERY_MS)
+    assert not slow, f"{_id(case)} has statements over {SLOW_QUERY_MS} ms:\n{q.report()}"
+
+def test_every_route_has_a_case(app):
+    covered = {(method, endpoint) for method, endpoint, *_ in CASES}
+    missing = []
+    for rule in app.url_map.iter_rules():
+        for method in sorted(rule.methods - {"HEAD", "OPTIONS"}):
+            if (method, rule.endpoint) not in covered:
+                missing.append(f"{method} {rule.rule} ({rule.endpoint})")
+    assert not missing, "routes without a query-budget case:\n" + "\n".join(missing)
+
+def test_every_case_has_a_budget():
+    assert sorted(_id(c) for c in CASES) == sorted(BUDGETS)
+
+@pytest.mark.parametrize("small, large", [
+    ("/records/?per=10", "/records/?per=100"),
+    ("/api/records?per=10", "/api/records?per=100"),
+    ("/api/records?per=10&balance=1&cursor=2024-12-31:999", "/api/records?per=100&balance=1&cursor=2024-12-31:999"),
+    ("/?scope=month&date=2024-01-15", "/?scope=year&date=2024-01-15"),
+    ("/?scope=month&date=2024-01-15", "/?scope=year&date=2024-01-15&compare=1"),
+    ("/chart-data?scope=month&date=2024-01-15", "/chart-data?scope=year&date=2024-01-15"),
+    ("/chart-data?from=2024-01-10&to=2024-01-20&bucket=day", "/chart-data?from=2023-01-10&to=2024-12-20&bucket=day"),
+])
+def test_query_count_independent_of_rows(app, all_ids, queries, small, large):
+    # an N+1 shows up as more statements for more rows; each url runs twice so both
+    # counts are taken with the user's record columns (services/columnar.py) cached
+    auth = "token" if small.startswith("/api") else "session"
+    endpoint = small.split("?")[0]
+    counts = [[_run(app, all_ids, queries, ("GET", endpoint, url, auth, {}, 200)).count for _ in range(2)][-1]
+              for url in (small, large)]
+    assert counts[0] == counts[1], f"{small}: {counts[0]} statements, {large}: {counts[1]}"
@@ -0,0 +1,106 @@
+import threading
+from datetime import date
+
+from models.models import db, MonthlyRollup, Record, RecurringRule
+from services import recurring
+
+def _rule(user_id, **kw):
+    fields = dict(type="expense", category="Rent", amount=500.0, description="flat",
+                  frequency="monthly", interval=1, start_date="2024-01-31", user_id=user_id)
+    fields.update(kw)
+    fields.setdefault("next_date", fields["start_date"])
+    rule = RecurringRule(**fields)
+    db.session.add(rule)
+    db.session.commit()
+    return rule.id
+
+def test_occurrences_clamp_to_month_end():
+    dates, nxt = recurring.occurrences("monthly", 1, "2024-01-31", "2024-01-31", None, date(2024, 5, 1))
+    assert dates == ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30"]
+    assert nxt == "2024-05-31"
+
+    dates, nxt = recurring.occurrences("weekly", 2, "2024-01-01", "2024-01-01", "2024-02-01", date(2030, 1, 1))
+    assert dates == ["2024-01-01", "2024-01-15", "2024-01-29"] and nxt is None
+
+def test_materialize_is_idempotent(app, ids):
+    with app.app_context():
+        rid = _rule(ids["alice"])
+        _rule(ids["bob"], frequency="daily", start_date="2024-03-01", category="Food", amount=2.0)
+
+        first = recurring.materialize(until=date(2024, 3, 31), batch_size=7)
+        assert first == {"rules": 2, "inserted": 3 + 31, "skipped": 0}
+        assert recurring.materialize(until=date(2024, 3, 31))["inserted"] == 0
+
+        # a rule moved back re-runs, but skips what is already there
+        db.session.get(RecurringRule, rid).next_date = "2024-01-31"
+        db.session.commit()
+        again = recurring.materialize(until=date(2024, 4, 30))
+        assert again == {"rules": 2, "inserted": 1 + 30, "skipped": 3}
+
+        dates = [d for (d,) in db.session.query(Record.date).filter_by(rule_id=rid).order_by(Record.date)]
+        assert dates == ["2024-01-31", "2024-02-29", "2024-03-31", "2024-04-30"]
+        assert db.session.get(RecurringRule, rid).next_date == "2024-05-31"
+
+        # rollups saw the bulk insert
+        rent = (db.session.query(MonthlyRollup.amount)
+                .filter_by(user_id=ids["alice"], month="2024-04", type="expense", category="Rent").scalar())
+        expected = (db.session.query(db.func.sum(Record.amount))
+                    .filter(Record.user_id == ids["alice"], Record.date.like("2024-04%"), Record.category == "Rent")
+                    .scalar())
+        assert rent == expected
+
+def test_add_record_with_repeat(app, client, ids):
+    r = client.post("/records/add", data={"type": "income", "category": "Salary", "amount": "2000",
+                                          "date": "2024-01-05", "repeat": "monthly"})
+    assert r.status_code == 302 and "/recurring/" in r.headers["Location"]
+    with app.app_context():
+        rule = RecurringRule.query.filter_by(user_id=ids["alice"]).one()
+        n = Record.query.filter_by(rule_id=rule.id).count()
+        assert n >= 2 and rule.next_date > date.today().isoformat()
+
+    assert "Salary" in client.get("/recurring/").get_data(as_text=True)
+    client.post(f"/recurring/delete/{rule.id}")
+    with app.app_context():
+        assert RecurringRule.query.count() == 0
+        assert Record.query.filter_by(rule_id=rule.id).count() == 0
+        assert Record.query.filter_by(user_id=ids["alice"], category="Salary", amount=2000).count() == n
+
+def test_add_record_with_repeat_rejects_bad_date(app, client, ids):
+    r = client.post("/records/add", data={"type": "expense", "category": "Rent", "amount": "500",
+                                          "date": "2024-13-01", "repeat": "monthly"})
+    assert r.status_code == 200 and b"Date must be YYYY-MM-DD" in r.data
+    with app.app_context():
+        assert RecurringRule.query.count() == 0
+
+def test_scheduler_runs_only_while_it_holds_the_lock(app, tmp_path, monkeypatch):
+    path = str(tmp_path / "recurring.lock")
+    other = recurring.hold_lock(path)  # another worker's scheduler
+    assert other and recurring.hold_lock(path) is None
+
+    class Ticks(threading.Event):
+        count = 0
+        def wait(self, timeout=None):  # one tick per interval, without sleeping
+            self.count += 1
+            if self.count == 2:
+                other.close()  # that worker exits: the lock is free
+            if self.count == 4:
+                self.set()
+            return self.is_set()
+
+    stop = Ticks()
+    runs = []
+    monkeypatch.setattr(recurring, "materialize", lambda **kw: runs.append(stop.count))
+    app.config.update(RECURRING_INTERVAL_SECONDS=60, RECURRING_LOCK_FILE=path)
+    thread = recurring.start_scheduler(app, stop)
+    thread.join(timeout=5)
+    assert not thread.is_alive() and runs == [2, 3]
+    lock = recurring.hold_lock(path)  # let go of on the way out
+    assert lock
+    lock.close()
+
+def test_stop_scheduler_ends_the_wait(app, tmp_path, monkeypatch):
+    monkeypatch.setattr(recurring, "materialize", lambda **kw: None)
+    app.config.update(RECURRING_INTERVAL_SECONDS=3600, RECURRING_LOCK_FILE=str(tmp_path / "recurring.lock"))
+    thread = recurring.start_scheduler(app)
+    recurring.stop_scheduler(app, timeout=5)
+    assert not thread.is_alive() and "recurring_scheduler" not in app.extensions
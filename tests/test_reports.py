@@ -0,0 +1,82 @@
+import pandas as pd
+from sqlalchemy import func
+
+from models.models import db, Record, User
+from services import reports
+
+def test_pivot_matches_sql(app, ids, api_headers):
+    body = app.test_client().get("/api/reports/pivot?from=2024-01-01&to=2024-06-30", headers=api_headers).get_json()
+    with app.app_context():
+        expected = {
+            (c, m): s for c, m, s in db.session.query(Record.category, func.substr(Record.date, 1, 7), func.sum(Record.amount))
+            .filter(Record.user_id == ids["alice"], Record.type == "expense",
+                    Record.date >= "2024-01-01", Record.date <= "2024-06-30")
+            .group_by(Record.category, func.substr(Record.date, 1, 7))
+        }
+    assert body["months"] == ["2024-01", "2024-02", "2024-03", "2024-04", "2024-05", "2024-06"]
+    assert "Salary" not in body["categories"]
+    for category, row in zip(body["categories"], body["values"]):
+        for month, value in zip(body["months"], row):
+            assert value == round(expected.get((category, month), 0), 2)
+    assert body["totals"] == sorted(body["totals"], reverse=True)
+
+def test_frame_is_cached_until_records_change(app, client, ids, api_headers, queries):
+    c = app.test_client()
+    c.get("/api/reports/pivot", headers=api_headers)
+    with queries() as q:
+        assert c.get("/api/reports/weekdays", headers=api_headers).status_code == 200
+    assert q.count == 1  # token user only; the frame came from the cached columns
+
+    with app.app_context():
+        version = db.session.get(User, ids["alice"]).data_version
+        other = db.session.get(User, ids["bob"]).data_version
+    client.post("/records/add", data={"type": "expense", "category": "Fun", "amount": "7", "date": "2030-01-01"})
+    with app.app_context():
+        assert db.session.get(User, ids["alice"]).data_version == version + 1
+        assert db.session.get(User, ids["bob"]).data_version == other
+
+    body = c.get("/api/reports/pivot?from=2030-01-01", headers=api_headers).get_json()
+    assert body == {"months": ["2030-01"], "categories": ["Fun"], "values": [[7.0]], "totals": [7.0]}
+    cache = app.extensions["column_cache"]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+def test_rolling_fills_gap_days(app, api_headers):
+    body = app.test_client().get("/api/reports/rolling?window=2&type=income&from=2024-01-01&to=2024-02-28",
+                                 headers=api_headers).get_json()
+    assert body["window"] == 2
+    days = pd.date_range(body["dates"][0], body["dates"][-1], freq="D").strftime("%Y-%m-%d").tolist()
+    assert body["dates"] == days
+    daily = body["daily"]
+    assert body["rolling"][1:] == [round((a + b) / 2, 2) for a, b in zip(daily, daily[1:])]
+
+def test_merchants_and_weekdays(app, ids, api_headers):
+    with app.app_context():
+        db.session.add_all(Record(date=f"2031-01-{d:02d}", type="expense", category="Food", amount=a,
+                                  description=desc, user_id=ids["alice"])
+                           for d, a, desc in ((6, 10, "LIDL #123 Sofia"), (7, 20, "lidl 456 sofia "),
+                                              (13, 5, "Kaufland"), (14, 1, "")))
+        db.session.commit()
+    c = app.test_client()
+    items = c.get("/api/reports/merchants?from=2031-01-01&limit=5", headers=api_headers).get_json()["items"]
+    assert items == [
+        {"merchant": "lidl sofia", "total": 30.0, "count": 2, "average": 15.0, "last": "2031-01-07"},
+        {"merchant": "kaufland", "total": 5.0, "count": 1, "average": 5.0, "last": "2031-01-13"},
+    ]
+
+    heat = c.get("/api/reports/weekdays?from=2031-01-01", headers=api_headers).get_json()
+    assert heat["months"] == ["2031-01"]
+    # 2031-01-06 and -13 are Mondays, -07 and -14 Tuesdays; Jan 6..14 has two of each
+    assert [row[0] for row in heat["values"]] == [15.0, 21.0, 0, 0, 0, 0, 0]
+    assert heat["mean"][:2] == [7.5, 10.5]
+
+def test_report_args(app, api_headers):
+    c = app.test_client()
+    assert c.get("/api/reports/pivot?type=transfer", headers=api_headers).status_code == 400
+    assert c.get("/api/reports/pivot?from=2024-13-01", headers=api_headers).status_code == 400
+    assert c.get("/api/reports/pivot").status_code == 401
+    empty = c.get("/api/reports/merchants?from=2040-01-01", headers=api_headers).get_json()
+    assert empty == {"items": []}
+
+def test_merchant_keys():
+    s = pd.Series(["Shell 0042 Sofia", "SHELL-0043 sofia!", None, "  "])
+    assert reports.merchant_keys(s).tolist() == ["shell sofia", "shell sofia", "", ""]
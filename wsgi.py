@@ -0,0 +1,10 @@
+"""Production entry point: `gunicorn -c gunicorn.conf.py wsgi:app`.
+
+The app is built (and its templates compiled) once in the gunicorn master;
+workers inherit it via fork and only re-open their own DB pool
+(see post_fork in gunicorn.conf.py).
+"""
+from app import create_app, precompile_templates
+
+app = create_app()
+precompile_templates(app)